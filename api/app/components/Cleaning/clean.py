@@ -1,75 +1,283 @@
+import asyncio
+import time
+import weakref
 from fastapi import  HTTPException, Body
 from app.utils.session import SESSIONS
-from openai import OpenAI
-import os
 import pandas as pd
 from dotenv import load_dotenv
-from huggingface_hub import HfApi,get_token
-import io
+from app.components.Cleaning.codegen import generate_cleaning_code
+from app.components.Cleaning.lazy import (
+    CLEAN_LAZY,
+    CLEAN_SAMPLE_ROWS,
+    PLANS,
+    CleaningPlan,
+    ReplayError,
+    replay,
+    representative_sample,
+    run_code,
+)
+from app.components.Cleaning.history import HISTORIES, current_history, history_for
+from app.utils.code_cache import CODE_CACHE
+from app.utils.metrics import stage
+from app.utils.serialize import preview
+from app.utils.storage import DATASET_SUFFIX
+from app.utils.upload_queue import UPLOADS
+from app.logging.logging_config import setup_logger
+
+logger = setup_logger(__name__)
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
-api = HfApi()
+HF_REPO_ID = "prthm20/ZeoMl"
+
+# Serialize changes to a session's pending plan with materialize's replay.
+# Weak values: the entry goes once nobody holds or waits for the lock
+_session_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _session_lock(session_id: str) -> asyncio.Lock:
+    lock = _session_locks.get(session_id)
+    if lock is None:
+        lock = _session_locks[session_id] = asyncio.Lock()
+    return lock
+
+
+def _forget_session(session_id: str, reason: str) -> None:
+    # Store listener. The history goes with the frame: its old versions
+    # are counted against the memory budget, so spilling must free them.
+    # Pending operations outlive a spill (only their sample frames are let
+    # go), not a delete
+    HISTORIES.pop(session_id, None)
+    if reason == "delete":
+        PLANS.pop(session_id, None)
+        return
+    plan = PLANS.get(session_id)
+    if plan is not None:
+        plan.release()
+
+
+SESSIONS.on_evict(_forget_session)
+
+
+def queue_cleaned_upload(session_id: str, df: pd.DataFrame) -> str:
+    # Persist in the background; only the latest version per session is
+    # serialized and pushed
+    repo_id = HF_REPO_ID  # <-- change this
+    filename = f"{session_id}_cleaned{DATASET_SUFFIX}"
+    upload = UPLOADS.enqueue(
+        repo_id, filename, df, commit_message=f"Updated cleaned data for session {session_id}"
+    )
+    return f"Queued save of cleaned data to {repo_id}/{filename} (version {upload['version']})"
+
+
+def _store(session_id: str, df: pd.DataFrame, history=None) -> None:
+    SESSIONS[session_id] = df
+    if history is not None:
+        # Lets this worker tell when another one has changed the session
+        history.session_version = SESSIONS.version(session_id)
+        if HISTORIES.get(session_id) is history:
+            # Older versions count against the session memory budget
+            SESSIONS.attach_bytes(session_id, history.retained_bytes())
+
+
+async def materialize(session_id: str) -> pd.DataFrame:
+    """
+    The session's full frame with every pending lazy operation applied.
+    Replays the operation log once, stores the result as the session frame
+    and queues its upload. A no-op when nothing is pending.
+    """
+    async with _session_lock(session_id):
+        return await _materialize(session_id)
+
+
+async def _materialize(session_id: str) -> pd.DataFrame:
+    # Caller holds the session lock, so the plan can't change mid-replay
+    plan = PLANS.get(session_id)
+    if plan is None or not plan.ops:
+        PLANS.pop(session_id, None)
+        return SESSIONS[session_id]
+
+    start = time.perf_counter()
+    base = SESSIONS[session_id]
+    history = history_for(session_id, base, SESSIONS.version(session_id))
+
+    def commit_step(i, df):
+        return history.commit(df, plan.ops[i]["instruction"], plan.ops[i]["code"])
+
+    try:
+        with stage("replay"):
+            df = await asyncio.to_thread(replay, base, plan.ops, commit_step)
+    except ReplayError as e:
+        # Plan kept so the caller can inspect or discard it
+        raise HTTPException(status_code=422, detail={
+            "message": str(e),
+            "failed_op": e.index,
+            "code": e.code,
+            "pending_ops": len(plan.ops),
+        })
+    _store(session_id, df, history)
+    PLANS.pop(session_id, None)
+    queue_cleaned_upload(session_id, df)
+    logger.info(f"Replayed {len(plan.ops)} cleaning ops on {session_id} in {time.perf_counter() - start:.2f}s")
+    return df
+
+
+async def _run_instruction(instruction: str, original: pd.DataFrame):
+    """
+    Generate code for `instruction` and run it on a copy of `original`: a
+    failing instruction leaves the session untouched, and frames handed to
+    the upload queue are never modified afterwards. Returns (code,
+    cache_hit, result, error), with result None when the code failed.
+    """
+    code, cache_key, cache_hit = await generate_cleaning_code(instruction, original)
+    try:
+        df = await asyncio.to_thread(run_code, code, original)
+    except Exception as e:
+        if cache_hit:
+            # Cached code that no longer runs shouldn't be served again
+            await asyncio.to_thread(CODE_CACHE.discard, cache_key)
+        return code, cache_hit, None, f"Error running code: {e}"
+
+    if not cache_hit:
+        await asyncio.to_thread(CODE_CACHE.put, cache_key, instruction, original, code)
+    return code, cache_hit, df, None
+
+
+async def _clean_lazily(session_id: str, instruction: str) -> dict | None:
+    """
+    Validate `instruction` on the session's sample and record it, or None
+    when the frame is small enough that the sample would be the whole frame.
+    """
+    async with _session_lock(session_id):
+        plan = PLANS.get(session_id)
+        if plan is None:
+            df = SESSIONS[session_id]
+            if len(df) <= CLEAN_SAMPLE_ROWS:
+                return None
+            sample = await asyncio.to_thread(representative_sample, df, CLEAN_SAMPLE_ROWS)
+            plan = PLANS[session_id] = CleaningPlan(sample, len(df))
+
+        original = await asyncio.to_thread(plan.preview, lambda: SESSIONS[session_id])
+        code, cache_hit, df, error = await _run_instruction(instruction, original)
+        if error:
+            return {"error": error, "code": code, "code_cache": "hit" if cache_hit else "miss"}
+
+        plan.record({"instruction": instruction, "code": code}, df)
+        return {
+            "message": "Cleaning recorded",
+            "code": code,
+            "code_cache": "hit" if cache_hit else "miss",
+            "preview": preview(df),
+            "lazy": True,
+            "pending_ops": len(plan.ops),
+            "sample_rows": plan.sample_rows,
+            "total_rows": plan.total_rows,
+            "huggingface_status": "Not saved yet; pending operations are applied on save or train",
+        }
 
 
 async def clean_data(
     session_id: str = Body(...),
-    instruction: str = Body(...)
+    instruction: str = Body(...),
+    lazy: bool = Body(None)
 ):
+    """
+    Apply a cleaning instruction. Eagerly, the generated code runs on the
+    full frame. Lazily (`lazy`, default CLEAN_LAZY) it is validated and
+    previewed on a representative sample and recorded; the full frame gets
+    the recorded operations when it is next saved or trained on.
+    """
     if session_id not in SESSIONS:
         raise HTTPException(status_code=404, detail="Invalid session_id")
 
-    df = SESSIONS[session_id]
+    lazy = CLEAN_LAZY if lazy is None else lazy
+    if lazy and SESSIONS.shared:
+        # Pending operations live in this worker only; with sessions shared
+        # between workers the next request may not come back here
+        lazy = False
+    if lazy:
+        res = await _clean_lazily(session_id, instruction)
+        if res is not None:
+            return res
+
+    # Held until the result is stored, so an operation recorded meanwhile
+    # isn't applied to the older frame or lost
+    async with _session_lock(session_id):
+        original = await _materialize(session_id)
+        code, cache_hit, df, error = await _run_instruction(instruction, original)
+        if error:
+            return {"error": error, "code": code, "code_cache": "hit" if cache_hit else "miss"}
+
+        history = history_for(session_id, original, SESSIONS.version(session_id))
+        with stage("history_commit"):
+            df = history.commit(df, instruction, code)
+        _store(session_id, df, history)
+    hf_status = queue_cleaned_upload(session_id, df)
+    return {"message": "Cleaning applied", "code": code, "code_cache": "hit" if cache_hit else "miss", "version": history.current.number, "preview": preview(df), "huggingface_status": hf_status}
+
+
+def _step_response(session_id: str, action: str, df: pd.DataFrame, op: dict | None = None) -> dict:
+    plan = PLANS.get(session_id)
+    history = HISTORIES.get(session_id)
+    return {
+        "message": f"{action} applied",
+        "instruction": op["instruction"] if op else None,
+        "version": history.current.number if history else 0,
+        "pending_ops": len(plan.ops) if plan else 0,
+        "can_undo": bool(plan and plan.ops) or bool(history and history.cursor > 0),
+        "can_redo": bool(plan and plan.undone) or bool(history and history.cursor < len(history.versions) - 1),
+        "preview": preview(df),
+    }
+
 
-    prompt = f"""
-    You are a Pandas coding assistant.
-    Apply this cleaning instruction to a DataFrame called df.
-    Instruction: {instruction}
-    Output only valid Python code (no markdown).
+async def undo_cleaning(session_id: str) -> dict:
     """
+    Step back one cleaning operation: a pending lazy operation if there is
+    one, otherwise the last applied version.
+    """
+    if session_id not in SESSIONS:
+        raise HTTPException(status_code=404, detail="Invalid session_id")
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a Pandas coding assistant."},
-            {"role": "user", "content": prompt},
-        ]
-    )
+    async with _session_lock(session_id):
+        plan = PLANS.get(session_id)
+        if plan is not None and plan.ops:
+            op = await asyncio.to_thread(plan.undo)
+            result = await asyncio.to_thread(plan.preview, lambda: SESSIONS[session_id])
+            return _step_response(session_id, "Undo", result, op)
 
-    code = response.choices[0].message.content.strip()
+        history = current_history(session_id, SESSIONS.version(session_id))
+        df = history.undo() if history else None
+        if df is None:
+            raise HTTPException(status_code=409, detail="Nothing to undo")
+        # Pending redo ops were recorded against the newer data
+        PLANS.pop(session_id, None)
+        _store(session_id, df, history)
+    queue_cleaned_upload(session_id, df)
+    return _step_response(session_id, "Undo", df)
 
-    if code.startswith("```"):
-        code = code.split("```")[1]
-        code = code.replace("python\n", "").strip()
 
-    local_vars = {"df": df, "pd": pd}
-    try:
-        exec(code, {}, local_vars)
-        df = local_vars["df"]
-        SESSIONS[session_id] = df
-    except Exception as e:
-        return {"error": f"Error running code: {e}", "code": code}
-    
-    try:
-    # Convert DataFrame to CSV in memory
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_bytes = io.BytesIO(csv_buffer.getvalue().encode("utf-8"))
-
-    # Upload the cleaned file to your Hugging Face repo
-        repo_id = "prthm20/ZeoMl"  # <-- change this
-        filename = f"{session_id}_cleaned.csv"
-
-        api.upload_file(
-        path_or_fileobj=csv_bytes,
-        path_in_repo=filename,
-        repo_id=repo_id,
-        repo_type="dataset",
-        commit_message=f"Updated cleaned data for session {session_id}"
-     )
-
-        hf_status = f"Saved cleaned data to {repo_id}/{filename}"
-    except Exception as e:
-        hf_status = f"Error saving to Hugging Face: {e}"
-    return {"message": "Cleaning applied", "code": code, "preview":  df.head().to_json(orient="records"), "huggingface_status": hf_status}
+async def redo_cleaning(session_id: str) -> dict:
+    if session_id not in SESSIONS:
+        raise HTTPException(status_code=404, detail="Invalid session_id")
+
+    async with _session_lock(session_id):
+        plan = PLANS.get(session_id)
+        if plan is not None and plan.undone:
+            op = await asyncio.to_thread(plan.redo)
+            result = await asyncio.to_thread(plan.preview, lambda: SESSIONS[session_id])
+            return _step_response(session_id, "Redo", result, op)
+
+        history = current_history(session_id, SESSIONS.version(session_id))
+        df = history.redo() if history else None
+        if df is None:
+            raise HTTPException(status_code=409, detail="Nothing to redo")
+        _store(session_id, df, history)
+    queue_cleaned_upload(session_id, df)
+    return _step_response(session_id, "Redo", df)
+
+
+async def discard_plan(session_id: str) -> int:
+    """Drop the session's pending lazy operations; returns how many there were."""
+    async with _session_lock(session_id):
+        plan = PLANS.pop(session_id, None)
+    return len(plan.ops) if plan else 0
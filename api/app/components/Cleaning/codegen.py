@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import re
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+from app.utils.code_cache import CODE_CACHE, normalize_instruction
+from app.utils.metrics import stage
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+# "openai" (default) or "stub" for offline runs, tests and benchmarks
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+# Optional JSON file {"instruction": "code", ...} consulted by the stub
+LLM_STUB_FILE = os.getenv("LLM_STUB_FILE")
+
+
+class OpenAICodeGenerator:
+    """Generates pandas cleaning code with the OpenAI chat API."""
+
+    def __init__(self, model: str = LLM_MODEL):
+        self.model = model
+        self.calls = 0
+        self._client = None
+
+    @property
+    def client(self):
+        # Created on first use so the app starts without OPENAI_API_KEY
+        if self._client is None:
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def generate(self, instruction: str) -> str:
+        prompt = f"""
+    You are a Pandas coding assistant.
+    Apply this cleaning instruction to a DataFrame called df.
+    Instruction: {instruction}
+    Output only valid Python code (no markdown).
+    """
+
+        self.calls += 1
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are a Pandas coding assistant."},
+                {"role": "user", "content": prompt},
+            ]
+        )
+
+        code = response.choices[0].message.content.strip()
+
+        if code.startswith("```"):
+            code = code.split("```")[1]
+            code = code.replace("python\n", "").strip()
+        return code
+
+
+class StubCodeGenerator:
+    """
+    Offline stand-in for the LLM. Answers from `responses` (normalized
+    instruction -> code), then a few built-in patterns, and otherwise
+    returns code that leaves the frame unchanged.
+    """
+
+    PATTERNS = [
+        (r"^drop (rows with )?(missing|null|na|nan)( values)?$", "df = df.dropna()"),
+        (r"^(drop|remove) duplicates?( rows)?$", "df = df.drop_duplicates()"),
+        (r"^(drop|remove) (the )?column (?P<col>.+)$", "df = df.drop(columns=[{col!r}])"),
+        (r"^fill (missing|null|na|nan)( values)? with (?P<value>-?\d+(\.\d+)?)$", "df = df.fillna({value})"),
+        (r"^lowercase (the )?column (?P<col>.+)$", "df[{col!r}] = df[{col!r}].str.lower()"),
+    ]
+
+    def __init__(self, responses: dict | None = None):
+        self.responses = {normalize_instruction(k): v for k, v in (responses or {}).items()}
+        self.calls = 0
+
+    def generate(self, instruction: str) -> str:
+        self.calls += 1
+        text = normalize_instruction(instruction)
+        if text in self.responses:
+            return self.responses[text]
+        # Matched case-insensitively but on the original text, so column
+        # names keep their case
+        raw = re.sub(r"\s+", " ", instruction.strip()).strip(" .!;")
+        for pattern, template in self.PATTERNS:
+            match = re.match(pattern, raw, re.IGNORECASE)
+            if match:
+                return template.format(**match.groupdict())
+        return "df = df"
+
+
+def _default_generator():
+    if LLM_BACKEND == "stub":
+        responses = None
+        if LLM_STUB_FILE:
+            with open(LLM_STUB_FILE) as f:
+                responses = json.load(f)
+        return StubCodeGenerator(responses)
+    return OpenAICodeGenerator()
+
+
+GENERATOR = _default_generator()
+
+
+def set_code_generator(generator) -> None:
+    """Swap the code generator (anything with `generate(instruction) -> str`)."""
+    global GENERATOR
+    GENERATOR = generator
+
+
+async def generate_cleaning_code(instruction: str, df: pd.DataFrame) -> tuple[str, str, bool]:
+    """
+    Code applying `instruction` to `df`, from the code cache when the same
+    instruction was already generated for a frame of the same schema.
+    Returns (code, cache_key, cache_hit); callers store the code with
+    `CODE_CACHE.put` (in a worker thread) once it has run successfully.
+    """
+    with stage("code_cache"):
+        key = CODE_CACHE.key(instruction, df)
+        # SQLite lookups block; keep them off the event loop
+        code = await asyncio.to_thread(CODE_CACHE.get, key)
+    if code is not None:
+        return code, key, True
+
+    with stage("llm"):
+        code = await asyncio.to_thread(GENERATOR.generate, instruction)
+    return code, key, False
@@ -0,0 +1,235 @@
+import os
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+# Versions kept per session (the oldest are dropped first)
+CLEAN_HISTORY_MAX_VERSIONS = int(os.getenv("CLEAN_HISTORY_MAX_VERSIONS", "20"))
+
+
+class Version:
+    """One state of a session's data, as its columns and index."""
+
+    def __init__(self, number: int, columns: list, index: pd.Index, instruction: str | None, code: str | None):
+        self.number = number
+        self.columns = columns
+        self.index = index
+        self.instruction = instruction
+        self.code = code
+        self.created_at = time.time()
+
+    def frame(self) -> pd.DataFrame:
+        names = [name for name, _ in self.columns]
+        if len(set(names)) == len(names):
+            # No copy: the frame's columns are the stored (shared) arrays
+            return pd.DataFrame(dict(self.columns), index=self.index, copy=False)
+        return pd.concat([s.rename(name) for name, s in self.columns], axis=1)
+
+
+class SessionHistory:
+    """
+    Linear undo/redo history of a session's cleaning steps.
+
+    Versions share structure: a column that a step left unchanged is the
+    same Series object in both versions, so it is held in memory once no
+    matter how many versions contain it. Only columns a step actually
+    changed (and a changed index) cost memory per version.
+    """
+
+    def __init__(self, base: pd.DataFrame, max_versions: int = CLEAN_HISTORY_MAX_VERSIONS):
+        self.max_versions = max_versions
+        self.versions = [Version(0, list(base.items()), base.index, None, None)]
+        self.cursor = 0
+        # Session version the current version was stored as (see history_for)
+        self.session_version = None
+        self._bytes: dict[int, int] = {}
+
+    @property
+    def current(self) -> Version:
+        return self.versions[self.cursor]
+
+    def commit(self, df: pd.DataFrame, instruction: str, code: str) -> pd.DataFrame:
+        """
+        Record `df` as the version after the current one (dropping any redo
+        branch) and return the frame to keep as the session data, which
+        shares its unchanged columns with the previous version.
+        """
+        prev = self.current
+        index = prev.index if df.index is prev.index or df.index.equals(prev.index) else df.index
+        previous = {}
+        for name, s in prev.columns:
+            previous.setdefault(name, s)
+
+        columns = []
+        for name, s in df.items():
+            old = previous.get(name)
+            if old is not None and index is prev.index and old.dtype == s.dtype and old.equals(s):
+                columns.append((name, old))
+            else:
+                if s.index is not index:
+                    s = s.copy(deep=False)
+                    s.index = index
+                columns.append((name, s))
+
+        del self.versions[self.cursor + 1:]
+        self.versions.append(Version(prev.number + 1, columns, index, instruction, code))
+        self.cursor += 1
+        if len(self.versions) > self.max_versions:
+            drop = len(self.versions) - self.max_versions
+            del self.versions[:drop]
+            self.cursor -= drop
+        self._forget_unreferenced()
+        return self.current.frame()
+
+    def undo(self) -> pd.DataFrame | None:
+        if self.cursor == 0:
+            return None
+        self.cursor -= 1
+        return self.current.frame()
+
+    def redo(self) -> pd.DataFrame | None:
+        if self.cursor >= len(self.versions) - 1:
+            return None
+        self.cursor += 1
+        return self.current.frame()
+
+    def get(self, number: int) -> Version | None:
+        for version in self.versions:
+            if version.number == number:
+                return version
+        return None
+
+    def diff(self, a: Version, b: Version) -> dict:
+        """Columns added, removed and changed going from version a to b."""
+        a_cols, b_cols = dict(a.columns), dict(b.columns)
+        changed, shared = [], 0
+        for name, sb in b_cols.items():
+            sa = a_cols.get(name)
+            if sa is None:
+                continue
+            if sa is sb:
+                shared += 1
+                continue
+            entry = {"column": name, "dtype": [str(sa.dtype), str(sb.dtype)], "changed_cells": None}
+            if a.index is b.index or a.index.equals(b.index):
+                try:
+                    both_na = sa.isna().to_numpy() & sb.isna().to_numpy()
+                    differs = (sa.to_numpy() != sb.to_numpy()) & ~both_na
+                    entry["changed_cells"] = int(differs.sum())
+                except (TypeError, ValueError):
+                    pass
+            if entry["changed_cells"] != 0:
+                changed.append(entry)
+            else:
+                shared += 1
+        return {
+            "from_version": a.number,
+            "to_version": b.number,
+            "rows": [len(a.index), len(b.index)],
+            "added": [name for name in b_cols if name not in a_cols],
+            "removed": [name for name in a_cols if name not in b_cols],
+            "changed": changed,
+            "unchanged_columns": shared,
+        }
+
+    def describe(self) -> dict:
+        seen: set[int] = set()
+        versions = []
+        total = 0
+        for version in self.versions:
+            logical = owned = 0
+            for obj, size in self._parts(version):
+                logical += size
+                if id(obj) not in seen:
+                    seen.add(id(obj))
+                    owned += size
+            total += owned
+            versions.append({
+                "version": version.number,
+                "current": version is self.current,
+                "instruction": version.instruction,
+                "code": version.code,
+                "rows": len(version.index),
+                "columns": len(version.columns),
+                "created_at": version.created_at,
+                # Size of the version as a standalone frame
+                "logical_bytes": logical,
+                # What this version adds on top of the older ones it shares with
+                "owned_bytes": owned,
+            })
+        return {
+            "current_version": self.current.number,
+            "can_undo": self.cursor > 0,
+            "can_redo": self.cursor < len(self.versions) - 1,
+            "max_versions": self.max_versions,
+            "total_bytes": total,
+            "versions": versions,
+        }
+
+    def retained_bytes(self) -> int:
+        """
+        Memory the history holds beyond the current version, whose columns
+        are the session frame itself and already counted with it.
+        """
+        seen = {id(obj) for obj, _ in self._parts(self.current)}
+        total = 0
+        for version in self.versions:
+            for obj, size in self._parts(version):
+                if id(obj) not in seen:
+                    seen.add(id(obj))
+                    total += size
+        return total
+
+    def _parts(self, version: Version):
+        yield version.index, self._size(version.index)
+        for _, s in version.columns:
+            yield s, self._size(s)
+
+    def _size(self, obj) -> int:
+        # Deep sizes walk object columns, so they're computed once per array
+        key = id(obj)
+        if key not in self._bytes:
+            if isinstance(obj, pd.Index):
+                self._bytes[key] = int(obj.memory_usage(deep=True))
+            else:
+                self._bytes[key] = int(obj.memory_usage(index=False, deep=True))
+        return self._bytes[key]
+
+    def _forget_unreferenced(self) -> None:
+        live = {id(v.index) for v in self.versions}
+        live.update(id(s) for v in self.versions for _, s in v.columns)
+        self._bytes = {k: v for k, v in self._bytes.items() if k in live}
+
+
+# Dropped with the session's frame when the store spills or deletes it
+# (see Cleaning.clean), so old versions never outlive the memory budget
+HISTORIES: dict[str, SessionHistory] = {}
+
+
+def current_history(session_id: str, session_version: int) -> SessionHistory | None:
+    """
+    The session's history, or None if there is none or it is stale: with a
+    shared session backend another worker may have changed the session
+    since, and this worker's versions no longer lead up to its data.
+    """
+    history = HISTORIES.get(session_id)
+    if history is not None and history.session_version not in (None, session_version):
+        logger.info(f"Session {session_id} changed in another worker, restarting its history")
+        del HISTORIES[session_id]
+        return None
+    return history
+
+
+def history_for(session_id: str, df: pd.DataFrame, session_version: int | None = None) -> SessionHistory:
+    """The session's history, started from `df` on first use (or when stale)."""
+    history = current_history(session_id, session_version) if session_version is not None else HISTORIES.get(session_id)
+    if history is None:
+        history = HISTORIES[session_id] = SessionHistory(df)
+    return history
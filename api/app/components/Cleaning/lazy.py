@@ -0,0 +1,167 @@
+import os
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+from app.utils.dtypes import compact_frame, has_typed_strings, widen_frame
+from app.utils.metrics import stage
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+# Run instructions lazily (on a sample) unless the request says otherwise
+CLEAN_LAZY = os.getenv("CLEAN_LAZY", "false").lower() in ("1", "true", "yes")
+# Frames up to this many rows are always cleaned eagerly
+CLEAN_SAMPLE_ROWS = int(os.getenv("CLEAN_SAMPLE_ROWS", "10000"))
+# Leading rows always in the sample, so the preview shows the real head
+CLEAN_SAMPLE_HEAD_ROWS = 100
+
+
+class ReplayError(Exception):
+    """An operation from the log failed when replayed on the full frame."""
+
+    def __init__(self, index: int, code: str, error: Exception):
+        super().__init__(f"Operation {index + 1} failed on the full dataset: {error}")
+        self.index = index
+        self.code = code
+        self.error = error
+
+
+class CleaningPlan:
+    """
+    Cleaning operations recorded for a session but not yet applied to its
+    full frame. `result` is the sample with every operation applied, which
+    is what previews and validation run against. Both are let go while the
+    session is spilled (see release) and rebuilt from the full frame on
+    next use; the operations themselves are always kept.
+    """
+
+    def __init__(self, sample: pd.DataFrame, total_rows: int):
+        self.sample = sample
+        self.result = sample
+        self.sample_rows = len(sample)
+        self.total_rows = total_rows
+        self.ops: list[dict] = []
+        self.undone: list[dict] = []
+
+    def record(self, op: dict, result: pd.DataFrame) -> None:
+        self.ops.append(op)
+        self.result = result if self.sample is not None else None
+        self.undone.clear()
+
+    def undo(self) -> dict | None:
+        """Drop the last pending operation, keeping it for redo."""
+        if not self.ops:
+            return None
+        op = self.ops.pop()
+        self.undone.append(op)
+        self._replay()
+        return op
+
+    def redo(self) -> dict | None:
+        if not self.undone:
+            return None
+        op = self.undone.pop()
+        self.ops.append(op)
+        self._replay()
+        return op
+
+    def release(self) -> None:
+        """Let go of the sample frames; preview() rebuilds them."""
+        self.sample = self.result = None
+
+    def preview(self, load) -> pd.DataFrame:
+        """
+        `result`, rebuilt from the full frame `load()` returns if the plan
+        was released. The operations ran on this sample before, so
+        replaying them again doesn't fail.
+        """
+        result = self.result
+        if result is None:
+            sample = representative_sample(load(), self.sample_rows)
+            result = replay(sample, self.ops)
+            self.sample, self.result = sample, result
+        return result
+
+    def _replay(self) -> None:
+        sample = self.sample
+        self.result = replay(sample, self.ops) if sample is not None else None
+
+    def describe(self) -> dict:
+        return {
+            "pending_ops": len(self.ops),
+            "undone_ops": len(self.undone),
+            "sample_rows": self.sample_rows,
+            "total_rows": self.total_rows,
+            "ops": self.ops,
+        }
+
+
+def representative_sample(df: pd.DataFrame, n_rows: int = CLEAN_SAMPLE_ROWS, seed: int = 42) -> pd.DataFrame:
+    """
+    The first rows of `df` plus a uniform random sample of the rest, kept in
+    the original row order.
+    """
+    if len(df) <= n_rows:
+        return df
+    head = min(CLEAN_SAMPLE_HEAD_ROWS, n_rows)
+    rng = np.random.default_rng(seed)
+    rest = rng.choice(np.arange(head, len(df)), size=n_rows - head, replace=False)
+    positions = np.concatenate([np.arange(head), np.sort(rest)])
+    return df.iloc[positions]
+
+
+def run_code(code: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Execute generated cleaning code against a copy of `df` and return the
+    resulting frame, compacted again so the session keeps its ingest
+    dtypes. The code sees 64-bit numbers, whatever they are stored as.
+    Code that fails on categorical or Arrow string columns (e.g. filling
+    in a new category) is retried on plain object columns.
+    """
+    with stage("exec"):
+        try:
+            # Widening and the defensive copy in one pass over the columns
+            result = _exec(code, widen_frame(df, copy=True))
+        except (TypeError, ValueError) as e:
+            if not has_typed_strings(df):
+                raise
+            logger.info(f"Retrying cleaning code on object columns after: {e}")
+            # From the untouched input: the failed attempt may have changed
+            # its copy before raising
+            result = _exec(code, widen_frame(df, strings=True, copy=True))
+    with stage("compact"):
+        return compact_frame(result)[0]
+
+
+def _exec(code: str, df: pd.DataFrame) -> pd.DataFrame:
+    local_vars = {"df": df, "pd": pd}
+    exec(code, {}, local_vars)
+    result = local_vars["df"]
+    if not isinstance(result, pd.DataFrame):
+        raise TypeError(f"code left df as {type(result).__name__}, not a DataFrame")
+    return result
+
+
+def replay(df: pd.DataFrame, ops: list[dict], on_step=None) -> pd.DataFrame:
+    """
+    Apply the logged operations to the full frame in order, in one pass.
+    `on_step(i, df)`, if given, is called after each operation and returns
+    the frame the next one runs on (the history keeps each step).
+    """
+    for i, op in enumerate(ops):
+        try:
+            # Each step gets a fresh copy so a failed attempt can be retried
+            # on the untouched input
+            df = run_code(op["code"], df)
+        except Exception as e:
+            raise ReplayError(i, op["code"], e)
+        if on_step is not None:
+            df = on_step(i, df)
+    return df
+
+
+PLANS: dict[str, CleaningPlan] = {}
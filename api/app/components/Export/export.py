@@ -0,0 +1,238 @@
+import asyncio
+import os
+import re
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.components.Cleaning.clean import materialize
+from app.logging.logging_config import setup_logger
+from app.utils.serialize import NDJSON, dumps, records
+from app.utils.session import SESSIONS
+from app.utils.storage import arrow_chunks
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+# Rows serialized at a time; bounds the memory an export holds
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "50000"))
+
+# format -> (media type, file extension)
+FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+    "ndjson": (NDJSON, ".ndjson"),
+}
+# compression -> (media type, file extension). Parquet is compressed
+# column by column with the codec instead of being wrapped in it.
+COMPRESSIONS = {
+    "none": None,
+    "gzip": ("application/gzip", ".gz"),
+    "zstd": ("application/zstd", ".zst"),
+}
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class _Sink:
+    """
+    Write-only file that hands out what was written so far. Keeps counting
+    positions across drains, since the Parquet footer records offsets.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def _text_chunks(df: pd.DataFrame, fmt: str) -> Iterator[bytes]:
+    if fmt == "csv":
+        # At least one chunk, so an empty frame still gets its header
+        for start in range(0, max(len(df), 1), EXPORT_CHUNK_ROWS):
+            yield df.iloc[start:start + EXPORT_CHUNK_ROWS].to_csv(index=False, header=start == 0).encode()
+    else:
+        for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+            rows = records(df.iloc[start:start + EXPORT_CHUNK_ROWS])
+            yield b"\n".join(dumps(row) for row in rows) + b"\n"
+
+
+def encode(df: pd.DataFrame, fmt: str, compression: str) -> Iterator[bytes]:
+    """
+    The export of `df` as a sequence of byte chunks. The output only
+    depends on the frame, format and compression, so a byte range of it
+    can be produced again later.
+    """
+    sink = _Sink()
+    if fmt == "parquet":
+        schema, tables = arrow_chunks(df, EXPORT_CHUNK_ROWS)
+        writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression=compression)
+        for table in tables:
+            writer.write_table(table)
+            yield sink.drain()
+        writer.close()
+        yield sink.drain()
+        return
+
+    out = pa.PythonFile(sink, mode="w")
+    if compression != "none":
+        out = pa.CompressedOutputStream(out, compression)
+    for piece in _text_chunks(df, fmt):
+        out.write(piece)
+        data = sink.drain()
+        if data:
+            yield data
+    out.close()
+    yield sink.drain()
+
+
+def etag(session_id: str, version: int, fmt: str, compression: str) -> str:
+    return f'"{session_id}-v{version}-{fmt}-{compression}"'
+
+
+def _size_key(fmt: str, compression: str) -> str:
+    return f"export_size:{fmt}:{compression}"
+
+
+def _remember_size(session_id: str, version: int, fmt: str, compression: str, size: int) -> None:
+    # Kept with the session version, so every worker sees it and it goes
+    # away with the version
+    SESSIONS.annotate(session_id, version, _size_key(fmt, compression), size)
+
+
+def known_size(session_id: str, version: int, fmt: str, compression: str) -> int | None:
+    return SESSIONS.annotation(session_id, version, _size_key(fmt, compression))
+
+
+def measure(df: pd.DataFrame, fmt: str, compression: str) -> int:
+    """Byte length of the export, by serializing it without keeping the bytes."""
+    return sum(len(data) for data in encode(df, fmt, compression))
+
+
+def stream(df: pd.DataFrame, fmt: str, compression: str, session_id: str, version: int, start: int = 0, end: int | None = None) -> Iterator[bytes]:
+    """Bytes [start, end] (inclusive; to the end when None) of the export."""
+    position = 0
+    for data in encode(df, fmt, compression):
+        chunk_start, position = position, position + len(data)
+        if position <= start:
+            continue
+        if end is not None and chunk_start > end:
+            return
+        lo = max(start - chunk_start, 0)
+        hi = len(data) if end is None else min(end + 1 - chunk_start, len(data))
+        if hi > lo:
+            yield data[lo:hi]
+    _remember_size(session_id, version, fmt, compression, position)
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    The inclusive byte range a `Range` header asks for, or None when it
+    should be ignored (not a single bytes range). Raises a 416 when the
+    range lies outside the export.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if match is None or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail=f"Range not satisfiable; the export is {size} bytes",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+async def export(session_id: str, fmt: str = "csv", compression: str = "none", range_header: str | None = None, if_range: str | None = None):
+    """
+    Stream a session's dataset, pending cleaning operations applied, as
+    CSV, Parquet or NDJSON, optionally gzip- or zstd-compressed. Nothing
+    is written to disk; chunks are serialized as the client reads them.
+
+    A request with a single satisfiable `Range` (and no `If-Range`, or one
+    matching the current ETag) gets those bytes (206), so interrupted
+    downloads resume; a range past the end gets a 416. Everything else,
+    including a resume against an older version of the data, gets the
+    whole export (200). The size of each version's export is stored with
+    the session once known; the first range request before any complete
+    download serializes the export once to learn it.
+    """
+    fmt, compression = fmt.lower(), compression.lower()
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {fmt!r}; use one of {list(FORMATS)}")
+    if compression not in COMPRESSIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown compression {compression!r}; use one of {list(COMPRESSIONS)}")
+    if session_id not in SESSIONS:
+        raise HTTPException(status_code=404, detail="Invalid session_id")
+
+    df = await materialize(session_id)
+    version = SESSIONS.version(session_id)
+    tag = etag(session_id, version, fmt, compression)
+
+    media_type, suffix = FORMATS[fmt]
+    if compression != "none" and fmt != "parquet":
+        media_type, extension = COMPRESSIONS[compression]
+        suffix += extension
+    headers = {
+        "Content-Disposition": f'attachment; filename="cleaned_{session_id}{suffix}"',
+        "ETag": tag,
+        "Accept-Ranges": "bytes",
+    }
+    size = known_size(session_id, version, fmt, compression)
+
+    # A resume against an older version of the data gets the whole new file
+    if range_header and (not if_range or if_range == tag):
+        if size is None:
+            size = await asyncio.to_thread(measure, df, fmt, compression)
+            _remember_size(session_id, version, fmt, compression, size)
+        byte_range = parse_range(range_header, size)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                stream(df, fmt, compression, session_id, version, start, end), status_code=206, media_type=media_type, headers=headers
+            )
+
+    if size is not None:
+        headers["Content-Length"] = str(size)
+    logger.info(f"Exporting session {session_id} as {fmt} ({compression}), {len(df)} rows")
+    return StreamingResponse(stream(df, fmt, compression, session_id, version), media_type=media_type, headers=headers)
@@ -1,9 +1,13 @@
+import asyncio
 import os
-import tempfile
-import json
-import requests
 import pandas as pd
-from fastapi import APIRouter, HTTPException, Query
+import pyarrow as pa
+from app.utils.hub_cache import HUB_CACHE
+from app.utils.metrics import stage
+from app.utils.serialize import ARROW_STREAM, JSON, FastJSONResponse, arrow_stream, ndjson_stream, negotiate, records
+from app.utils.storage import DATASET_SUFFIX, iter_batches, read_page
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
     
 load_dotenv()
@@ -11,40 +15,129 @@ load_dotenv()
 router = APIRouter()
 
 HF_REPO_ID = os.getenv("HF_DATA_REPO")
-HF_TOKEN = os.getenv("HF_TOKEN")
-BASE_URL = f"https://huggingface.co/datasets/{HF_REPO_ID}/resolve/main/uploads"
 
+PREVIEW_DEFAULT_LIMIT = 50
+PREVIEW_MAX_LIMIT = 1000
+# Rows parsed per chunk when streaming a legacy CSV upload
+STREAM_CSV_CHUNK_ROWS = 64_000
 
-@router.get("/get-file")
-async def get_file(filename: str = Query(..., description="Filename to extract from Hugging Face dataset")):
-    try:
-        file_url = f"{BASE_URL}/{filename}.csv"
 
-        headers = {}
-        if HF_TOKEN:
-            headers["Authorization"] = f"Bearer {HF_TOKEN}"
+def _read_legacy_csv_page(path, offset: int, limit: int, columns: list[str] | None):
+    # CSV has no row index to seek on; skip the leading rows without
+    # materializing them and stop parsing once the page is full.
+    all_columns = pd.read_csv(path, nrows=0).columns.tolist()
+    if columns is not None:
+        missing = [c for c in columns if c not in all_columns]
+        if missing:
+            raise KeyError(f"Unknown columns: {missing}")
+    df = pd.read_csv(path, skiprows=range(1, offset + 1), nrows=limit, usecols=columns)
+    if columns is not None:
+        df = df[columns]
+    return df, None, all_columns
+
+
+def _iter_legacy_csv_batches(path, offset: int, limit: int | None, columns: list[str] | None):
+    all_columns = pd.read_csv(path, nrows=0).columns.tolist()
+    if columns is not None:
+        missing = [c for c in columns if c not in all_columns]
+        if missing:
+            raise KeyError(f"Unknown columns: {missing}")
+    # Typed from the first chunk; later chunks are cast to it
+    first = pd.read_csv(path, skiprows=range(1, offset + 1), nrows=min(limit or STREAM_CSV_CHUNK_ROWS, STREAM_CSV_CHUNK_ROWS), usecols=columns)
+    if columns is not None:
+        first = first[columns]
+    schema = pa.Schema.from_pandas(first, preserve_index=False)
+
+    def batches():
+        reader = pd.read_csv(path, skiprows=range(1, offset + 1), nrows=limit, usecols=columns, chunksize=STREAM_CSV_CHUNK_ROWS)
+        with reader:
+            for chunk in reader:
+                if columns is not None:
+                    chunk = chunk[columns]
+                yield from pa.Table.from_pandas(chunk, preserve_index=False).cast(schema).to_batches()
 
-        response = requests.get(file_url, headers=headers)
+    return schema, batches(), None, all_columns
 
-        if response.status_code != 200:
-            raise HTTPException(status_code=404, detail=f"File not found at {file_url}")
 
-        # Save temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
-            tmp.write(response.content)
-            tmp_path = tmp.name
+def _stream(media_type: str, schema, batches, total_rows):
+    body = arrow_stream(schema, batches) if media_type == ARROW_STREAM else ndjson_stream(batches)
+    headers = {"Vary": "Accept"}
+    if total_rows is not None:
+        headers["X-Total-Rows"] = str(total_rows)
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+@router.get("/get-file")
+async def get_file(
+    filename: str = Query(..., description="Filename to extract from Hugging Face dataset"),
+    offset: int = Query(0, ge=0, description="Index of the first row to return"),
+    limit: int | None = Query(
+        None, ge=1, description=f"Number of rows to return (JSON: default {PREVIEW_DEFAULT_LIMIT}, at most {PREVIEW_MAX_LIMIT}; streams: all)"
+    ),
+    columns: str | None = Query(None, description="Comma-separated list of columns to return"),
+    format: str | None = Query(None, description="json, ndjson or arrow; overrides the Accept header"),
+    accept: str | None = Header(None),
+):
+    """
+    A page of rows as JSON (the default), or with `Accept:
+    application/x-ndjson` / `application/vnd.apache.arrow.stream` (or
+    ?format=) the rows streamed as NDJSON or an Arrow IPC stream, a row
+    group at a time, for reading whole datasets.
+    """
+    try:
+        selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else None
+        try:
+            media_type = negotiate(accept, format)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if media_type == JSON:
+            limit = PREVIEW_DEFAULT_LIMIT if limit is None else limit
+            if limit > PREVIEW_MAX_LIMIT:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"limit is at most {PREVIEW_MAX_LIMIT} for JSON; request NDJSON or Arrow to read more rows",
+                )
+
+        path_in_repo = f"uploads/{filename}{DATASET_SUFFIX}"
+        try:
+            try:
+                path = await asyncio.to_thread(HUB_CACHE.fetch, HF_REPO_ID, path_in_repo)
+                legacy = False
+            except FileNotFoundError:
+                # Files uploaded before the switch to Parquet are still CSV
+                try:
+                    path = await asyncio.to_thread(HUB_CACHE.fetch, HF_REPO_ID, f"uploads/{filename}.csv")
+                    legacy = True
+                except FileNotFoundError:
+                    raise HTTPException(status_code=404, detail=f"File not found: {HF_REPO_ID}/{path_in_repo}")
 
-        # Load with pandas
-        df = pd.read_csv(tmp_path)
+            if media_type != JSON:
+                read = _iter_legacy_csv_batches if legacy else iter_batches
+                schema, batches, total_rows, _ = read(path, offset, limit, selected)
+                return _stream(media_type, schema, batches, total_rows)
 
-        # Clean data for JSON
-        df = df.replace([float("inf"), float("-inf")], None)
-        df = df.where(pd.notnull(df), None)
+            with stage("read_page"):
+                read = _read_legacy_csv_page if legacy else read_page
+                df, total_rows, all_columns = read(path, offset, limit, selected)
+        except KeyError as e:
+            raise HTTPException(status_code=400, detail=e.args[0])
 
-        json_str = df.head(50).to_json(orient="records", force_ascii=False, default_handler=str)
-        records = json.loads(json_str)
+        with stage("serialize"):
+            rows = records(df)
 
-        return {"filename": filename, "records": records}
+        end = offset + len(rows)
+        has_more = len(rows) == limit and (total_rows is None or end < total_rows)
+        return FastJSONResponse({
+            "filename": filename,
+            "offset": offset,
+            "limit": limit,
+            "total_rows": total_rows,
+            "columns": all_columns,
+            "next_offset": end if has_more else None,
+            "records": rows,
+        }, headers={"Vary": "Accept"})
 
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
@@ -0,0 +1,149 @@
+import json
+import tempfile
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.utils.dtypes import arrow_types_mapper
+from app.utils.metrics import count_bytes, stage
+
+# Bytes copied from the request body per read
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Rows parsed per DataFrame chunk for formats that can be read incrementally
+INGEST_CHUNK_ROWS = 100_000
+# Longest first line read when telling JSON lines from a JSON document
+JSON_LINES_PROBE_BYTES = 1024 * 1024
+
+CHUNKED_SUFFIXES = {".csv", ".parquet", ".sas7bdat", ".json"}
+
+file_types = [
+    ".csv",
+    ".xls",
+    ".xlsx",
+    ".json",
+    ".parquet",
+    ".h5",
+    ".feather",
+    ".orc",
+    ".dta",
+    ".sas7bdat",
+    ".sav",
+    ".html"
+]
+
+allowed_file_types = set(file_types)
+
+
+def _read_sav(path):
+    # SPSS files are rare; don't load pyreadstat at startup for them
+    import pyreadstat
+
+    return pyreadstat.read_sav(path)[0]
+
+
+READERS = {
+    ".csv": pd.read_csv,
+    ".xls": pd.read_excel,
+    ".xlsx": pd.read_excel,
+    ".json": pd.read_json,
+    ".parquet": pd.read_parquet,
+    ".h5": pd.read_hdf,
+    ".feather": pd.read_feather,
+    ".orc": pd.read_orc,
+    ".dta": pd.read_stata,
+    ".sas7bdat": pd.read_sas,
+    ".sav": _read_sav,
+    ".html": lambda path: pd.read_html(path)[0],
+}
+
+
+async def spool_upload(file, suffix: str) -> Path:
+    """
+    Copy an UploadFile to a temporary file UPLOAD_CHUNK_BYTES at a time,
+    so the request body is never held in memory as a whole.
+    """
+    received = 0
+    with stage("receive_upload"), tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_f:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            tmp_f.write(chunk)
+            received += len(chunk)
+    count_bytes("receive_upload", "in", received)
+    return Path(tmp_f.name)
+
+
+def _looks_like_json_lines(path: Path) -> bool:
+    # JSON lines: the first line is a complete object on its own and more
+    # lines follow. A pretty-printed or single-line document is left to
+    # the regular JSON reader.
+    lines = []
+    with open(path, "rb") as f:
+        for line in iter(lambda: f.readline(JSON_LINES_PROBE_BYTES), b""):
+            if line.strip():
+                lines.append(line.strip())
+            if len(lines) == 2:
+                break
+    if len(lines) < 2 or not lines[0].startswith(b"{"):
+        return False
+    try:
+        return isinstance(json.loads(lines[0]), dict)
+    except ValueError:
+        return False
+
+
+def iter_frames(path: Path, suffix: str, chunk_rows: int = INGEST_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yield the contents of a spooled upload as DataFrame chunks.
+
+    CSV, JSON lines, Parquet and SAS are read incrementally; the remaining
+    formats have no chunked reader in pandas and come back as one frame.
+    """
+    if suffix == ".csv":
+        with pd.read_csv(path, chunksize=chunk_rows) as reader:
+            yield from reader
+    elif suffix == ".parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif suffix == ".sas7bdat":
+        with pd.read_sas(path, chunksize=chunk_rows) as reader:
+            yield from reader
+    elif suffix == ".json" and _looks_like_json_lines(path):
+        with pd.read_json(path, lines=True, chunksize=chunk_rows) as reader:
+            yield from reader
+    else:
+        yield READERS[suffix](str(path))
+
+
+def read_frame(path: Path, suffix: str) -> pd.DataFrame:
+    """
+    Read a spooled upload into a single DataFrame.
+
+    Chunks are parked as Arrow tables while reading and assembled with one
+    self-destructing conversion, so peak memory stays close to the size of
+    the final frame instead of the frame plus a full list of pandas chunks.
+    """
+    if suffix not in CHUNKED_SUFFIXES:
+        return READERS[suffix](str(path))
+
+    tables = []
+    chunks = iter_frames(path, suffix)
+    for chunk in chunks:
+        try:
+            tables.append(pa.Table.from_pandas(chunk, preserve_index=False))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            # Mixed-type object columns can't be represented in Arrow; fall
+            # back to a plain pandas concat for this upload.
+            frames = [t.to_pandas() for t in tables] + [chunk] + list(chunks)
+            return pd.concat(frames, ignore_index=True)
+    if not tables:
+        return pd.DataFrame()
+
+    try:
+        table = pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pd.concat([t.to_pandas() for t in tables], ignore_index=True)
+
+    del tables, chunk
+    return table.to_pandas(self_destruct=True, split_blocks=True, types_mapper=arrow_types_mapper)
@@ -1,19 +1,35 @@
+import asyncio
 from fastapi import APIRouter, UploadFile, File, HTTPException
-import pandas as pd
+from pathlib import Path
 import uuid
 from app.utils.session import SESSIONS
+from app.components.Upload.ingest import READERS, read_frame, spool_upload
+from app.utils.dtypes import compact_frame, memory_report
+from app.utils.metrics import stage
+from app.utils.serialize import preview
 
 
 
 async def upload(file: UploadFile = File(...)):
     try:
-        df = pd.read_csv(file.file)  # read CSV
+        suffix = Path(file.filename or "").suffix.lower()
+        if suffix not in READERS:
+            suffix = ".csv"
+        tmp_path = await spool_upload(file, suffix)
+        try:
+            with stage("parse"):
+                df = await asyncio.to_thread(read_frame, tmp_path, suffix)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        with stage("compact"):
+            df, compaction = await asyncio.to_thread(compact_frame, df)
         session_id = str(uuid.uuid4())
         SESSIONS[session_id] = df
         return {
             "message": "File uploaded successfully",
             "session_id": session_id,
-            "preview":  df.head().to_json(orient="records")
+            "preview": preview(df),
+            "memory": memory_report([compaction]),
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
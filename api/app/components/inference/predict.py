@@ -0,0 +1,283 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sklearn.pipeline import Pipeline
+
+from app.logging.logging_config import setup_logger
+from app.utils.artifact import load_model
+from app.utils.hub_cache import HUB_CACHE
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+PREDICT_MAX_MODELS = int(os.getenv("PREDICT_MAX_MODELS", "8"))
+# Requests arriving within this window are scored in one predict call
+PREDICT_BATCH_WAIT_MS = float(os.getenv("PREDICT_BATCH_WAIT_MS", "2"))
+PREDICT_MAX_BATCH_ROWS = int(os.getenv("PREDICT_MAX_BATCH_ROWS", "4096"))
+LATENCY_WINDOW = 10000
+
+MODEL_REPO_ID = "prthm20/ZeoMl"
+LOCAL_MODEL_DIR = Path("models")
+
+
+class LatencyTracker:
+    """Rolling window of request latencies and batch sizes."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.latencies_ms = deque(maxlen=window)
+        self.batch_rows = deque(maxlen=window)
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+
+    def record_request(self, latency_ms: float, rows: int) -> None:
+        self.latencies_ms.append(latency_ms)
+        self.requests += 1
+        self.rows += rows
+
+    def record_batch(self, rows: int) -> None:
+        self.batch_rows.append(rows)
+        self.batches += 1
+
+    def summary(self) -> dict:
+        lat = np.fromiter(self.latencies_ms, dtype=float)
+        return {
+            "requests": self.requests,
+            "rows": self.rows,
+            "batches": self.batches,
+            "mean_batch_rows": float(np.mean(self.batch_rows)) if self.batch_rows else None,
+            "p50_ms": float(np.percentile(lat, 50)) if lat.size else None,
+            "p99_ms": float(np.percentile(lat, 99)) if lat.size else None,
+        }
+
+
+class LoadedModel:
+    """A deserialized model artifact and the batcher scoring it."""
+
+    def __init__(self, name: str, estimator, path: Path):
+        self.name = name
+        self.estimator = estimator
+        self.path = path
+        self.loaded_at = time.time()
+        self.stats = LatencyTracker()
+        self.batcher = MicroBatcher(self)
+
+        if isinstance(estimator, Pipeline) and "preprocess" in estimator.named_steps:
+            self.preprocessor = estimator.named_steps["preprocess"]
+        else:
+            # Artifacts from before the preprocessor was saved with the
+            # model expect already-encoded feature columns
+            self.preprocessor = None
+
+    def predict(self, frame: pd.DataFrame) -> list:
+        preds = self.estimator.predict(frame)
+        if self.preprocessor is not None:
+            preds = self.preprocessor.decode_target(preds)
+        return np.asarray(preds).tolist()
+
+    def describe(self) -> dict:
+        return {
+            "model": self.name,
+            "estimator": type(self.estimator).__name__,
+            "features": getattr(self.preprocessor, "input_columns_", None),
+            "target_column": getattr(self.preprocessor, "target_column", None),
+            "loaded_at": self.loaded_at,
+            **self.stats.summary(),
+        }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests for one model into a single vectorized
+    predict call.
+
+    The first request to arrive starts a drain task that waits
+    `PREDICT_BATCH_WAIT_MS` for others to join, concatenates everything
+    queued (up to `PREDICT_MAX_BATCH_ROWS` rows), predicts once in a thread
+    and hands each caller its slice of the result.
+    """
+
+    def __init__(self, model: LoadedModel):
+        self.model = model
+        self._pending: deque[tuple[pd.DataFrame, asyncio.Future]] = deque()
+        self._task = None
+
+    async def submit(self, frame: pd.DataFrame) -> list:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((frame, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self) -> None:
+        while self._pending:
+            await asyncio.sleep(PREDICT_BATCH_WAIT_MS / 1000)
+            batch, rows = [], 0
+            while self._pending and (not batch or rows + len(self._pending[0][0]) <= PREDICT_MAX_BATCH_ROWS):
+                frame, future = self._pending.popleft()
+                batch.append((frame, future))
+                rows += len(frame)
+            await self._run(batch, rows)
+
+    async def _run(self, batch, rows: int) -> None:
+        self.model.stats.record_batch(rows)
+        frames = [frame for frame, _ in batch]
+        try:
+            combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            preds = await asyncio.to_thread(self.model.predict, combined)
+        except Exception as e:
+            if len(batch) == 1:
+                _set_exception(batch[0][1], e)
+                return
+            # One bad payload shouldn't fail the requests batched with it
+            for frame, future in batch:
+                try:
+                    _set_result(future, await asyncio.to_thread(self.model.predict, frame))
+                except Exception as single_error:
+                    _set_exception(future, single_error)
+            return
+
+        start = 0
+        for frame, future in batch:
+            _set_result(future, preds[start:start + len(frame)])
+            start += len(frame)
+
+
+def _set_result(future: asyncio.Future, value) -> None:
+    if not future.done():
+        future.set_result(value)
+
+
+def _set_exception(future: asyncio.Future, error: Exception) -> None:
+    if not future.done():
+        future.set_exception(error)
+
+
+class ModelRegistry:
+    """
+    Bounded LRU of deserialized models, so a model is unpickled once and
+    then served from memory until it falls out of the registry.
+    """
+
+    def __init__(self, max_models: int):
+        self.max_models = max_models
+        self._models: "OrderedDict[str, LoadedModel]" = OrderedDict()
+        self._loading: dict[str, asyncio.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+        self.stats = LatencyTracker()
+
+    async def get(self, name: str) -> LoadedModel:
+        model = self._models.get(name)
+        if model is not None:
+            self.hits += 1
+            self._models.move_to_end(name)
+            return model
+
+        lock = self._loading.setdefault(name, asyncio.Lock())
+        try:
+            async with lock:
+                # Someone else may have loaded it while we waited
+                model = self._models.get(name)
+                if model is None:
+                    model = await asyncio.to_thread(self._load, name)
+                    self._models[name] = model
+                    self.loads += 1
+                    while len(self._models) > self.max_models:
+                        evicted, _ = self._models.popitem(last=False)
+                        logger.info(f"Evicted model {evicted} from registry")
+        finally:
+            self._loading.pop(name, None)
+        return model
+
+    def _load(self, name: str) -> LoadedModel:
+        if Path(name).name != name:
+            raise HTTPException(status_code=400, detail="Model name must be a bare filename.")
+        # Trainers save under the name they report as hf_filename, so a model
+        # is found here before its queued upload to the Hub has happened
+        path = LOCAL_MODEL_DIR / name
+        if not path.is_file():
+            try:
+                path = HUB_CACHE.fetch(MODEL_REPO_ID, name, repo_type="dataset")
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail=f"Model {name} not found.")
+        start = time.perf_counter()
+        estimator = load_model(path)
+        logger.info(f"Loaded model {name} in {time.perf_counter() - start:.3f}s")
+        return LoadedModel(name, estimator, path)
+
+    def summary(self) -> dict:
+        models = list(self._models.values())
+        batch_rows = [rows for m in models for rows in m.stats.batch_rows]
+        return {
+            "max_models": self.max_models,
+            "loads": self.loads,
+            "hits": self.hits,
+            **self.stats.summary(),
+            # Batches are counted per model; these totals cover loaded models
+            "batches": sum(m.stats.batches for m in models),
+            "mean_batch_rows": float(np.mean(batch_rows)) if batch_rows else None,
+            "models": [m.describe() for m in models],
+        }
+
+
+def payload_frame(payload: dict) -> pd.DataFrame:
+    """
+    Rows to score from a request body: either row-oriented
+    {"records": [{"col": value, ...}, ...]} (a single {"record": {...}} is
+    accepted too) or columnar {"columns": {"col": [values, ...], ...}}.
+    """
+    if "record" in payload and isinstance(payload["record"], dict):
+        return pd.DataFrame([payload["record"]])
+    if "records" in payload:
+        records = payload["records"]
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise HTTPException(status_code=400, detail="'records' must be a list of objects.")
+        return pd.DataFrame.from_records(records)
+    if "columns" in payload:
+        columns = payload["columns"]
+        if not isinstance(columns, dict) or not all(isinstance(v, list) for v in columns.values()):
+            raise HTTPException(status_code=400, detail="'columns' must map column names to lists.")
+        if len({len(v) for v in columns.values()}) > 1:
+            raise HTTPException(status_code=400, detail="All columns must have the same length.")
+        return pd.DataFrame(columns)
+    raise HTTPException(status_code=400, detail="Provide 'record', 'records' or 'columns'.")
+
+
+async def predict(model_name: str, payload: dict) -> dict:
+    start = time.perf_counter()
+    frame = payload_frame(payload)
+    if frame.empty:
+        raise HTTPException(status_code=400, detail="No rows to predict.")
+
+    model = await REGISTRY.get(model_name)
+    try:
+        if len(frame) >= PREDICT_MAX_BATCH_ROWS:
+            # Already a big batch; nothing to gain from waiting for others
+            model.stats.record_batch(len(frame))
+            preds = await asyncio.to_thread(model.predict, frame)
+        else:
+            preds = await model.batcher.submit(frame)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Prediction failed: {e}")
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    model.stats.record_request(latency_ms, len(frame))
+    REGISTRY.stats.record_request(latency_ms, len(frame))
+    return {
+        "model": model_name,
+        "rows": len(frame),
+        "predictions": preds,
+        "latency_ms": round(latency_ms, 3),
+    }
+
+
+REGISTRY = ModelRegistry(max_models=PREDICT_MAX_MODELS)
@@ -0,0 +1,12 @@
+class TrainingError(Exception):
+    """
+    Training failure carrying the HTTP status the route should answer with.
+    Plain Exception subclass so it survives the trip back from a worker
+    process (HTTPException can't be unpickled). Kept apart from the
+    training code so the server can catch it without loading scikit-learn.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
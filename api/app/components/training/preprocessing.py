@@ -0,0 +1,176 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.preprocessing import LabelEncoder
+
+from app.logging.logging_config import log_payload, setup_logger
+
+logger = setup_logger(__name__)
+
+
+def _is_categorical_like(dtype) -> bool:
+    # Booleans (numpy or nullable, as compact_frame stores object booleans)
+    # are two categories, not a number
+    return (
+        dtype == "object"
+        or isinstance(dtype, pd.CategoricalDtype)
+        or pd.api.types.is_string_dtype(dtype)
+        or pd.api.types.is_bool_dtype(dtype)
+    )
+
+
+def _to_numeric(col: pd.Series) -> pd.Series:
+    col = pd.to_numeric(col, errors="coerce")
+    if isinstance(col.dtype, pd.api.extensions.ExtensionDtype):
+        # Nullable integers can't take the float medians filled in later
+        col = col.astype("float64")
+    return col
+
+
+class TabularPreprocessor(BaseEstimator, TransformerMixin):
+    """
+    The training feature preprocessing as a fitted, reusable transformer.
+
+    Fitting records the input columns, the categories of every text or
+    categorical column, the one-hot feature names and the fill medians, so
+    `transform` produces exactly the training encoding for new rows:
+    unseen categories encode as all zeros and missing columns are filled
+    with the training medians.
+    """
+
+    def __init__(self, target_column=None, target_classes=None):
+        self.target_column = target_column
+        self.target_classes = target_classes
+
+    def fit(self, X, y=None):
+        self.fit_transform(X, y)
+        return self
+
+    def fit_transform(self, X, y=None):
+        X = X.copy()
+        self.input_columns_ = list(X.columns)
+        self.categories_ = {}
+
+        # 1) Convert object columns to category to ensure get_dummies works properly
+        for col in X.columns:
+            if _is_categorical_like(X[col].dtype):
+                X[col] = X[col].astype("category")
+                self.categories_[col] = X[col].cat.categories
+
+        encoded = self._encode(X)
+        self.feature_names_ = list(encoded.columns)
+        self.medians_ = encoded.median(numeric_only=True)
+
+        # 4) Fill NaNs with median of column (numeric_only)
+        return encoded.fillna(self.medians_)
+
+    def transform(self, X):
+        X = X.reindex(columns=self.input_columns_)
+        for col, categories in self.categories_.items():
+            X[col] = pd.Categorical(X[col], categories=categories)
+
+        encoded = self._encode(X).reindex(columns=self.feature_names_, fill_value=0)
+        return encoded.fillna(self.medians_)
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.feature_names_, dtype=object)
+
+    def decode_target(self, y):
+        """Map encoded class predictions back to the original labels."""
+        if self.target_classes is None:
+            return y
+        return np.asarray(self.target_classes, dtype=object)[np.asarray(y, dtype=int)]
+
+    @staticmethod
+    def _encode(X):
+        # 2) One-hot encode categorical columns
+        X = pd.get_dummies(X, drop_first=True)
+
+        # 3) Force all columns to numeric where possible; non-convertible -> NaN
+        return X.apply(_to_numeric)
+
+
+def dataset_fingerprint(df: pd.DataFrame, target_col: str) -> str:
+    """
+    Content hash of a frame plus the target choice. Equal fingerprints mean
+    preprocessing would produce identical features and labels.
+    """
+    h = hashlib.sha256()
+    h.update(target_col.encode())
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return h.hexdigest()
+
+
+def encode_target(y: pd.Series):
+    """
+    Decide the problem type and encode the target for classification.
+    Returns (y, problem_type, classes) where classes is set when string
+    labels were label-encoded.
+    """
+    classes = None
+
+    # === Determine problem type robustly ===
+    # If target is object/categorical -> classification
+    if _is_categorical_like(y.dtype):
+        problem_type = "classification"
+    elif pd.api.types.is_integer_dtype(y.dtype) and len(y.unique()) <= 5:
+        # small integer set -> classification
+        problem_type = "classification"
+    else:
+        problem_type = "regression"
+
+    # === Encode target for classification if needed ===
+    if problem_type == "classification":
+        # Debug: show unique values BEFORE encoding
+        log_payload(
+            logger, "target_before", "Target before encoding: dtype %s, unique values (sample up to 20): %s",
+            lambda: (y.dtype, list(y.unique()[:20])),
+        )
+
+        # If target is text, boolean or not numeric, label encode
+        if _is_categorical_like(y.dtype) or not pd.api.types.is_numeric_dtype(y.dtype):
+            le = LabelEncoder()
+            y_encoded = le.fit_transform(y.astype(str))  # ensure strings
+            y = pd.Series(y_encoded, index=y.index)
+            classes = list(le.classes_)
+            logger.info(f"Label encoding applied. Classes: {classes}")
+        else:
+            # numeric dtype but maybe floats that represent classes
+            # convert floats that are whole numbers to ints
+            if pd.api.types.is_float_dtype(y.dtype) and np.all(np.mod(y.dropna(), 1) == 0):
+                y = y.astype(int)
+            # otherwise leave numeric as-is (may be problematic — but we'll proceed)
+
+        log_payload(
+            logger, "target_after", "Target after encoding: dtype %s, unique: %s",
+            lambda: (y.dtype, list(pd.Series(y).unique()[:20])),
+        )
+
+    return y, problem_type, classes
+
+
+def prepare_training_data(df: pd.DataFrame, target_col: str) -> dict:
+    """
+    Split `df` into the encoded feature matrix and target, fitting the
+    preprocessor on the way. The result is what the feature cache stores.
+    """
+    # === Split X and y ===
+    y = df[target_col]
+    X = df.drop(columns=[target_col])
+
+    y, problem_type, classes = encode_target(y)
+
+    # === Robust feature preprocessing ===
+    preprocessor = TabularPreprocessor(target_column=target_col, target_classes=classes)
+    X = preprocessor.fit_transform(X)
+
+    # Debug: show types and sample after preprocessing
+    log_payload(
+        logger, "features", "Features after preprocessing: dtypes %s\nsample %s",
+        lambda: (X.dtypes.head(20).to_dict(), X.head(5).to_dict()),
+    )
+
+    return {"X": X, "y": y, "problem_type": problem_type, "preprocessor": preprocessor}
@@ -0,0 +1,408 @@
+import json
+import math
+import os
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy import stats
+from sklearn.cluster import KMeans
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.model_selection import KFold, ParameterGrid, ParameterSampler, StratifiedKFold
+
+from app.components.training.train import TrainingError, load_training_frame, prepare_features
+from app.logging.logging_config import setup_logger
+from app.utils.jobs import JOB_MAX_WORKERS, no_progress
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+# Cores used for candidate fits inside one search (-1 = this job's share:
+# up to JOB_MAX_WORKERS searches run at once, one per job worker)
+SEARCH_N_JOBS = int(os.getenv("SEARCH_N_JOBS", "-1"))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "500"))
+
+STRATEGIES = ("grid", "random", "halving")
+
+ESTIMATORS = {
+    "RandomForestClassifier": RandomForestClassifier,
+    "LogisticRegression": LogisticRegression,
+    "RandomForestRegressor": RandomForestRegressor,
+    "LinearRegression": LinearRegression,
+    "KMeans": KMeans,
+}
+
+DEFAULT_HYPERPARAMETERS = {
+    "RandomForestClassifier": {
+        "n_estimators": 100,
+        "max_depth": 5,
+        "min_samples_split": 2,
+        "min_samples_leaf": 1,
+        "random_state": 42
+    },
+    "LogisticRegression": {
+        "penalty": "l2",
+        "C": 1.0,
+        "solver": "lbfgs",
+        "max_iter": 1000,
+        "random_state": 42
+    },
+    "RandomForestRegressor": {
+        "n_estimators": 100,
+        "max_depth": 10,
+        "min_samples_split": 2,
+        "min_samples_leaf": 1,
+        "random_state": 42
+    },
+    "LinearRegression": {
+        "fit_intercept": True,
+        "copy_X": True,
+    },
+    "KMeans": {
+        "n_clusters": 8,
+        "init": "k-means++",
+        "max_iter": 300,
+        "random_state": 42
+    }
+}
+
+# Searched on top of the defaults when the request doesn't bring a space
+DEFAULT_SEARCH_SPACES = {
+    "RandomForestClassifier": {
+        "n_estimators": [50, 100, 200, 400],
+        "max_depth": [None, 5, 10, 20],
+        "min_samples_split": [2, 5, 10],
+        "min_samples_leaf": [1, 2, 4],
+    },
+    "LogisticRegression": {
+        "C": [0.001, 0.01, 0.1, 1.0, 10.0, 100.0],
+    },
+    "RandomForestRegressor": {
+        "n_estimators": [50, 100, 200, 400],
+        "max_depth": [None, 5, 10, 20],
+        "min_samples_split": [2, 5, 10],
+        "min_samples_leaf": [1, 2, 4],
+    },
+    "LinearRegression": {
+        "fit_intercept": [True, False],
+    },
+    "KMeans": {
+        "n_clusters": [2, 3, 4, 5, 6, 8, 10, 12],
+        "init": ["k-means++", "random"],
+    },
+}
+
+
+def _parse_space(space, model_choice):
+    """
+    Search space from the request JSON. Values are lists of choices, or for
+    random/halving search a distribution such as
+    {"distribution": "loguniform", "low": 0.001, "high": 100}
+    ("uniform", "loguniform" and "randint" are supported).
+    """
+    if not space:
+        return DEFAULT_SEARCH_SPACES[model_choice]
+    try:
+        space = json.loads(space) if isinstance(space, str) else space
+    except json.JSONDecodeError as e:
+        raise TrainingError(400, f"Invalid search space JSON: {e}")
+    if not isinstance(space, dict) or not space:
+        raise TrainingError(400, "Search space must be a non-empty JSON object.")
+
+    parsed = {}
+    for name, values in space.items():
+        if isinstance(values, dict):
+            kind = values.get("distribution")
+            try:
+                low, high = values["low"], values["high"]
+            except KeyError:
+                raise TrainingError(400, f"Distribution for '{name}' needs 'low' and 'high'.")
+            if kind == "uniform":
+                parsed[name] = stats.uniform(low, high - low)
+            elif kind == "loguniform":
+                parsed[name] = stats.loguniform(low, high)
+            elif kind == "randint":
+                parsed[name] = stats.randint(low, high + 1)
+            else:
+                raise TrainingError(400, f"Unknown distribution '{kind}' for '{name}'.")
+        elif isinstance(values, list) and values:
+            parsed[name] = values
+        else:
+            raise TrainingError(400, f"Search values for '{name}' must be a non-empty list or a distribution.")
+    return parsed
+
+
+def _candidates(space, strategy, n_iter, random_state):
+    has_distributions = any(not isinstance(v, list) for v in space.values())
+    if strategy == "grid":
+        if has_distributions:
+            raise TrainingError(400, "Grid search needs lists of values, not distributions.")
+        grid = ParameterGrid(space)
+        if len(grid) > SEARCH_MAX_CANDIDATES:
+            raise TrainingError(400, f"Grid has {len(grid)} candidates; the limit is {SEARCH_MAX_CANDIDATES}.")
+        return list(grid)
+
+    if not has_distributions:
+        # Sampling a finite grid: never more candidates than it holds
+        n_iter = min(n_iter, len(ParameterGrid(space)))
+    return list(ParameterSampler(space, n_iter=min(n_iter, SEARCH_MAX_CANDIDATES), random_state=random_state))
+
+
+def _fit_and_score(estimator_cls, params, X, y, train_idx, test_idx):
+    start = time.perf_counter()
+    try:
+        estimator = estimator_cls(**params)
+        if y is None:
+            estimator.fit(X[train_idx])
+            score = estimator.score(X[test_idx])
+        else:
+            estimator.fit(X[train_idx], y[train_idx])
+            score = estimator.score(X[test_idx], y[test_idx])
+        error = None
+    except Exception as e:
+        # Invalid combinations (e.g. a penalty the solver doesn't support,
+        # a misspelt parameter)
+        # lose the round instead of failing the whole search
+        score, error = float("nan"), str(e)
+    return float(score), time.perf_counter() - start, error
+
+
+class _Deadline:
+    def __init__(self, seconds):
+        self.at = time.monotonic() + seconds if seconds else None
+
+    def expired(self):
+        return self.at is not None and time.monotonic() >= self.at
+
+
+def search_n_jobs() -> int:
+    """Processes one search fits candidates on, so concurrent searches don't oversubscribe the cores."""
+    if SEARCH_N_JOBS == -1:
+        return max(1, (os.cpu_count() or 1) // JOB_MAX_WORKERS)
+    return effective_n_jobs(SEARCH_N_JOBS)
+
+
+def _evaluate(candidates, base_params, estimator_cls, X, y, splitter, n_rows, deadline, parallel, batch_size, on_batch):
+    """
+    Cross-validate `candidates` on the first `n_rows` of the (shuffled)
+    training data, fanning (candidate, fold) fits out over the pool in
+    batches so the time budget is checked between batches. `on_batch` gets
+    the number scored so far after each batch. Candidates not reached
+    before the deadline are returned unscored.
+    """
+    Xr, yr = X[:n_rows], None if y is None else y[:n_rows]
+    folds = list(splitter.split(Xr, yr))
+    scored, pending = [], list(candidates)
+    while pending and not deadline.expired():
+        batch, pending = pending[:batch_size], pending[batch_size:]
+        results = parallel(
+            delayed(_fit_and_score)(
+                estimator_cls, {**base_params, **cand["params"]}, Xr, yr, train_idx, test_idx
+            )
+            for cand in batch
+            for train_idx, test_idx in folds
+        )
+        for i, cand in enumerate(batch):
+            fold_results = results[i * len(folds):(i + 1) * len(folds)]
+            scores = np.array([r[0] for r in fold_results])
+            errors = [r[2] for r in fold_results if r[2]]
+            cand["mean_score"] = None if errors else float(scores.mean())
+            cand["std_score"] = None if errors else float(scores.std())
+            cand["fit_time"] = float(sum(r[1] for r in fold_results))
+            cand["n_samples"] = n_rows
+            cand["error"] = errors[0] if errors else None
+            scored.append(cand)
+        on_batch(len(scored))
+    return scored, pending
+
+
+def run_search(
+    session_id,
+    target=None,
+    model_choice=None,
+    strategy="random",
+    space=None,
+    n_iter=20,
+    cv=3,
+    time_budget=None,
+    factor=3,
+    min_samples=None,
+    df=None,
+    snapshot=None,
+    progress=no_progress,
+):
+    """
+    Hyperparameter search for one estimator on a session's data.
+
+    `grid` tries every combination, `random` samples `n_iter` of them and
+    `halving` runs successive halving: all candidates start on a small
+    sample of rows and only the best 1/`factor` move on to `factor` times
+    more data each round. Fits are spread over this job's share of the
+    cores (see search_n_jobs) and progress is reported after each batch of
+    them; once `time_budget` seconds have passed no new fits start and
+    candidates not yet scored are reported as skipped. Returns a ranked
+    leaderboard.
+    """
+    if strategy not in STRATEGIES:
+        raise TrainingError(400, f"Unknown search strategy '{strategy}'. Use one of {list(STRATEGIES)}.")
+    if model_choice is not None and model_choice not in ESTIMATORS:
+        raise TrainingError(400, "Unsupported model name.")
+    if cv < 2:
+        raise TrainingError(400, "cv must be at least 2.")
+    if factor < 2:
+        raise TrainingError(400, "factor must be at least 2.")
+
+    start = time.monotonic()
+    deadline = _Deadline(time_budget)
+
+    progress("loading", 0.0)
+    df, data_source = load_training_frame(session_id, df, snapshot)
+    if df.empty:
+        raise TrainingError(400, "Uploaded dataset is empty.")
+
+    target_col = target if target and target in df.columns else df.columns[-1]
+    progress("preprocessing", 0.05, data_source=data_source)
+    prepared, fingerprint, cache_level = prepare_features(df, target_col)
+    problem_type = prepared["problem_type"]
+
+    if model_choice is None:
+        model_choice = "RandomForestClassifier" if problem_type == "classification" else "RandomForestRegressor"
+    estimator_cls = ESTIMATORS[model_choice]
+    base_params = DEFAULT_HYPERPARAMETERS[model_choice]
+
+    # Shuffle once so every "first n rows" subsample is a random sample
+    rng = np.random.default_rng(42)
+    order = rng.permutation(len(prepared["X"]))
+    X = prepared["X"].to_numpy(dtype=float)[order]
+    y = None if model_choice == "KMeans" else np.asarray(prepared["y"])[order]
+    n_total = len(X)
+
+    if problem_type == "classification" and model_choice in ("RandomForestClassifier", "LogisticRegression"):
+        smallest_class = int(np.bincount(np.unique(y, return_inverse=True)[1]).min())
+        cv = max(2, min(cv, smallest_class))
+        splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=42)
+    else:
+        splitter = KFold(n_splits=cv, shuffle=True, random_state=42)
+    if n_total < cv * 2:
+        raise TrainingError(400, f"Need at least {cv * 2} rows for {cv}-fold search.")
+
+    candidates = [
+        {"id": i, "params": params}
+        for i, params in enumerate(_candidates(_parse_space(space, model_choice), strategy, n_iter, 42))
+    ]
+
+    # Successive-halving schedule: resource per round grows by `factor`
+    # until the full training set, keeping the top 1/`factor` each time.
+    if strategy == "halving":
+        n_rounds = max(1, math.ceil(math.log(len(candidates), factor)) + 1) if len(candidates) > 1 else 1
+        min_rows = min_samples or max(cv * 10, n_total // factor ** (n_rounds - 1))
+        schedule = sorted({min(n_total, min_rows * factor ** r) for r in range(n_rounds - 1)} | {n_total})
+    else:
+        schedule = [n_total]
+
+    n_jobs = search_n_jobs()
+    batch_size = max(1, n_jobs)
+    total_fits = sum(
+        math.ceil(len(candidates) / factor ** r) * cv for r in range(len(schedule))
+    ) if strategy == "halving" else len(candidates) * cv
+    done_fits = 0
+
+    logger.info(
+        f"Search {strategy} over {len(candidates)} {model_choice} candidates, "
+        f"rounds={schedule}, n_jobs={n_jobs}, budget={time_budget}"
+    )
+
+    leaderboard = {}
+    alive = candidates
+    stopped_by_budget = False
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for round_no, n_rows in enumerate(schedule):
+            def on_batch(n_scored):
+                # Also where a cancelled search stops
+                progress(
+                    "searching",
+                    0.1 + 0.85 * (done_fits + n_scored * cv) / max(total_fits, 1),
+                    round=round_no,
+                    candidates=len(alive),
+                    scored=n_scored,
+                    n_samples=n_rows,
+                )
+
+            on_batch(0)
+            scored, skipped = _evaluate(
+                alive, base_params, estimator_cls, X, y, splitter, n_rows, deadline, parallel, batch_size, on_batch
+            )
+            done_fits += len(scored) * cv
+            for cand in scored:
+                leaderboard[cand["id"]] = {**cand, "round": round_no, "status": "completed"}
+            if skipped:
+                stopped_by_budget = True
+                for cand in skipped:
+                    if cand["id"] not in leaderboard:
+                        leaderboard[cand["id"]] = {**cand, "round": round_no, "status": "skipped_budget"}
+                break
+
+            ranked = sorted(
+                (c for c in scored if c["mean_score"] is not None),
+                key=lambda c: c["mean_score"],
+                reverse=True,
+            )
+            if round_no == len(schedule) - 1:
+                break
+            keep = max(1, math.ceil(len(alive) / factor))
+            alive = ranked[:keep]
+            survivors = {c["id"] for c in alive}
+            for cand in scored:
+                if cand["id"] not in survivors:
+                    leaderboard[cand["id"]]["status"] = "eliminated"
+            if not alive:
+                break
+
+    # Rank: candidates that got further (more data) first, then by score
+    rows = sorted(
+        leaderboard.values(),
+        key=lambda c: (
+            c.get("n_samples") or 0,
+            c.get("mean_score") if c.get("mean_score") is not None else -math.inf,
+        ),
+        reverse=True,
+    )
+    results = []
+    for rank, cand in enumerate(rows, start=1):
+        results.append({
+            "rank": rank,
+            "params": {**base_params, **cand["params"]},
+            "mean_score": cand.get("mean_score"),
+            "std_score": cand.get("std_score"),
+            "fit_time": round(cand.get("fit_time", 0.0), 4),
+            "n_samples": cand.get("n_samples"),
+            "round": cand["round"],
+            "status": cand["status"],
+            "error": cand.get("error"),
+        })
+    best = next((r for r in results if r["mean_score"] is not None), None)
+
+    progress("done", 1.0, best_score=best and best["mean_score"])
+    return {
+        "status": "success",
+        "data_source": data_source,
+        "problem_type": problem_type,
+        "target_column": target_col,
+        "model_name": model_choice,
+        "strategy": strategy,
+        "scoring": "neg_inertia" if model_choice == "KMeans" else ("accuracy" if problem_type == "classification" else "r2"),
+        "cv": cv,
+        "n_candidates": len(candidates),
+        "rounds": schedule,
+        "n_jobs": n_jobs,
+        "stopped_by_budget": stopped_by_budget,
+        "elapsed_seconds": round(time.monotonic() - start, 3),
+        "dataset_fingerprint": fingerprint,
+        "preprocessing_cache": cache_level,
+        "best_params": best and best["params"],
+        "best_score": best and best["mean_score"],
+        "leaderboard": results,
+    }
@@ -0,0 +1,502 @@
+import json
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.pipeline import Pipeline
+
+from app.components.training.preprocessing import _is_categorical_like
+from app.components.training.train import HF_REPO_ID, TrainingError, persisted_dataset_path
+from app.logging.logging_config import setup_logger
+from app.utils.artifact import model_filename, save_artifact
+from app.utils.jobs import no_progress
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+# Rows read, encoded and fitted at a time; peak memory scales with this,
+# not with the dataset size
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "100000"))
+# Passes over the training rows
+STREAM_EPOCHS = int(os.getenv("STREAM_EPOCHS", "1"))
+# One-hot columns kept per categorical feature (most frequent values)
+STREAM_MAX_CATEGORIES = int(os.getenv("STREAM_MAX_CATEGORIES", "50"))
+# Columns with more distinct values than this are treated as identifiers
+# and left out, so category counting stays bounded too
+STREAM_MAX_TRACKED_VALUES = int(os.getenv("STREAM_MAX_TRACKED_VALUES", "10000"))
+STREAM_HOLDOUT_FRACTION = float(os.getenv("STREAM_HOLDOUT_FRACTION", "0.2"))
+
+# Incremental learner used for each model the regular trainer offers
+STREAMING_MODELS = {
+    "SGDClassifier": "SGDClassifier",
+    "SGDRegressor": "SGDRegressor",
+    "MiniBatchKMeans": "MiniBatchKMeans",
+    "LogisticRegression": "SGDClassifier",
+    "RandomForestClassifier": "SGDClassifier",
+    "LinearRegression": "SGDRegressor",
+    "RandomForestRegressor": "SGDRegressor",
+    "KMeans": "MiniBatchKMeans",
+}
+
+DEFAULT_STREAMING_PARAMS = {
+    "SGDClassifier": {"loss": "log_loss", "random_state": 42},
+    "SGDRegressor": {"random_state": 42},
+    "MiniBatchKMeans": {"n_clusters": 8, "random_state": 42, "n_init": 3},
+}
+
+
+def _source(session_id, snapshot=None) -> tuple[str, str]:
+    # (path, format) of the file chunks are read from
+    if snapshot is not None:
+        return snapshot["path"], snapshot["format"]
+    return persisted_dataset_path(session_id), "parquet"
+
+
+def dataset_columns(session_id, df=None, snapshot=None) -> list[str]:
+    """Column names of the dataset iter_chunks reads, from its schema alone."""
+    if df is not None:
+        return list(df.columns)
+    path, fmt = _source(session_id, snapshot)
+    if fmt == "pickle":
+        return list(pd.read_pickle(path).columns)
+    schema = pa.ipc.open_file(pa.memory_map(path, "r")).schema if fmt == "arrow" else pq.read_schema(path)
+    # Index columns stored by name; a RangeIndex is stored as a dict
+    index = {c for c in (schema.pandas_metadata or {}).get("index_columns", []) if isinstance(c, str)}
+    return [name for name in schema.names if name not in index]
+
+
+def iter_chunks(session_id, df=None, snapshot=None, columns=None, chunk_rows=None):
+    """
+    The dataset as consecutive frames of at most `chunk_rows` rows: slices
+    of `df` when the caller has it, otherwise record batches read from the
+    session `snapshot` file (an Arrow IPC file is memory-mapped and only
+    the slice being converted is decoded) or the persisted Parquet file,
+    never the whole file at once.
+    """
+    chunk_rows = chunk_rows or STREAM_CHUNK_ROWS
+    if df is None and snapshot is not None and snapshot["format"] == "pickle":
+        # Frames Arrow can't represent are only available whole
+        df = pd.read_pickle(snapshot["path"])
+    if df is not None:
+        if columns is not None:
+            df = df[columns]
+        for start in range(0, len(df), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+        return
+
+    path, fmt = _source(session_id, snapshot)
+    if fmt == "arrow":
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for start in range(0, batch.num_rows, chunk_rows):
+                chunk = batch.slice(start, chunk_rows).to_pandas()
+                yield chunk[columns] if columns is not None else chunk
+        return
+
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+        yield batch.to_pandas()
+
+
+def holdout_mask(start: int, n_rows: int, fraction: float = STREAM_HOLDOUT_FRACTION) -> np.ndarray:
+    """
+    Whether each row (by absolute position) belongs to the holdout. A hash
+    of the position, so every pass over the data agrees without storing
+    the split.
+    """
+    positions = np.arange(start, start + n_rows, dtype=np.uint64)
+    hashed = (positions * np.uint64(2654435761)) % np.uint64(2 ** 32)
+    return hashed < np.uint64(int(fraction * 2 ** 32))
+
+
+class StreamStats:
+    """Column statistics gathered in one pass, in memory bounded by the schema."""
+
+    def __init__(self, target_col: str):
+        self.target_col = target_col
+        self.rows = 0
+        self.numeric: dict[str, np.ndarray] = {}  # count, sum, sum of squares
+        self.counts: dict[str, Counter] = {}
+        self.dropped: set[str] = set()
+        self.target_numeric = None
+        self.target_values: Counter = Counter()
+        self.target_moments = np.zeros(3)
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        self.rows += len(chunk)
+        for col in chunk.columns:
+            if col == self.target_col or col in self.dropped:
+                continue
+            s = chunk[col]
+            if col not in self.numeric and col not in self.counts:
+                if _is_categorical_like(s.dtype):
+                    self.counts[col] = Counter()
+                else:
+                    self.numeric[col] = np.zeros(3)
+            if col in self.numeric:
+                self.numeric[col] += _moments(s)
+            else:
+                self.counts[col].update(s.dropna().astype(str).value_counts().to_dict())
+                if len(self.counts[col]) > STREAM_MAX_TRACKED_VALUES:
+                    logger.info(f"Leaving out high-cardinality column {col}")
+                    del self.counts[col]
+                    self.dropped.add(col)
+
+        y = chunk[self.target_col]
+        if self.target_numeric is None:
+            self.target_numeric = not _is_categorical_like(y.dtype) and pd.api.types.is_numeric_dtype(y.dtype)
+        if self.target_numeric:
+            self.target_moments += _moments(y)
+        if self.target_numeric:
+            # Only needed to tell a small label set from a continuous target
+            if len(self.target_values) <= 5:
+                self.target_values.update(y.dropna().value_counts().to_dict())
+        else:
+            self.target_values.update(y.dropna().astype(str).value_counts().to_dict())
+            if len(self.target_values) > STREAM_MAX_TRACKED_VALUES:
+                raise TrainingError(400, f"Target column {self.target_col} has too many distinct labels to classify")
+
+    def problem_type(self) -> str:
+        # Same rule as the in-memory trainer: text targets and small integer
+        # label sets are classification
+        if not self.target_numeric:
+            return "classification"
+        values = list(self.target_values)
+        if len(values) <= 5 and all(float(v).is_integer() for v in values):
+            return "classification"
+        return "regression"
+
+
+def _moments(s: pd.Series) -> np.ndarray:
+    v = pd.to_numeric(s, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    v = v[~np.isnan(v)]
+    return np.array([len(v), v.sum(), np.square(v).sum()])
+
+
+def _mean_scale(moments: np.ndarray) -> tuple[float, float]:
+    count, total, squares = moments
+    if count == 0:
+        return 0.0, 1.0
+    mean = total / count
+    std = np.sqrt(max(squares / count - mean ** 2, 0.0))
+    return float(mean), float(std) if std > 0 else 1.0
+
+
+class StreamingEncoder(BaseEstimator, TransformerMixin):
+    """
+    Fixed-layout feature encoding for chunked training.
+
+    The layout is decided up front from a statistics pass, so every chunk
+    encodes to the same columns no matter which values it happens to
+    contain: numeric columns are mean-imputed and standardized, categorical
+    columns are one-hot encoded over their most frequent training values
+    (anything else encodes as all zeros). Regression targets are
+    standardized for SGD; `decode_target` maps predictions back.
+    """
+
+    def __init__(self, target_column=None, target_classes=None):
+        self.target_column = target_column
+        self.target_classes = target_classes
+
+    def fit_stats(self, stats: StreamStats, problem_type: str):
+        self.numeric_ = {col: _mean_scale(m) for col, m in stats.numeric.items()}
+        self.categories_ = {
+            col: sorted(v for v, _ in counts.most_common(STREAM_MAX_CATEGORIES))
+            for col, counts in stats.counts.items()
+        }
+        self.input_columns_ = list(self.numeric_) + list(self.categories_)
+        self.feature_names_ = list(self.numeric_) + [
+            f"{col}_{value}" for col, values in self.categories_.items() for value in values
+        ]
+        self.target_scale_ = _mean_scale(stats.target_moments) if problem_type == "regression" else None
+        return self
+
+    def fit(self, X, y=None):
+        """
+        Fit on an in-memory frame: the same statistics pass as streaming
+        training, over `X` in chunks. Without `y` no target is encoded.
+        """
+        target = self.target_column if self.target_column is not None else "__target__"
+        X = X.drop(columns=[target], errors="ignore")
+        stats = StreamStats(target)
+        for start in range(0, len(X), STREAM_CHUNK_ROWS):
+            chunk = X.iloc[start:start + STREAM_CHUNK_ROWS]
+            labels = np.nan if y is None else np.asarray(y)[start:start + STREAM_CHUNK_ROWS]
+            stats.update(chunk.assign(**{target: labels}))
+        return self.fit_stats(stats, "clustering" if y is None else stats.problem_type())
+
+    def transform(self, X):
+        X = X.reindex(columns=self.input_columns_)
+        out = np.zeros((len(X), len(self.feature_names_)), dtype=np.float32)
+        for i, (col, (mean, scale)) in enumerate(self.numeric_.items()):
+            v = pd.to_numeric(X[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            out[:, i] = (np.where(np.isnan(v), mean, v) - mean) / scale
+        offset = len(self.numeric_)
+        rows = np.arange(len(X))
+        for col, values in self.categories_.items():
+            s = X[col]
+            # Via object strings: nullable booleans reject string values
+            codes = pd.Categorical(s.astype(str).where(s.notna()), categories=values).codes
+            known = codes >= 0
+            out[rows[known], offset + codes[known]] = 1.0
+            offset += len(values)
+        return out
+
+    def encode_target(self, y: pd.Series) -> np.ndarray:
+        if self.target_classes is not None:
+            return pd.Categorical(y.astype(str), categories=self.target_classes).codes.astype(int)
+        if self.target_scale_ is not None:
+            mean, scale = self.target_scale_
+            return (pd.to_numeric(y, errors="coerce").to_numpy(dtype=np.float64) - mean) / scale
+        return y.to_numpy()
+
+    def decode_target(self, y):
+        if self.target_classes is not None:
+            return np.asarray(self.target_classes, dtype=object)[np.asarray(y, dtype=int)]
+        if getattr(self, "target_scale_", None) is not None:
+            mean, scale = self.target_scale_
+            return np.asarray(y, dtype=np.float64) * scale + mean
+        return y
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(self.feature_names_, dtype=object)
+
+
+class _StreamedMetrics:
+    """Holdout metrics accumulated chunk by chunk."""
+
+    def __init__(self, problem_type: str, classes=None):
+        self.problem_type = problem_type
+        self.classes = classes
+        self.n = 0
+        self.correct = 0
+        self.confusion = np.zeros((len(classes), len(classes)), dtype=np.int64) if classes is not None else None
+        self.sse = 0.0
+        self.y_moments = np.zeros(3)
+        self.inertia = 0.0
+
+    def update(self, model, X, y):
+        self.n += len(X)
+        if self.problem_type == "clustering":
+            self.inertia += -float(model.score(X))
+            return
+        preds = model.predict(X)
+        if self.problem_type == "classification":
+            self.correct += int((preds == y).sum())
+            np.add.at(self.confusion, (np.searchsorted(self.classes, y), np.searchsorted(self.classes, preds)), 1)
+        else:
+            self.sse += float(np.square(y - preds).sum())
+            self.y_moments += np.array([len(y), y.sum(), np.square(y).sum()])
+
+    def result(self, target_scale=None, labels=None) -> dict:
+        if self.n == 0:
+            return {"holdout_rows": 0}
+        metrics = {"holdout_rows": self.n}
+        if self.problem_type == "clustering":
+            metrics["inertia"] = self.inertia
+        elif self.problem_type == "classification":
+            metrics["accuracy"] = self.correct / self.n
+            report = {}
+            for i, label in enumerate(labels if labels is not None else self.classes):
+                tp = int(self.confusion[i, i])
+                predicted, support = int(self.confusion[:, i].sum()), int(self.confusion[i].sum())
+                precision = tp / predicted if predicted else 0.0
+                recall = tp / support if support else 0.0
+                f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+                report[str(label)] = {"precision": precision, "recall": recall, "f1-score": f1, "support": support}
+            metrics["classification_report"] = report
+        else:
+            # Errors were computed on the standardized target
+            scale = target_scale[1] if target_scale else 1.0
+            count, total, squares = self.y_moments
+            sst = squares - total ** 2 / count
+            metrics["mse"] = float(self.sse / count * scale ** 2)
+            metrics["r2_score"] = float(1 - self.sse / sst) if sst > 0 else 0.0
+        return metrics
+
+
+def _parse_params(params) -> dict:
+    if not params:
+        return {}
+    try:
+        hyperparams = json.loads(params)
+    except Exception:
+        logger.warning(f"Could not parse params JSON: {params}")
+        return {}
+    return hyperparams if isinstance(hyperparams, dict) else {}
+
+
+def run_streaming_training(session_id, target=None, model_choice=None, params=None, df=None, snapshot=None, progress=no_progress):
+    """
+    Out-of-core variant of run_training for datasets larger than memory.
+
+    Reads the dataset in chunks (see iter_chunks) three times: once for
+    column statistics, which fix the feature encoding and target classes,
+    then `epochs` times to fit an incremental learner with partial_fit, and
+    once more to score the hash-selected holdout rows. Only one chunk is
+    ever held, so memory doesn't grow with the number of rows.
+    """
+    progress("loading", 0.0)
+    data_source = "session" if df is not None or snapshot is not None else "persisted"
+    columns = dataset_columns(session_id, df, snapshot)
+    if not columns:
+        raise TrainingError(400, "Uploaded dataset is empty.")
+    target_col = target if target and target in columns else columns[-1]
+
+    hyperparams = _parse_params(params)
+    epochs = int(hyperparams.pop("epochs", STREAM_EPOCHS))
+
+    # === Pass 1: statistics ===
+    progress("profiling", 0.05, data_source=data_source)
+    stats = StreamStats(target_col)
+    for chunk in iter_chunks(session_id, df, snapshot):
+        stats.update(chunk)
+    if stats.rows == 0:
+        raise TrainingError(400, "Uploaded dataset is empty.")
+
+    learner = STREAMING_MODELS.get(model_choice or "")
+    if learner is None and model_choice:
+        raise TrainingError(400, f"{model_choice} can't be trained in streaming mode; use one of {sorted(STREAMING_MODELS)}")
+    problem_type = stats.problem_type()
+    if learner is None:
+        learner = "SGDClassifier" if problem_type == "classification" else "SGDRegressor"
+    if learner == "MiniBatchKMeans":
+        problem_type = "clustering"
+    substitution = None
+    if model_choice and model_choice != learner:
+        # No incremental version of the requested model; say what was trained
+        substitution = f"{model_choice} can't be trained incrementally; trained {learner} instead"
+        logger.info(substitution)
+
+    classes = target_classes = None
+    if problem_type == "classification":
+        if stats.target_numeric:
+            classes = np.array(sorted(float(v) for v in stats.target_values)).astype(int)
+        else:
+            target_classes = sorted(stats.target_values)
+            classes = np.arange(len(target_classes))
+    encoder = StreamingEncoder(target_column=target_col, target_classes=target_classes).fit_stats(stats, problem_type)
+    logger.info(
+        f"Streaming {stats.rows} rows of {session_id} in chunks of {STREAM_CHUNK_ROWS}: "
+        f"{len(encoder.feature_names_)} features, {problem_type}, {learner}"
+    )
+
+    estimator_cls = {"SGDClassifier": SGDClassifier, "SGDRegressor": SGDRegressor, "MiniBatchKMeans": MiniBatchKMeans}[learner]
+    accepted = estimator_cls().get_params()
+    ignored = sorted(k for k in hyperparams if k not in accepted)
+    final_params = {
+        **DEFAULT_STREAMING_PARAMS[learner],
+        **{k: v for k, v in hyperparams.items() if k in accepted},
+    }
+    try:
+        model = estimator_cls(**final_params)
+    except Exception as e:
+        raise TrainingError(400, f"Invalid hyperparameters for {learner}: {e}")
+
+    def batches():
+        start = 0
+        for chunk in iter_chunks(session_id, df, snapshot):
+            mask = holdout_mask(start, len(chunk))
+            start += len(chunk)
+            y = chunk[target_col]
+            keep = y.notna().to_numpy()
+            yield chunk[keep], y[keep], mask[keep]
+
+    # === Passes 2..: incremental fit ===
+    rng = np.random.default_rng(42)
+    trained = chunks = 0
+    total_steps = epochs * max(1, -(-stats.rows // STREAM_CHUNK_ROWS))
+    try:
+        for epoch in range(epochs):
+            for chunk, y, holdout in batches():
+                train = ~holdout
+                if train.any():
+                    # Shuffled within the chunk: SGD dislikes sorted input
+                    order = rng.permutation(int(train.sum()))
+                    X = encoder.transform(chunk[train])[order]
+                    if learner == "MiniBatchKMeans":
+                        if len(X) >= model.n_clusters:
+                            model.partial_fit(X)
+                    elif learner == "SGDClassifier":
+                        model.partial_fit(X, encoder.encode_target(y[train])[order], classes=classes)
+                    else:
+                        model.partial_fit(X, encoder.encode_target(y[train])[order])
+                    if epoch == 0:
+                        trained += len(X)
+                chunks += 1
+                progress("fitting", 0.1 + 0.7 * chunks / total_steps, model=learner, epoch=epoch + 1, rows=trained)
+    except Exception as fit_exc:
+        logger.error(f"Streaming fit failed: {fit_exc}")
+        raise TrainingError(500, f"Model fit failed: {fit_exc}")
+    if trained == 0 or (learner == "MiniBatchKMeans" and not hasattr(model, "cluster_centers_")):
+        raise TrainingError(400, "Not enough rows to train on.")
+
+    # === Last pass: holdout evaluation ===
+    progress("evaluating", 0.8)
+    scores = _StreamedMetrics(problem_type, classes)
+    for chunk, y, holdout in batches():
+        if holdout.any():
+            scores.update(model, encoder.transform(chunk[holdout]), encoder.encode_target(y[holdout]))
+    labels = encoder.target_classes if encoder.target_classes is not None else classes
+    metrics = scores.result(encoder.target_scale_, labels)
+    if learner == "MiniBatchKMeans":
+        metrics["n_clusters"] = model.n_clusters
+
+    # === Save model ===
+    progress("saving", 0.9, metrics=metrics)
+    os.makedirs("models", exist_ok=True)
+    # Same name locally and on the Hub, so /predict finds the local copy
+    hf_filename = model_filename(session_id, learner, getattr(progress, "job_id", None))
+    model_path = f"models/{hf_filename}"
+    save_artifact(
+        Pipeline([("preprocess", encoder), ("model", model)]),
+        model_path,
+        {
+            "session_id": session_id,
+            "model_name": learner,
+            "requested_model": model_choice,
+            "model_substitution": substitution,
+            "training_mode": "streaming",
+            "problem_type": problem_type,
+            "target_column": target_col,
+            "target_classes": encoder.target_classes,
+            "features": encoder.input_columns_,
+            "encoded_features": encoder.feature_names_,
+            "hyperparameters": final_params,
+            "metrics": metrics,
+            "n_rows": stats.rows,
+        },
+    )
+
+    repo_id = HF_REPO_ID
+    return {
+        "status": "success",
+        "training_mode": "streaming",
+        "data_source": data_source,
+        "problem_type": problem_type,
+        "target_column": target_col,
+        "model_name": learner,
+        "requested_model": model_choice,
+        "model_substituted": substitution is not None,
+        "model_substitution": substitution,
+        "hyperparameters_used": {**final_params, "epochs": epochs},
+        "ignored_hyperparameters": ignored,
+        "left_out_columns": sorted(stats.dropped),
+        "rows": stats.rows,
+        "rows_trained": trained,
+        "chunk_rows": STREAM_CHUNK_ROWS,
+        "metrics": metrics,
+        "hf_filename": hf_filename,
+        "huggingface_download_url": f"https://huggingface.co/datasets/{repo_id}/resolve/main/{hf_filename}",
+        "huggingface_status": f"Model upload to Hugging Face queued: {repo_id}/{hf_filename}",
+        "model_path": model_path.replace("\\", "/"),
+    }
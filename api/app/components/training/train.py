@@ -0,0 +1,236 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sklearn.cluster import KMeans
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+
+from app.components.training.errors import TrainingError
+from app.components.training.preprocessing import dataset_fingerprint, prepare_training_data
+from app.logging.logging_config import log_payload, setup_logger
+from app.utils.artifact import model_filename, save_artifact
+from app.utils.feature_cache import FEATURE_CACHE
+from app.utils.hub_cache import HUB_CACHE
+from app.utils.jobs import no_progress
+from app.utils.storage import DATASET_SUFFIX, read_dataset, read_snapshot
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+
+HF_REPO_ID = "prthm20/ZeoMl"
+
+
+def persisted_dataset_path(session_id):
+    filename=f"{session_id}_cleaned{DATASET_SUFFIX}"
+    try:
+        return HUB_CACHE.fetch(HF_REPO_ID, filename, repo_type="dataset")
+    except FileNotFoundError:
+        raise TrainingError(404, f"No cleaned dataset found for session {session_id}")
+
+
+def load_persisted_frame(session_id):
+    return read_dataset(persisted_dataset_path(session_id))
+
+
+def load_training_frame(session_id, df=None, snapshot=None):
+    """
+    The frame a job trains on and where it came from: `df` as given, the
+    session snapshot file (memory-mapped, not a pickled copy), or the
+    persisted cleaned dataset.
+    """
+    if df is not None:
+        return df, "session"
+    if snapshot is not None:
+        return read_snapshot(snapshot), "session"
+    return load_persisted_frame(session_id), "persisted"
+
+
+def prepare_features(df, target_col):
+    """
+    Preprocessed features for `df`, from the feature cache when the same
+    data and target were prepared before. Returns (prepared, fingerprint,
+    cache_level).
+    """
+    fingerprint = dataset_fingerprint(df, target_col)
+    prepared, cache_level = FEATURE_CACHE.get(fingerprint)
+    if prepared is None:
+        prepared = prepare_training_data(df, target_col)
+        FEATURE_CACHE.put(fingerprint, prepared)
+    else:
+        logger.info(f"Reusing preprocessed features for {fingerprint[:12]} ({cache_level} cache)")
+    return prepared, fingerprint, cache_level
+
+
+def run_training(session_id, target=None, model_choice=None, params=None, df=None, snapshot=None, progress=no_progress):
+    """
+    Robust train_model: strong preprocessing & target encoding + debug logs.
+
+    Trains on `df` or the session `snapshot` when the caller has the live
+    session, otherwise on the session's persisted cleaned dataset. Runs synchronously; the job
+    engine calls it in a worker process and passes `progress` to report
+    stage changes (which is also where a cancelled job stops).
+    """
+    # === Read file ===
+    progress("loading", 0.0)
+    df, data_source = load_training_frame(session_id, df, snapshot)
+    progress("loading", 0.1, data_source=data_source)
+    if df.empty:
+        raise TrainingError(400, "Uploaded dataset is empty.")
+
+    # === Determine target column (auto if not provided) ===
+    target_col = target if target and target in df.columns else df.columns[-1]
+
+    # Quick debug: show columns and first rows
+    logger.info("Using target column: %s (%d rows, %d columns)", target_col, len(df), df.shape[1])
+    log_payload(logger, "head", "Columns and head of dataframe: %s\n%s", lambda: (df.columns.tolist(), df.head(5)))
+
+    # === Preprocess (cached by dataset fingerprint) ===
+    progress("preprocessing", 0.2)
+    prepared, fingerprint, cache_level = prepare_features(df, target_col)
+    X, y = prepared["X"], prepared["y"]
+    problem_type = prepared["problem_type"]
+    preprocessor = prepared["preprocessor"]
+
+    # === Final train/test split ===
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+
+    # Debug: shapesx
+    logger.info(f"Shapes -> X_train: {X_train.shape}, X_test: {X_test.shape}, y_train: {y_train.shape}")
+
+    # === Parse hyperparameters safely ===
+    hyperparams = {}
+    if params:
+        try:
+            hyperparams = json.loads(params)
+            if not isinstance(hyperparams, dict):
+                hyperparams = {}
+        except Exception:
+            # if params is not valid JSON, ignore but log
+            logger.warning(f"Could not parse params JSON: {params}")
+            hyperparams = {}
+
+    # === Default and final params (merge) ===
+    default_params = {
+        "RandomForestClassifier": {"random_state": 42},
+        "LogisticRegression": {"max_iter": 1000, "random_state": 42},
+        "RandomForestRegressor": {"random_state": 42},
+        "LinearRegression": {},
+        "KMeans": {"random_state": 42}
+    }
+    final_params = {**default_params.get(model_choice or "", {}), **hyperparams}
+
+    # === Initialize model safely ===
+    if model_choice == "RandomForestClassifier":
+        model = RandomForestClassifier(**final_params)
+    elif model_choice == "LogisticRegression":
+        model = LogisticRegression(**final_params)
+    elif model_choice == "RandomForestRegressor":
+        model = RandomForestRegressor(**final_params)
+    elif model_choice == "LinearRegression":
+        model = LinearRegression(**final_params)
+    elif model_choice == "KMeans":
+        model = KMeans(**final_params)
+    else:
+        # fallback: choose based on problem type
+        if problem_type == "classification":
+            model = RandomForestClassifier(**final_params)
+            model_choice = "RandomForestClassifier"
+        else:
+            model = RandomForestRegressor(**final_params)
+            model_choice = "RandomForestRegressor"
+
+    # === Fit model with try/except to capture the exact failing array ===
+    progress("fitting", 0.4, model=model_choice)
+    try:
+        model.fit(X_train, y_train)
+    except Exception as fit_exc:
+        # dump some debug info and re-raise a readable TrainingError
+        # Check types in X_train and y_train samples
+        dbg = {
+            "X_train_dtypes": X_train.dtypes.apply(lambda t: str(t)).to_dict(),
+            "X_train_sample_first_row": X_train.iloc[0].to_dict() if X_train.shape[0] > 0 else {},
+            "y_train_sample_first": str(y_train.iloc[0]) if y_train.shape[0] > 0 else None,
+            "error": str(fit_exc)
+        }
+        logger.error(f"Model fit failed: {dbg}")
+        raise TrainingError(500, f"Model fit failed: {fit_exc} -- debug: {dbg}")
+
+    # === Predict & metrics ===
+    progress("evaluating", 0.7)
+    metrics = {}
+    if model_choice == "KMeans":
+        metrics["inertia"] = float(model.inertia_)
+        metrics["n_clusters"] = getattr(model, "n_clusters", None)
+    else:
+        preds = model.predict(X_test)
+
+        if problem_type == "classification":
+            # If classifier outputs probabilities / multi-dim array, convert to labels
+            if hasattr(preds, "shape") and getattr(preds, "ndim", 1) > 1 and preds.shape[1] > 1:
+                preds_labels = np.argmax(preds, axis=1)
+            else:
+                # If preds are floats (e.g., sklearn might output floats for some models),
+                # round to nearest integer class
+                preds_labels = np.round(preds).astype(int) if np.issubdtype(preds.dtype, np.floating) else preds
+
+            metrics["accuracy"] = float(accuracy_score(y_test, preds_labels))
+            metrics["classification_report"] = classification_report(y_test, preds_labels, output_dict=True)
+        else:
+            metrics["r2_score"] = float(r2_score(y_test, preds))
+            metrics["mse"] = float(mean_squared_error(y_test, preds))
+
+    # === Save model ===
+    progress("saving", 0.8, metrics=metrics)
+    os.makedirs("models", exist_ok=True)
+    # Same name locally and on the Hub, so /predict finds the local copy
+    hf_filename = model_filename(session_id, model_choice or "model", getattr(progress, "job_id", None))
+    model_path = f"models/{hf_filename}"
+    # Saved together with the fitted preprocessor so raw rows can be scored
+    save_artifact(
+        Pipeline([("preprocess", preprocessor), ("model", model)]),
+        model_path,
+        {
+            "session_id": session_id,
+            "model_name": model_choice,
+            "problem_type": problem_type,
+            "target_column": target_col,
+            "target_classes": preprocessor.target_classes,
+            "features": preprocessor.input_columns_,
+            "encoded_features": preprocessor.feature_names_,
+            "hyperparameters": final_params,
+            "metrics": metrics,
+            "dataset_fingerprint": fingerprint,
+            "n_rows": int(len(X)),
+        },
+    )
+
+    # The upload itself is queued by the parent process once the job is done
+    repo_id = HF_REPO_ID
+    hf_download_url = f"https://huggingface.co/datasets/{repo_id}/resolve/main/{hf_filename}"
+    hf_status = f"Model upload to Hugging Face queued: {repo_id}/{hf_filename}"
+    return {
+        "status": "success",
+        "data_source": data_source,
+        "problem_type": problem_type,
+        "target_column": target_col,
+        "dataset_fingerprint": fingerprint,
+        "preprocessing_cache": cache_level,
+        "model_name": model_choice,
+        "hyperparameters_used": final_params,
+        "metrics": metrics,
+        "hf_filename" : hf_filename,
+        "huggingface_download_url": hf_download_url,
+        "huggingface_status": hf_status,
+        "model_path": model_path.replace("\\", "/")
+    }
+
@@ -1,9 +1,208 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import threading
+import time
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: each process rotates on its own
+    fcntl = None
+
+load_dotenv()
+
+# Level of every app logger; DEBUG payloads aren't even built above it
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+# "json" (default) or "text" for each output
+LOG_FILE_FORMAT = os.getenv("LOG_FILE_FORMAT", "json")
+LOG_CONSOLE_FORMAT = os.getenv("LOG_CONSOLE_FORMAT", "text")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# Records waiting for the writer thread; beyond this new ones are dropped
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# A sampled debug payload is logged at most once per this many seconds per key
+LOG_PAYLOAD_INTERVAL_SECONDS = float(os.getenv("LOG_PAYLOAD_INTERVAL_SECONDS", "60"))
+
+# Id of the HTTP request (or job) being served, set by the request middleware
+REQUEST_ID: ContextVar[str] = ContextVar("request_id", default="-")
+
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] [%(name)s] [%(request_id)s]: %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps each record with the current request id."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = REQUEST_ID.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra={...}` fields become keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, DATE_FORMAT),
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread without formatting them. The
+    stock QueueHandler renders the message in the calling thread; here
+    `%`-style arguments (log_payload values among them) are only turned
+    into text by the writer, off the request path. The listener shares our process, so
+    records don't need to be made picklable either.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on logging
+            self.dropped += 1
+
+
+def _formatter(kind: str) -> logging.Formatter:
+    if kind == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT, datefmt=DATE_FORMAT)
+
+
+class _SharedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Size-based rotation of a log file that several processes append to:
+    every server worker (WEB_CONCURRENCY > 1) and job worker. Each write
+    holds an exclusive lock on `<file>.lock`, reopens the file if another
+    process has rotated it meanwhile, and rotates by the size of the file
+    on disk rather than by what this process wrote, so whichever process
+    crosses LOG_MAX_BYTES rotates and the others follow.
+    """
+
+    def __init__(self, filename, maxBytes, backupCount, encoding=None):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=True)
+        self._lock_file = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if fcntl is None:
+            return super().emit(record)
+        try:
+            if self._lock_file is None:
+                self._lock_file = open(self.baseFilename + ".lock", "a")
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                self._reopen_if_rotated()
+                super().emit(record)
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        except Exception:
+            self.handleError(record)
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.stream is None:
+            self.stream = self._open()
+        if self.maxBytes <= 0:
+            return False
+        # Other processes' writes count too
+        size = os.fstat(self.stream.fileno()).st_size
+        return size > 0 and size + len(self.format(record)) + 1 >= self.maxBytes
+
+    def _reopen_if_rotated(self) -> None:
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (opened.st_dev, opened.st_ino):
+            # Reopened by the next write (delay=True)
+            self.stream.close()
+            self.stream = None
+
+    def close(self) -> None:
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+def _file_handler() -> logging.Handler:
+    handler = _SharedRotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    handler.setFormatter(_formatter(LOG_FILE_FORMAT))
+    return handler
+
+
+_backend_lock = threading.Lock()
+_queue_handler: _DeferredQueueHandler | None = None
+_listener: logging.handlers.QueueListener | None = None
+
+
+def _backend() -> _DeferredQueueHandler:
+    """The process-wide queue handler, starting its writer thread on first use."""
+    global _queue_handler, _listener
+    with _backend_lock:
+        if _queue_handler is None:
+            log_queue = queue.Queue(LOG_QUEUE_SIZE)
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(_formatter(LOG_CONSOLE_FORMAT))
+            _listener = logging.handlers.QueueListener(log_queue, console, _file_handler())
+            _listener.start()
+            atexit.register(stop_logging)
+            handler = _DeferredQueueHandler(log_queue)
+            # Runs in the calling thread, where the request id is known
+            handler.addFilter(RequestIdFilter())
+            _queue_handler = handler
+        return _queue_handler
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the writer thread."""
+    global _listener
+    with _backend_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
 
 def setup_logger(name: str) -> logging.Logger:
     """
-    Creates and configures a logger with console + file output.
+    Creates and configures a logger writing through the shared background
+    log writer (console + rotating file).
 
     Args:
         name (str): The logger's name (usually __name__ of the calling module).
@@ -12,28 +211,66 @@ def setup_logger(name: str) -> logging.Logger:
         logging.Logger: Configured logger instance.
     """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)  # Log everything from DEBUG and above
+    logger.setLevel(LOG_LEVEL)
 
     # Avoid adding duplicate handlers if logger already set
     if logger.handlers:
         return logger
 
-    # Formatter with timestamp, log level, module name
-    formatter = logging.Formatter(
-        "[%(asctime)s] [%(levelname)s] [%(name)s]: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    logger.addHandler(_backend())
+    logger.propagate = False
+    return logger
+
+
+class _PayloadSampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._last: dict[str, float] = {}
+        self._suppressed: dict[str, int] = {}
+        self._lock = threading.Lock()
 
-    # Console Handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    def allow(self, key: str) -> int | None:
+        """Suppressed count since the last allowed one, or None to skip."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last.get(key, float("-inf")) < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return None
+            self._last[key] = now
+            return self._suppressed.pop(key, 0)
 
-    # File Handler
-    file_handler = logging.FileHandler("app.log")
-    file_handler.setLevel(logging.DEBUG)  # Keep detailed logs in file
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
 
-    return logger
\ No newline at end of file
+_SAMPLER = _PayloadSampler(LOG_PAYLOAD_INTERVAL_SECONDS)
+
+
+def _detached(value):
+    # Payloads are small, so copying is cheap; a view such as df.head()
+    # would show later changes to the frame and keep all of it alive
+    copy = getattr(value, "copy", None)
+    return copy() if callable(copy) else value
+
+
+def log_payload(logger: logging.Logger, key: str, message: str, fn, level: int = logging.DEBUG) -> None:
+    """
+    Log an expensive diagnostic payload (a frame's head, a dtype dict...):
+    `message` is a %-format string for the value, or tuple of values, that
+    `fn()` returns. Nothing is built unless `level` is enabled, and at most
+    one payload per `key` is logged every LOG_PAYLOAD_INTERVAL_SECONDS.
+    `fn` runs right away, so the record shows the data as it is now; only
+    turning the values into text is left to the writer thread.
+    """
+    if not logger.isEnabledFor(level):
+        return
+    suppressed = _SAMPLER.allow(f"{logger.name}:{key}")
+    if suppressed is None:
+        return
+    if suppressed:
+        message = f"{message} ({suppressed} similar suppressed)"
+    try:
+        values = fn()
+    except Exception as e:
+        logger.log(level, "%s <unavailable: %s>", message, e)
+        return
+    if not isinstance(values, tuple):
+        values = (values,)
+    logger.log(level, message, *(_detached(v) for v in values))
@@ -1,38 +1,47 @@
 
 from fastapi import APIRouter
-from app.logging.logging_config import setup_logger
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
-from huggingface_hub import HfApi, hf_hub_download
+from app.logging.logging_config import REQUEST_ID, setup_logger
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Query, Header
+import asyncio
 import os
 import pandas as pd
-from sklearn.model_selection import train_test_split
 from dotenv import load_dotenv
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.linear_model import LogisticRegression, LinearRegression
-from sklearn.cluster import KMeans
-import joblib
-import io
-import numpy as np
-from datetime import datetime
-from sklearn.metrics import accuracy_score, r2_score, silhouette_score, classification_report, mean_squared_error
 from app.components.Upload.data_upload import upload_data
 from app.components.Upload.upload import upload
-from app.components.Cleaning.clean import clean_data
-from app.utils.session import SESSIONS
+from app.components.Cleaning.clean import clean_data, discard_plan, materialize, redo_cleaning, undo_cleaning
+from app.components.Cleaning.history import current_history
+from app.components.Cleaning.lazy import PLANS
+from app.components.ExtractFile.extract import PREVIEW_DEFAULT_LIMIT, PREVIEW_MAX_LIMIT, get_file as extract_file
+from app.utils.session import SESSIONS, drop_snapshot
+from app.utils.hub_cache import HUB_CACHE
+from app.utils.hub_client import HUB_CLIENT
+from app.utils.artifact import read_metadata
+from app.utils.upload_queue import UPLOADS
+from app.utils.code_cache import CODE_CACHE
+from app.utils.metrics import METRICS, stage
+from pathlib import Path
+from urllib.parse import urlencode
 from fastapi import Body    
 import json
-from fastapi.responses import FileResponse
-from huggingface_hub import hf_hub_download
-import os
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from concurrent.futures import CancelledError
+from app.components.training.errors import TrainingError
+from app.utils.jobs import JOBS, JobCancelled, sse_format
+from app.utils.startup import STARTUP, import_async
 logger = setup_logger(__name__)
 
 router = APIRouter()
 load_dotenv()
 
-HF_TOKEN = os.getenv("hf_token")
 HF_REPO_ID = "prthm20/ZeoMl"
+# "memory" (default) or "streaming" when /train-model gets no mode
+TRAIN_MODE = os.getenv("TRAIN_MODE", "memory")
 
-api = HfApi()
+# Loaded on first use (see app.utils.startup): they pull in scikit-learn
+TRAIN_MODULE = "app.components.training.train"
+STREAMING_MODULE = "app.components.training.streaming"
+SEARCH_MODULE = "app.components.training.search"
+PREDICT_MODULE = "app.components.inference.predict"
 
 @router.get("/")
 async def home():
@@ -53,13 +62,23 @@ async def upload_file(file: UploadFile = File(...)):
 
 
 @router.get("/get-file")
-async def get_file(filename: str):
-    from app.components.ExtractFile.extract import get_file as extract_file
+async def get_file(
+    filename: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(
+        None, ge=1, description=f"Number of rows to return (JSON: default {PREVIEW_DEFAULT_LIMIT}, at most {PREVIEW_MAX_LIMIT}; streams: all)"
+    ),
+    columns: str = Query(None, description="Comma-separated list of columns to return"),
+    format: str = Query(None, description="json, ndjson or arrow; overrides the Accept header"),
+    accept: str = Header(None),
+):
     try:
-        res = await extract_file(filename)
+        res = await extract_file(filename, offset=offset, limit=limit, columns=columns, format=format, accept=accept)
 
         return res
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
@@ -76,29 +95,261 @@ async def upload_2(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/clean-data")
-async def clean(session_id: str = Body(...), instruction: str = Body(...)):
+async def clean(session_id: str = Body(...), instruction: str = Body(...), lazy: bool = Body(None)):
     try:
-        res = await clean_data(session_id, instruction)
+        res = await clean_data(session_id, instruction, lazy)
 
         return res
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/clean-data/cache")
+async def code_cache_stats():
+    """
+    Entries and hit/miss counters of the generated-cleaning-code cache.
+    """
+    return await asyncio.to_thread(CODE_CACHE.stats)
+
+@router.get("/clean-data/plan")
+async def cleaning_plan(session_id: str):
+    """
+    Cleaning operations recorded lazily and not yet applied to the full data.
+    """
+    if session_id not in SESSIONS:
+        raise HTTPException(status_code=404, detail="Invalid session_id")
+    plan = PLANS.get(session_id)
+    return plan.describe() if plan else {"pending_ops": 0, "ops": []}
+
+
+@router.delete("/clean-data/plan")
+async def discard_cleaning_plan(session_id: str):
+    """
+    Drop the pending lazy operations; the session keeps its last applied data.
+    """
+    return {"discarded_ops": await discard_plan(session_id)}
+
+@router.post("/clean-data/undo")
+async def undo_clean(session_id: str = Body(..., embed=True)):
+    return await undo_cleaning(session_id)
+
+
+@router.post("/clean-data/redo")
+async def redo_clean(session_id: str = Body(..., embed=True)):
+    return await redo_cleaning(session_id)
+
+
+@router.get("/clean-data/history")
+async def cleaning_history(session_id: str):
+    """
+    Cleaning versions of a session with their instruction, code and memory:
+    logical_bytes is a version's full size, owned_bytes what it adds on top
+    of the columns it shares with older versions.
+    """
+    if session_id not in SESSIONS:
+        raise HTTPException(status_code=404, detail="Invalid session_id")
+    history = current_history(session_id, SESSIONS.version(session_id))
+    if history is None:
+        return {"current_version": 0, "can_undo": False, "can_redo": False, "versions": []}
+    return history.describe()
+
+
+@router.get("/clean-data/diff")
+async def cleaning_diff(session_id: str, from_version: int = None, to_version: int = None):
+    """
+    Columns added, removed and changed between two versions (default: the
+    previous version and the current one).
+    """
+    history = current_history(session_id, SESSIONS.version(session_id)) if session_id in SESSIONS else None
+    if history is None:
+        raise HTTPException(status_code=404, detail="No cleaning history for this session")
+    to_version = history.current.number if to_version is None else to_version
+    from_version = to_version - 1 if from_version is None else from_version
+    a, b = history.get(from_version), history.get(to_version)
+    if a is None or b is None:
+        raise HTTPException(status_code=404, detail="Unknown version")
+    return history.diff(a, b)
+
+
+@router.get("/export")
+async def export_dataset(
+    session_id: str,
+    format: str = Query("csv", description="csv, parquet or ndjson"),
+    compression: str = Query("none", description="none, gzip or zstd"),
+    range: str = Header(None),
+    if_range: str = Header(None),
+):
+    from app.components.Export.export import export
+    return await export(session_id, format, compression, range_header=range, if_range=if_range)
+
+
 @router.post("/save-cleaned-file")
 async def save_cleaned_file(session_id: str = Body(...)):
+    """
+    Where to download the cleaned dataset from. The file is streamed by
+    /export rather than written on the server.
+    """
+    if session_id not in SESSIONS:
+        raise HTTPException(status_code=404, detail="Invalid session_id")
+
+    return {
+        "message": "Cleaned file ready to download",
+        "url": f"/export?{urlencode({'session_id': session_id, 'format': 'csv'})}",
+        "filename": f"cleaned_{session_id}.csv",
+    }
+
+
+@router.get("/uploads")
+async def upload_status():
+    """
+    Background Hub upload queue: pending writes, commits, coalesced writes,
+    retries and the latest status per file.
+    """
+    return UPLOADS.stats()
+
+
+def _refresh_gauges():
+    # State owned by other components, read at scrape time
+    sessions = SESSIONS.stats()
+    METRICS.gauge("zeroml_sessions", "Live sessions.").set(len(sessions["sessions"]))
+    METRICS.gauge("zeroml_session_memory_bytes", "Memory held by session frames.").set(sessions["memory_in_use_bytes"])
+    METRICS.gauge("zeroml_cleaning_plans_pending", "Sessions with lazy cleaning operations pending.").set(len(PLANS))
+    jobs = METRICS.gauge("zeroml_jobs", "Background jobs by kind and status.", ("kind", "status"))
+    counts = {}
+    for job in JOBS.list():
+        counts[(job["kind"], job["status"])] = counts.get((job["kind"], job["status"]), 0) + 1
+    for kind in ("train", "search"):
+        for status in ("queued", "running", "succeeded", "failed", "cancelled"):
+            jobs.set(counts.get((kind, status), 0), kind=kind, status=status)
+    uploads = UPLOADS.stats()
+    METRICS.gauge("zeroml_uploads_pending", "Hub writes waiting to be committed.").set(uploads["pending"])
+    METRICS.gauge("zeroml_upload_retries", "Hub commit retries so far.").set(uploads["retries"])
+    hub = HUB_CACHE.stats()
+    METRICS.gauge("zeroml_hub_cache_bytes", "Bytes in the Hub download cache.").set(hub["bytes"])
+    cache = METRICS.gauge("zeroml_cache_lookups", "Cache lookups so far by cache and result.", ("cache", "result"))
+    code = CODE_CACHE.stats()
+    for name, stats in (("hub", hub), ("code", code)):
+        cache.set(stats["hits"], cache=name, result="hit")
+        cache.set(stats["misses"], cache=name, result="miss")
+
+
+@router.get("/hub")
+async def hub_status():
+    """
+    Shared Hub client (calls, retries, failures, repos known to exist) and
+    download cache statistics.
+    """
+    return {"client": HUB_CLIENT.stats(), "cache": HUB_CACHE.stats()}
+
+
+@router.get("/metrics")
+async def metrics():
+    """
+    Per-stage latency histograms, byte counters, in-flight gauges and
+    request counts in the Prometheus text format.
+    """
+    # Reads the code cache's SQLite database
+    await asyncio.to_thread(_refresh_gauges)
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/startup")
+async def startup_profile():
+    """
+    Cold start breakdown: time per startup phase and the packages it
+    imported, when the app was ready, what lazily loaded modules cost on
+    first use and the state of the optional warmup.
+    """
+    return STARTUP.report()
+
+
+@router.get("/sessions")
+async def list_sessions():
+    """
+    Memory budget and per-session memory/disk usage of the session store.
+    """
+    return SESSIONS.stats()
+
+
+@router.get("/sessions/{session_id}")
+async def session_usage(session_id: str):
     if session_id not in SESSIONS:
         raise HTTPException(status_code=404, detail="Invalid session_id")
-    
-    df = SESSIONS[session_id]
-    filename = f"cleaned_{session_id}.csv"
-    df.to_csv(filename, index=False)
 
-    return {"message": "File saved successfully", "path": filename}
+    return SESSIONS.usage(session_id)
+
+
 
 
 
+async def _session_snapshot(session_id):
+    """
+    A snapshot file of the live session when there is one, so jobs skip
+    the Hub download and Parquet decode and memory-map the frame instead
+    of getting a pickled copy, plus job metadata saying where the data
+    came from. Pending lazy cleaning is applied first, so this is the
+    latest version of the session; the persisted copy can only lag it.
+    """
+    if session_id in SESSIONS:
+        if session_id in PLANS:
+            await materialize(session_id)
+        snapshot = await asyncio.to_thread(SESSIONS.snapshot, session_id)
+        return snapshot, {"data_source": "session", "session_version": snapshot["version"]}
+    return None, {"data_source": "persisted", "session_version": None}
+
+
+def _queue_model_upload(session_id, job, future):
+    # Runs in the parent once the training job is done; the worker only
+    # writes the artifact to models/
+    if future.cancelled() or future.exception() is not None:
+        return
+    res = future.result()
+    # Callback thread: attribute the upload to the request that trained
+    token = REQUEST_ID.set(job.request_id)
+    try:
+        UPLOADS.enqueue(
+            HF_REPO_ID, res["hf_filename"], Path(res["model_path"]),
+            commit_message=f"Trained model for session {session_id}",
+        )
+    finally:
+        REQUEST_ID.reset(token)
+
+
+async def _submit_training(session_id, target, model_choice, params, mode=None):
+    mode = mode or TRAIN_MODE
+    if mode not in ("memory", "streaming"):
+        raise HTTPException(status_code=400, detail="mode must be 'memory' or 'streaming'")
+    if mode == "streaming":
+        fn = (await import_async(STREAMING_MODULE)).run_streaming_training
+    else:
+        fn = (await import_async(TRAIN_MODULE)).run_training
+    snapshot, meta = await _session_snapshot(session_id)
+    try:
+        job = JOBS.submit("train", fn, session_id, target, model_choice, params, snapshot=snapshot, meta={**meta, "training_mode": mode})
+    except Exception:
+        drop_snapshot(snapshot)
+        raise
+    job.future.add_done_callback(lambda f: drop_snapshot(snapshot))
+    job.future.add_done_callback(lambda f: _queue_model_upload(session_id, job, f))
+    return job
+
+
+async def _submit_search(session_id, target, model_choice, strategy, space, n_iter, cv, time_budget, factor):
+    search = await import_async(SEARCH_MODULE)
+    snapshot, meta = await _session_snapshot(session_id)
+    try:
+        job = JOBS.submit(
+            "search", search.run_search, session_id, target, model_choice, strategy, space, n_iter, cv, time_budget, factor,
+            snapshot=snapshot, meta={**meta, "model_name": model_choice, "strategy": strategy},
+        )
+    except Exception:
+        drop_snapshot(snapshot)
+        raise
+    job.future.add_done_callback(lambda f: drop_snapshot(snapshot))
+    return job
 
 
 @router.post("/train-model")
@@ -106,284 +357,212 @@ async def train_model(
     session_id: str = Form(...),
     target: str = Form(None),
     model_choice: str = Form(None),
-    params: str = Form(None)
+    params: str = Form(None),
+    mode: str = Form(None)
 ):
     """
-    Robust train_model: strong preprocessing & target encoding + debug logs.
+    Train a model and wait for the result. The fit runs in the job pool,
+    so other requests keep being served meanwhile. `mode="streaming"`
+    trains out of core with an incremental learner, for datasets larger
+    than memory.
     """
-    
+    job = await _submit_training(session_id, target, model_choice, params, mode)
     try:
-        import json
-        from sklearn.preprocessing import LabelEncoder
-
-        # === Read file ===
-        repo_id="prthm20/ZeoMl"
-        filename=f"{session_id}_cleaned.csv"
-        print(HF_TOKEN)
-        file_path= hf_hub_download(repo_id=repo_id, filename=filename,repo_type="dataset", token=HF_TOKEN)  
-        df = pd.read_csv(file_path)
-        if df.empty:
-            raise HTTPException(status_code=400, detail="Uploaded CSV is empty.")
-
-        # === Determine target column (auto if not provided) ===
-        target_col = target if target and target in df.columns else df.columns[-1]
-
-        # Quick debug: show columns and first rows
-        logger.info(f"Columns: {df.columns.tolist()}")
-        logger.info(f"Using target column: {target_col}")
-        logger.info(f"Head of dataframe:\n{df.head(5)}")
-
-        # === Split X and y ===
-        y = df[target_col]
-        X = df.drop(columns=[target_col])
-
-        # === Robust feature preprocessing ===
-        # 1) Convert object columns to category to ensure get_dummies works properly
-        for col in X.columns:
-            if X[col].dtype == "object":
-                X[col] = X[col].astype("category")
-
-        # 2) One-hot encode categorical columns
-        X = pd.get_dummies(X, drop_first=True)
-
-        # 3) Force all columns to numeric where possible; non-convertible -> NaN
-        X = X.apply(lambda col: pd.to_numeric(col, errors="coerce"))
-
-        # 4) Fill NaNs with median of column (numeric_only)
-        X = X.fillna(X.median(numeric_only=True))
-
-        # Debug: show types and sample after preprocessing
-        logger.info("Feature dtypes after preprocessing:")
-        logger.info(X.dtypes.head(20).to_dict())
-        logger.info("Feature sample after preprocessing:")
-        logger.info(X.head(5).to_dict())
-
-        # === Determine problem type robustly ===
-        # If target is object -> classification
-        if y.dtype == "object":
-            problem_type = "classification"
-        elif np.issubdtype(y.dtype, np.integer) and len(y.unique()) <= 5:
-            # small integer set -> classification
-            problem_type = "classification"
-        else:
-            problem_type = "regression"
-
-        # === Encode target for classification if needed ===
-        if problem_type == "classification":
-            # Debug: show unique values BEFORE encoding
-            logger.info(f"Target dtype before encoding: {y.dtype}")
-            logger.info(f"Target unique values (sample up to 20): {list(y.unique()[:20])}")
-
-            # If target is object or not numeric, label encode
-            if y.dtype == "object" or not np.issubdtype(y.dtype, np.number):
-                le = LabelEncoder()
-                y_encoded = le.fit_transform(y.astype(str))  # ensure strings
-                y = pd.Series(y_encoded, index=y.index)
-                logger.info(f"Label encoding applied. Classes: {list(le.classes_)}")
-            else:
-                # numeric dtype but maybe floats that represent classes
-                # convert floats that are whole numbers to ints
-                if np.issubdtype(y.dtype, np.floating) and np.all(np.mod(y.dropna(), 1) == 0):
-                    y = y.astype(int)
-                # otherwise leave numeric as-is (may be problematic — but we'll proceed)
-
-            logger.info(f"Target after encoding dtype: {y.dtype}, unique: {list(pd.Series(y).unique()[:20])}")
-
-        # === Final train/test split ===
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
-        )
-
-        # Debug: shapesx
-        logger.info(f"Shapes -> X_train: {X_train.shape}, X_test: {X_test.shape}, y_train: {y_train.shape}")
-
-        # === Parse hyperparameters safely ===
-        hyperparams = {}
-        if params:
-            try:
-                hyperparams = json.loads(params)
-                if not isinstance(hyperparams, dict):
-                    hyperparams = {}
-            except Exception:
-                # if params is not valid JSON, ignore but log
-                logger.warning(f"Could not parse params JSON: {params}")
-                hyperparams = {}
-
-        # === Default and final params (merge) ===
-        default_params = {
-            "RandomForestClassifier": {"random_state": 42},
-            "LogisticRegression": {"max_iter": 1000, "random_state": 42},
-            "RandomForestRegressor": {"random_state": 42},
-            "LinearRegression": {},
-            "KMeans": {"random_state": 42}
-        }
-        final_params = {**default_params.get(model_choice or "", {}), **hyperparams}
-
-        # === Initialize model safely ===
-        if model_choice == "RandomForestClassifier":
-            model = RandomForestClassifier(**final_params)
-        elif model_choice == "LogisticRegression":
-            model = LogisticRegression(**final_params)
-        elif model_choice == "RandomForestRegressor":
-            model = RandomForestRegressor(**final_params)
-        elif model_choice == "LinearRegression":
-            model = LinearRegression(**final_params)
-        elif model_choice == "KMeans":
-            model = KMeans(**final_params)
-        else:
-            # fallback: choose based on problem type
-            if problem_type == "classification":
-                model = RandomForestClassifier(**final_params)
-                model_choice = "RandomForestClassifier"
-            else:
-                model = RandomForestRegressor(**final_params)
-                model_choice = "RandomForestRegressor"
-
-        # === Fit model with try/except to capture the exact failing array ===
-        try:
-            model.fit(X_train, y_train)
-        except Exception as fit_exc:
-            # dump some debug info and re-raise a readable HTTPException
-            # Check types in X_train and y_train samples
-            dbg = {
-                "X_train_dtypes": X_train.dtypes.apply(lambda t: str(t)).to_dict(),
-                "X_train_sample_first_row": X_train.iloc[0].to_dict() if X_train.shape[0] > 0 else {},
-                "y_train_sample_first": str(y_train.iloc[0]) if y_train.shape[0] > 0 else None,
-                "error": str(fit_exc)
-            }
-            logger.error(f"Model fit failed: {dbg}")
-            raise HTTPException(status_code=500, detail=f"Model fit failed: {fit_exc} -- debug: {dbg}")
-
-        # === Predict & metrics ===
-        metrics = {}
-        if model_choice == "KMeans":
-            metrics["inertia"] = float(model.inertia_)
-            metrics["n_clusters"] = getattr(model, "n_clusters", None)
-        else:
-            preds = model.predict(X_test)
-
-            if problem_type == "classification":
-                # If classifier outputs probabilities / multi-dim array, convert to labels
-                if hasattr(preds, "shape") and getattr(preds, "ndim", 1) > 1 and preds.shape[1] > 1:
-                    preds_labels = np.argmax(preds, axis=1)
-                else:
-                    # If preds are floats (e.g., sklearn might output floats for some models),
-                    # round to nearest integer class
-                    preds_labels = np.round(preds).astype(int) if np.issubdtype(preds.dtype, np.floating) else preds
-
-                metrics["accuracy"] = float(accuracy_score(y_test, preds_labels))
-                metrics["classification_report"] = classification_report(y_test, preds_labels, output_dict=True)
-            else:
-                metrics["r2_score"] = float(r2_score(y_test, preds))
-                metrics["mse"] = float(mean_squared_error(y_test, preds))
-
-        # === Save model ===
-        os.makedirs("models", exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        model_path = f"models/{(model_choice or 'model')}_{timestamp}.pkl"
-        joblib.dump(model, model_path)
-        
-
-        try:
-           repo_id = "prthm20/ZeoMl"  # your dataset repo
-           hf_filename = f"{session_id}_{model_choice}_{timestamp}.pkl"
-
-    # Upload the model file directly from disk
-           api.upload_file(
-             path_or_fileobj=model_path,          # ✅ path to your .pkl file
-             path_in_repo=hf_filename,            # file name in the repo
-             repo_id=repo_id,
-             repo_type="dataset",                 # ✅ important (same repo type)
-             commit_message=f"Trained model for session {session_id}"
-         )
-           hf_download_url = f"https://huggingface.co/datasets/{repo_id}/resolve/main/{hf_filename}"
-
-           hf_status = f"Model uploaded to Hugging Face: {repo_id}/{hf_filename}"
-        except Exception as e:
-                hf_status = f"Error uploading model to Hugging Face: {e}"
-        return {
-            "status": "success",
-            "problem_type": problem_type,
-            "target_column": target_col,
-            "model_name": model_choice,
-            "hyperparameters_used": final_params,
-            "metrics": metrics,
-            "hf_filename" : hf_filename,
-            "huggingface_download_url": hf_download_url,
-            "model_path": model_path.replace("\\", "/")
-        }
-
-    except HTTPException:
-        # re-raise HTTPExceptions unchanged
-        raise
+        with stage("train_job"):
+            res = await JOBS.wait(job)
+        res["session_version"] = job.meta["session_version"]
+        return res
+    except TrainingError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except (CancelledError, JobCancelled):
+        raise HTTPException(status_code=409, detail=f"Training job {job.id} was cancelled")
     except Exception as e:
         logger.exception("Unhandled training error")
         raise HTTPException(status_code=500, detail=f"Training failed: {e}")
 
-# ✅ Ensure this line is SEPARATED by a blank line
+
+@router.post("/jobs/train", status_code=202)
+async def submit_training_job(
+    session_id: str = Form(...),
+    target: str = Form(None),
+    model_choice: str = Form(None),
+    params: str = Form(None),
+    mode: str = Form(None)
+):
+    """
+    Queue a training job and return its id right away. Follow it with
+    GET /jobs/{job_id} or the event stream at GET /jobs/{job_id}/events.
+    """
+    job = await _submit_training(session_id, target, model_choice, params, mode)
+    return {"job_id": job.id, "status": job.status, **job.meta}
+
+
+@router.get("/jobs")
+async def list_jobs():
+    return {"max_workers": JOBS.max_workers, "jobs": JOBS.list()}
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+
+    return job.to_dict()
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = JOBS.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+
+    return job.to_dict(include_result=False)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events with the job's progress, metrics and final result.
+    """
+    if JOBS.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job_id")
+
+    async def event_stream():
+        async for event in JOBS.stream(job_id):
+            yield sse_format(event)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 
 @router.get("/hyperparameters")
 async def get_hyperparameters(model_name: str):
     """
     Return default hyperparameters for a given model.
     """
-    default_hyperparameters = {
-        "RandomForestClassifier": {
-            "n_estimators": 100,
-            "max_depth": 5,
-            "min_samples_split": 2,
-            "min_samples_leaf": 1,
-            "random_state": 42
-        },
-        "LogisticRegression": {
-            "penalty": "l2",
-            "C": 1.0,
-            "solver": "lbfgs",
-            "max_iter": 1000,
-            "random_state": 42
-        },
-        "RandomForestRegressor": {
-            "n_estimators": 100,
-            "max_depth": 10,
-            "min_samples_split": 2,
-            "min_samples_leaf": 1,
-            "random_state": 42
-        },
-        "LinearRegression": {
-            "fit_intercept": True,
-            "copy_X": True,
-        },
-        "KMeans": {
-            "n_clusters": 8,
-            "init": "k-means++",
-            "max_iter": 300,
-            "random_state": 42
-        }
+    search = await import_async(SEARCH_MODULE)
+    if model_name not in search.DEFAULT_HYPERPARAMETERS:
+        raise HTTPException(status_code=400, detail="Unsupported model name.")
+
+    return {
+        "default_hyperparameters": search.DEFAULT_HYPERPARAMETERS[model_name],
+        "default_search_space": search.DEFAULT_SEARCH_SPACES[model_name],
     }
 
-    if model_name not in default_hyperparameters:
-        raise HTTPException(status_code=400, detail="Unsupported model name.")
 
-    return {"default_hyperparameters": default_hyperparameters[model_name]}
+@router.post("/search-hyperparameters")
+async def search_hyperparameters(
+    session_id: str = Form(...),
+    target: str = Form(None),
+    model_choice: str = Form(None),
+    strategy: str = Form("random"),
+    space: str = Form(None),
+    n_iter: int = Form(20),
+    cv: int = Form(3),
+    time_budget: float = Form(None),
+    factor: int = Form(3)
+):
+    """
+    Search hyperparameters for one model and wait for the leaderboard.
+    strategy is grid, random or halving; space is a JSON object of
+    parameter -> list of values (or a distribution for random/halving),
+    defaulting to the model's default_search_space. Candidate fits run in
+    parallel inside a job worker; time_budget (seconds) stops starting new
+    fits once it runs out.
+    """
+    job = await _submit_search(session_id, target, model_choice, strategy, space, n_iter, cv, time_budget, factor)
+    try:
+        res = await JOBS.wait(job)
+        res["session_version"] = job.meta["session_version"]
+        return res
+    except TrainingError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except (CancelledError, JobCancelled):
+        raise HTTPException(status_code=409, detail=f"Search job {job.id} was cancelled")
+    except Exception as e:
+        logger.exception("Unhandled search error")
+        raise HTTPException(status_code=500, detail=f"Search failed: {e}")
+
+
+@router.post("/jobs/search", status_code=202)
+async def submit_search_job(
+    session_id: str = Form(...),
+    target: str = Form(None),
+    model_choice: str = Form(None),
+    strategy: str = Form("random"),
+    space: str = Form(None),
+    n_iter: int = Form(20),
+    cv: int = Form(3),
+    time_budget: float = Form(None),
+    factor: int = Form(3)
+):
+    """
+    Queue a hyperparameter search and return its id right away; progress
+    per round streams from GET /jobs/{job_id}/events.
+    """
+    job = await _submit_search(session_id, target, model_choice, strategy, space, n_iter, cv, time_budget, factor)
+    return {"job_id": job.id, "status": job.status, **job.meta}
+
+
+@router.post("/predict")
+async def predict(payload: dict = Body(...)):
+    """
+    Score rows with a trained model. Body:
+    {"model": "<hf_filename>", "records": [{...}, ...]} or
+    {"model": "<hf_filename>", "columns": {"col": [...], ...}}.
+    Models stay loaded between requests, and concurrent small requests are
+    scored together in one batch.
+    """
+    model_name = payload.get("model")
+    if not isinstance(model_name, str) or not model_name:
+        raise HTTPException(status_code=400, detail="'model' is required.")
+    inference = await import_async(PREDICT_MODULE)
+    try:
+        with stage("predict"):
+            return await inference.predict(model_name, payload)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("Unhandled prediction error")
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {e}")
+
+
+@router.get("/predict/stats")
+async def predict_stats():
+    """
+    Loaded models plus request count, batch sizes and p50/p99 latency.
+    """
+    return (await import_async(PREDICT_MODULE)).REGISTRY.summary()
+
+
+@router.get("/model-info")
+async def model_info(filename: str):
+    """
+    Metadata header of a trained model artifact (features, target, metrics,
+    hyperparameters), read without loading the model itself.
+    """
+    try:
+        local_path = await asyncio.to_thread(HUB_CACHE.fetch, HF_REPO_ID, filename, repo_type="dataset")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Model file not found.")
+    try:
+        return {"filename": filename, **read_metadata(local_path)}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Not a model artifact (legacy .pkl models carry no metadata).")
 
 
 @router.get("/download-model")
 async def download_model(filename: str):
     """
-    Download a trained model (.pkl) from Hugging Face and return it as a downloadable file.
+    Download a trained model (.zmodel, or a legacy .pkl) from Hugging Face and return it as a downloadable file.
     Example:
-    /download-model?filename=139e5062-558a-4052-838b-4ad316c5878a_RandomForestClassifier_20251101_160025.pkl
+    /download-model?filename=139e5062-558a-4052-838b-4ad316c5878a_RandomForestClassifier_20251101_160025.zmodel
     """
     try:
-        repo_id = "prthm20/ZeoMl"  # your dataset repo
-        local_path = hf_hub_download(
-            repo_id=repo_id,
-            filename=filename,
-            repo_type="dataset",
-            token=HF_TOKEN
-        )
-
-        if not os.path.exists(local_path):
+        repo_id = HF_REPO_ID
+        try:
+            local_path = await asyncio.to_thread(HUB_CACHE.fetch, repo_id, filename, repo_type="dataset")
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Model file not found.")
 
         return FileResponse(
@@ -392,6 +571,8 @@ async def download_model(filename: str):
             media_type="application/octet-stream"
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Model download failed: {e}")
         raise HTTPException(status_code=500, detail=f"Download failed: {e}")
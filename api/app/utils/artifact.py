@@ -0,0 +1,173 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+ARTIFACT_SUFFIX = ".zmodel"
+ARTIFACT_FORMAT_VERSION = 1
+METADATA_MEMBER = "metadata.json"
+MODEL_MEMBER = "model.joblib"
+
+# Where archives are unpacked for memory-mapped loading; shared by every
+# worker on the host so they map the same pages.
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "zeroml-model-cache"))
+MODEL_CACHE_MAX_MB = int(os.getenv("MODEL_CACHE_MAX_MB", "4096"))
+ARTIFACT_COMPRESSLEVEL = int(os.getenv("ARTIFACT_COMPRESSLEVEL", "6"))
+
+
+def model_filename(session_id: str, model_name: str, run_id: str | None = None) -> str:
+    """
+    File name of a trained model, both under models/ and on the Hub. The
+    id of the training run (job) keeps concurrent runs from overwriting
+    each other within the same second.
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    run_id = (run_id or uuid.uuid4().hex).replace("-", "")[:12]
+    return f"{session_id}_{model_name}_{timestamp}_{run_id}{ARTIFACT_SUFFIX}"
+
+
+def save_artifact(estimator, path, metadata: dict) -> dict:
+    """
+    Write `estimator` as a model artifact: a deflate-compressed zip holding
+    a JSON metadata header and an uncompressed joblib dump of the model.
+
+    The dump is kept uncompressed inside the archive so that, once
+    unpacked, its numpy arrays can be memory-mapped; the zip compression
+    is what keeps the file small for storage and upload. Returns the
+    metadata as written.
+    """
+    # Loaded here rather than at import: reading metadata needs neither
+    import joblib
+    import sklearn
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    metadata = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "created_at": time.time(),
+        "estimator": type(estimator).__name__,
+        "sklearn_version": sklearn.__version__,
+        **metadata,
+    }
+
+    with tempfile.TemporaryDirectory(dir=path.parent) as tmp_dir:
+        dump_path = Path(tmp_dir) / MODEL_MEMBER
+        joblib.dump(estimator, dump_path)
+        metadata["model_bytes"] = dump_path.stat().st_size
+
+        tmp_path = Path(tmp_dir) / path.name
+        with zipfile.ZipFile(
+            tmp_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=ARTIFACT_COMPRESSLEVEL
+        ) as zf:
+            # Header first so readers can stop after the first member
+            zf.writestr(METADATA_MEMBER, json.dumps(metadata, default=str, indent=2))
+            zf.write(dump_path, MODEL_MEMBER)
+        os.replace(tmp_path, path)
+
+    logger.info(
+        f"Wrote model artifact {path} "
+        f"({metadata['model_bytes']} bytes -> {path.stat().st_size} compressed)"
+    )
+    return metadata
+
+
+def read_metadata(path) -> dict:
+    """Read an artifact's metadata header without deserializing the model."""
+    try:
+        with zipfile.ZipFile(path) as zf:
+            return json.loads(zf.read(METADATA_MEMBER))
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise ValueError(f"{path} is not a model artifact: {e}")
+
+
+def is_artifact(path) -> bool:
+    # By content, not name: Hub cache blobs have no extension
+    return zipfile.is_zipfile(path)
+
+
+class ModelCache:
+    """
+    Unpacked model dumps, one per distinct archive content. Loading maps the
+    dump read-only (`mmap_mode="r"`), so processes serving the same model
+    share its arrays through the page cache instead of each holding a copy.
+    Least recently used dumps are removed once the directory grows past
+    `max_bytes`.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        """Load the model in the artifact at `path`, memory-mapped."""
+        import joblib
+
+        dump_path = self.unpack(path)
+        return joblib.load(dump_path, mmap_mode="r")
+
+    def unpack(self, path) -> Path:
+        path = Path(path)
+        try:
+            with zipfile.ZipFile(path) as zf:
+                info = zf.getinfo(MODEL_MEMBER)
+                # CRC and size identify the content, so the same model
+                # fetched under two names is unpacked once
+                dump_path = self.root / f"{info.CRC:08x}-{info.file_size}.joblib"
+                if dump_path.exists():
+                    os.utime(dump_path)
+                    return dump_path
+
+                self.root.mkdir(parents=True, exist_ok=True)
+                tmp_path = dump_path.with_name(f".{dump_path.name}.{os.getpid()}.{threading.get_ident()}")
+                try:
+                    with zf.open(info) as src, open(tmp_path, "wb") as dst:
+                        while chunk := src.read(1024 * 1024):
+                            dst.write(chunk)
+                    os.replace(tmp_path, dump_path)
+                finally:
+                    tmp_path.unlink(missing_ok=True)
+        except (zipfile.BadZipFile, KeyError) as e:
+            raise ValueError(f"{path} is not a model artifact: {e}")
+
+        logger.info(f"Unpacked {path.name} to {dump_path}")
+        self._evict(keep=dump_path)
+        return dump_path
+
+    def _evict(self, keep: Path) -> None:
+        with self._lock:
+            files = [(p, p.stat()) for p in self.root.glob("*.joblib")]
+            total = sum(st.st_size for _, st in files)
+            for path, st in sorted(files, key=lambda f: f[1].st_mtime):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                # Processes that still map it keep their pages until they unmap
+                path.unlink(missing_ok=True)
+                total -= st.st_size
+
+
+MODEL_CACHE = ModelCache(root=MODEL_CACHE_DIR, max_bytes=MODEL_CACHE_MAX_MB * 1024 * 1024)
+
+
+def load_model(path):
+    """Load a model from an artifact, or from a legacy plain joblib pickle."""
+    if is_artifact(path):
+        return MODEL_CACHE.load(path)
+    import joblib
+
+    return joblib.load(path)
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+CODE_CACHE_PATH = os.getenv("CODE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "zeroml-code-cache.sqlite3"))
+CODE_CACHE_TTL_SECONDS = int(os.getenv("CODE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+CODE_CACHE_MAX_ENTRIES = int(os.getenv("CODE_CACHE_MAX_ENTRIES", "10000"))
+
+
+def normalize_instruction(instruction: str) -> str:
+    """Case, surrounding punctuation and whitespace don't change the code."""
+    text = re.sub(r"\s+", " ", instruction.strip().lower())
+    return text.strip(" .!;")
+
+
+def schema_fingerprint(df: pd.DataFrame) -> str:
+    """Hash of the column names and dtypes, in order."""
+    schema = [(str(col), str(dtype)) for col, dtype in df.dtypes.items()]
+    return hashlib.sha256(json.dumps(schema).encode()).hexdigest()
+
+
+class CodeCache:
+    """
+    Persistent cache of generated cleaning code, keyed by normalized
+    instruction plus schema fingerprint.
+
+    Backed by SQLite so it survives restarts and is shared by every worker
+    on the host. Entries expire `ttl_seconds` after they were generated,
+    and the least recently used are dropped beyond `max_entries`.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_entries: int):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def key(self, instruction: str, df: pd.DataFrame) -> str:
+        raw = f"{normalize_instruction(instruction)}\0{schema_fingerprint(df)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT code, created_at FROM code_cache WHERE key = ?", (key,)).fetchone()
+            expired = row is not None and now - row[1] > self.ttl_seconds
+            if expired:
+                conn.execute("DELETE FROM code_cache WHERE key = ?", (key,))
+                row = None
+            if row is not None:
+                conn.execute(
+                    "UPDATE code_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+                )
+        # Called from worker threads
+        with self._lock:
+            self.expired += expired
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def put(self, key: str, instruction: str, df: pd.DataFrame, code: str) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO code_cache "
+                "(key, instruction, schema_fingerprint, code, created_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, normalize_instruction(instruction), schema_fingerprint(df), code, now, now),
+            )
+            conn.execute(
+                "DELETE FROM code_cache WHERE key IN ("
+                " SELECT key FROM code_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def discard(self, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM code_cache WHERE key = ?", (key,))
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM code_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
+
+    @contextmanager
+    def _connect(self):
+        """Connection committed on success and closed afterwards."""
+        if not self._ready:
+            self._init_db()
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._lock:
+            if self._ready:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS code_cache ("
+                    " key TEXT PRIMARY KEY,"
+                    " instruction TEXT NOT NULL,"
+                    " schema_fingerprint TEXT NOT NULL,"
+                    " code TEXT NOT NULL,"
+                    " created_at REAL NOT NULL,"
+                    " last_access REAL NOT NULL,"
+                    " hits INTEGER NOT NULL DEFAULT 0)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS code_cache_last_access ON code_cache (last_access)")
+                conn.commit()
+            finally:
+                conn.close()
+            self._ready = True
+
+
+CODE_CACHE = CodeCache(
+    path=CODE_CACHE_PATH,
+    ttl_seconds=CODE_CACHE_TTL_SECONDS,
+    max_entries=CODE_CACHE_MAX_ENTRIES,
+)
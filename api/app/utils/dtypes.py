@@ -0,0 +1,184 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+# Shrink dtypes of uploaded and cleaned frames
+COMPACT_DTYPES = os.getenv("COMPACT_DTYPES", "true").lower() in ("1", "true", "yes")
+# String columns with at most this share of distinct values become categoricals
+COMPACT_CATEGORY_MAX_RATIO = float(os.getenv("COMPACT_CATEGORY_MAX_RATIO", "0.5"))
+# "arrow" keeps other string columns as Arrow-backed strings, "object" leaves them
+COMPACT_STRINGS = os.getenv("COMPACT_STRINGS", "arrow")
+
+ARROW_STRING = pd.StringDtype("pyarrow")
+
+_INT_TYPES = [np.int8, np.int16, np.int32]
+_UINT_TYPES = [np.uint8, np.uint16, np.uint32]
+
+
+def arrow_types_mapper(arrow_type):
+    """`to_pandas(types_mapper=...)` hook so stored strings load as Arrow strings."""
+    if COMPACT_DTYPES and COMPACT_STRINGS == "arrow" and arrow_type in (pa.string(), pa.large_string()):
+        return ARROW_STRING
+    return None
+
+
+def _compact_integers(s: pd.Series) -> pd.Series:
+    if s.empty:
+        return s
+    lo, hi = s.min(), s.max()
+    for t in (_UINT_TYPES if lo >= 0 else _INT_TYPES):
+        info = np.iinfo(t)
+        if info.min <= lo and hi <= info.max:
+            return s.astype(t)
+    return s
+
+
+def _compact_floats(s: pd.Series) -> pd.Series:
+    # Only when every value survives float32 exactly: cleaning code and
+    # training must see the same numbers as before
+    narrow = s.to_numpy().astype(np.float32)
+    with np.errstate(invalid="ignore"):
+        if np.array_equal(narrow.astype(np.float64), s.to_numpy(), equal_nan=True):
+            return pd.Series(narrow, index=s.index, name=s.name)
+    return s
+
+
+def _compact_objects(s: pd.Series, categories: bool) -> pd.Series:
+    kind = pd.api.types.infer_dtype(s, skipna=True)
+    if kind == "boolean":
+        return s.astype("boolean")
+    if kind != "string":
+        # Mixed or non-string objects stay as they are
+        return s
+    non_null = int(s.count())
+    if categories and non_null and s.nunique(dropna=True) <= COMPACT_CATEGORY_MAX_RATIO * non_null:
+        return s.astype("category")
+    if COMPACT_STRINGS == "arrow":
+        return s.astype(ARROW_STRING)
+    return s
+
+
+def compact_series(s: pd.Series, floats: bool = True, categories: bool = True) -> pd.Series:
+    """The smallest dtype that holds `s` exactly, or `s` itself."""
+    dtype = s.dtype
+    if dtype == np.int64 or dtype == np.uint64:
+        return _compact_integers(s)
+    if dtype == np.float64 and floats:
+        return _compact_floats(s)
+    if dtype == object or (isinstance(dtype, pd.StringDtype) and dtype.storage == "python"):
+        return _compact_objects(s, categories)
+    if isinstance(dtype, pd.StringDtype) and categories:
+        # Arrow strings (e.g. as stored) can still be low-cardinality
+        non_null = int(s.count())
+        if non_null and s.nunique(dropna=True) <= COMPACT_CATEGORY_MAX_RATIO * non_null:
+            return s.astype("category")
+    return s
+
+
+def compact_frame(df: pd.DataFrame, floats: bool = True, categories: bool = True) -> tuple[pd.DataFrame, dict]:
+    """
+    Downcast the wide columns of `df`: integers to the narrowest type that
+    fits, floats to float32 where that's lossless, low-cardinality strings
+    to categoricals, other strings to Arrow-backed strings and object
+    booleans to the nullable boolean type. Columns already compact (e.g.
+    left untouched by a cleaning step) aren't scanned again.
+
+    Returns the compacted frame (`df` itself when nothing changed) and a
+    report with the memory before and after and the columns converted.
+    """
+    if not COMPACT_DTYPES:
+        return df, {}
+
+    before = int(df.memory_usage(index=True, deep=True).sum())
+    changed = {}
+    columns = {}
+    for i, (name, s) in enumerate(df.items()):
+        try:
+            compact = compact_series(s, floats=floats, categories=categories)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Leaving column {name} as {s.dtype}: {e}")
+            compact = s
+        if compact is not s:
+            columns[i] = compact
+            changed[str(name)] = f"{s.dtype} -> {compact.dtype}"
+
+    if columns:
+        df = df.copy(deep=False)
+        for i, compact in columns.items():
+            df.isetitem(i, compact)
+    after = int(df.memory_usage(index=True, deep=True).sum()) if columns else before
+    return df, {"before_bytes": before, "after_bytes": after, "converted": changed}
+
+
+def _typed_strings(dtype) -> bool:
+    return isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype))
+
+
+def _widened(s: pd.Series, strings: bool):
+    dtype = s.dtype
+    if isinstance(dtype, np.dtype):
+        if dtype.kind in "iu" and dtype.itemsize < 8:
+            return s.astype(np.int64)
+        if dtype.kind == "f" and dtype.itemsize < 8:
+            return s.astype(np.float64)
+    elif strings and _typed_strings(dtype):
+        return s.astype(object)
+    return None
+
+
+def has_typed_strings(df: pd.DataFrame) -> bool:
+    """Whether `df` has categorical or Arrow string columns."""
+    return any(_typed_strings(dtype) for dtype in df.dtypes)
+
+
+def widen_frame(df: pd.DataFrame, strings: bool = False, copy: bool = False) -> pd.DataFrame:
+    """
+    `df` with narrowed numbers back at 64 bits, so arithmetic can't
+    overflow or lose precision, and with `strings` also categoricals and
+    Arrow strings as plain object columns, for code that only works with
+    the default pandas dtypes. Returns `df` itself when nothing changes.
+
+    With `copy` the result shares no data with `df`: columns that aren't
+    converted are copied, so every column is copied exactly once.
+    """
+    columns = {}
+    for i, (_, s) in enumerate(df.items()):
+        wide = _widened(s, strings)
+        if wide is None and copy:
+            wide = s.copy()
+        if wide is not None:
+            columns[i] = wide
+    if not columns:
+        return df.copy() if copy else df
+    df = df.copy(deep=False)
+    for i, s in columns.items():
+        df.isetitem(i, s)
+    return df
+
+
+def memory_report(reports: list[dict]) -> dict:
+    """Totals of several compact_frame reports (e.g. one per chunk)."""
+    reports = [r for r in reports if r]
+    if not reports:
+        return {"compacted": False}
+    before = sum(r["before_bytes"] for r in reports)
+    after = sum(r["after_bytes"] for r in reports)
+    converted = {}
+    for r in reports:
+        converted.update(r["converted"])
+    return {
+        "compacted": True,
+        "memory_before_bytes": before,
+        "memory_after_bytes": after,
+        "memory_saved_ratio": round(1 - after / before, 4) if before else 0.0,
+        "converted_columns": converted,
+    }
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import joblib
+import pandas as pd
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+FEATURE_CACHE_DIR = os.getenv(
+    "FEATURE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "zeroml-feature-cache")
+)
+FEATURE_CACHE_MEMORY_MB = int(os.getenv("FEATURE_CACHE_MEMORY_MB", "512"))
+FEATURE_CACHE_DISK_MB = int(os.getenv("FEATURE_CACHE_DISK_MB", "4096"))
+
+
+def _entry_bytes(entry: dict) -> int:
+    total = 0
+    for value in entry.values():
+        if isinstance(value, pd.DataFrame):
+            total += int(value.memory_usage(index=True, deep=True).sum())
+        elif isinstance(value, pd.Series):
+            total += int(value.memory_usage(index=True, deep=True))
+    return total
+
+
+class FeatureCache:
+    """
+    Two-level LRU cache of prepared training data (feature matrix, target
+    and fitted preprocessor), keyed by dataset fingerprint.
+
+    The memory level is per process; the disk level is a directory of
+    joblib files shared by every worker on the host, evicted oldest-first
+    by modification time once it grows past `disk_max_bytes`.
+    """
+
+    def __init__(self, root: str, memory_max_bytes: int, disk_max_bytes: int):
+        self.root = Path(root)
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self._memory: "OrderedDict[str, tuple[dict, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[dict | None, str]:
+        """Return (entry, level) where level is "memory", "disk" or "miss"."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key][0], "memory"
+
+        path = self._path(key)
+        try:
+            entry = joblib.load(path)
+        except FileNotFoundError:
+            return None, "miss"
+        except Exception as e:
+            logger.warning(f"Dropping unreadable feature cache file {path}: {e}")
+            path.unlink(missing_ok=True)
+            return None, "miss"
+        os.utime(path)
+        self._remember(key, entry)
+        return entry, "disk"
+
+    def put(self, key: str, entry: dict) -> None:
+        self._remember(key, entry)
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+        try:
+            joblib.dump(entry, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        self._evict_disk()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.joblib"
+
+    def _remember(self, key: str, entry: dict) -> None:
+        size = _entry_bytes(entry)
+        if size > self.memory_max_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= self._memory.pop(key)[1]
+            self._memory[key] = (entry, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_max_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted
+
+    def _evict_disk(self) -> None:
+        files = [(p, p.stat()) for p in self.root.glob("*.joblib")]
+        total = sum(st.st_size for _, st in files)
+        for path, st in sorted(files, key=lambda f: f[1].st_mtime):
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= st.st_size
+            logger.info(f"Evicted {path.name} from feature cache")
+
+
+FEATURE_CACHE = FeatureCache(
+    root=FEATURE_CACHE_DIR,
+    memory_max_bytes=FEATURE_CACHE_MEMORY_MB * 1024 * 1024,
+    disk_max_bytes=FEATURE_CACHE_DISK_MB * 1024 * 1024,
+)
@@ -0,0 +1,302 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no cross-process locking of the index
+    fcntl = None
+
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+from app.utils.hub_client import HUB_CLIENT
+from app.utils.metrics import count_bytes, stage
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+HF_CACHE_DIR = os.getenv("HF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "zeroml-hub-cache"))
+HF_CACHE_MAX_MB = int(os.getenv("HF_CACHE_MAX_MB", "10240"))
+HF_CACHE_REVALIDATE_SECONDS = int(os.getenv("HF_CACHE_REVALIDATE_SECONDS", "300"))
+# Cache hits only update access times; they reach the index this often
+HF_CACHE_INDEX_SAVE_SECONDS = float(os.getenv("HF_CACHE_INDEX_SAVE_SECONDS", "5"))
+
+# Unindexed blobs younger than this may be another process's fresh download
+ORPHAN_GRACE_SECONDS = 3600
+
+
+class HubSource:
+    """
+    Artifacts served by the Hugging Face Hub (or its local stand-in, see
+    HF_LOCAL_HUB_DIR), through the shared Hub client.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def etag(self, repo_id: str, filename: str, repo_type: str, revision: str) -> str:
+        return self.client.file_etag(repo_id, filename, repo_type, revision)
+
+    def download(self, repo_id: str, filename: str, repo_type: str, revision: str, dest: Path) -> None:
+        self.client.download(repo_id, filename, repo_type, revision, dest)
+
+
+class ArtifactCache:
+    """
+    Local cache for Hub files.
+
+    Entries are keyed by (repo_type, repo_id, path, revision) and point at a
+    blob named after the key and the file's ETag. Entries younger than
+    `revalidate_seconds` are served without touching the network; older ones
+    are revalidated with a metadata request and only re-downloaded when the
+    ETag changed. Blobs are evicted least-recently-used once the cache grows
+    past `max_bytes`.
+
+    The index is a JSON file shared by every process using the cache
+    directory (the server's workers): changes are read-modify-written under
+    a file lock, so no process evicts or sweeps a blob another one indexed.
+    Access times from cache hits are batched and written at most every
+    `save_interval` seconds.
+    """
+
+    def __init__(self, root: str, max_bytes: int, revalidate_seconds: int, source, save_interval: float = HF_CACHE_INDEX_SAVE_SECONDS):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.index_path = self.root / "index.json"
+        self.lock_path = self.root / ".index.lock"
+        self.max_bytes = max_bytes
+        self.revalidate_seconds = revalidate_seconds
+        self.save_interval = save_interval
+        self.source = source
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._lock = threading.RLock()
+        self._key_locks: dict[str, threading.Lock] = {}
+        # Cache hits not yet written to the index: key -> access time
+        self._pending_access: dict[str, float] = {}
+        self._saved_at = time.monotonic()
+        self._index: dict = {}
+        self._index_mtime = None
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        with self._update():
+            self._sweep_orphans()
+
+    def fetch(self, repo_id: str, filename: str, repo_type: str = "dataset", revision: str = "main") -> Path:
+        """
+        Return a local path holding the current content of `filename`,
+        downloading it only if it isn't cached or has changed upstream.
+        Raises FileNotFoundError if the file doesn't exist upstream.
+        Blocks on the network; call it from a worker thread in async code.
+        """
+        key = f"{repo_type}/{repo_id}@{revision}:{filename}"
+        with self._key_lock(key):
+            entry = self._lookup(key)
+            now = time.time()
+            if entry is not None and now - entry["validated_at"] < self.revalidate_seconds:
+                return self._hit(key, entry)
+
+            try:
+                with stage("hub_revalidate"):
+                    etag = self.source.etag(repo_id, filename, repo_type, revision)
+            except FileNotFoundError:
+                self._forget(key)
+                raise
+            except Exception as e:
+                if entry is None:
+                    raise
+                logger.warning(f"Revalidation of {key} failed ({e}), serving cached copy")
+                return self._hit(key, entry)
+
+            if entry is not None and entry["etag"] == etag:
+                self.revalidations += 1
+                with self._update() as index:
+                    if key in index:
+                        index[key]["validated_at"] = now
+                return self._hit(key, entry)
+
+            blob = hashlib.sha256(f"{key}\n{etag}".encode()).hexdigest()
+            blob_path = self.blob_dir / blob
+            if not blob_path.exists():
+                self.misses += 1
+                tmp_path = self.blob_dir / f".{blob}.{os.getpid()}.{threading.get_ident()}.part"
+                try:
+                    with stage("hub_download"):
+                        self.source.download(repo_id, filename, repo_type, revision, tmp_path)
+                    os.replace(tmp_path, blob_path)
+                finally:
+                    tmp_path.unlink(missing_ok=True)
+                count_bytes("hub_download", "in", blob_path.stat().st_size)
+                logger.info(f"Cached {key} ({blob_path.stat().st_size} bytes)")
+            else:
+                self.hits += 1
+
+            with self._update() as index:
+                previous = index.get(key)
+                index[key] = {
+                    "blob": blob,
+                    "etag": etag,
+                    "size": blob_path.stat().st_size,
+                    "last_access": now,
+                    "validated_at": now,
+                }
+                if previous is not None and previous["blob"] != blob:
+                    self._release(previous["blob"])
+                self._evict(keep=blob)
+            return blob_path
+
+    def invalidate(self, repo_id: str, filename: str, repo_type: str = "dataset", revision: str = "main") -> None:
+        """Force the next fetch of `filename` to revalidate (we just wrote it)."""
+        key = f"{repo_type}/{repo_id}@{revision}:{filename}"
+        with self._update() as index:
+            entry = index.get(key)
+            if entry is not None:
+                entry["validated_at"] = 0
+
+    def flush(self) -> None:
+        """Write access times of recent cache hits to the index."""
+        with self._lock:
+            pending = bool(self._pending_access)
+        if pending:
+            with self._update():
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+            }
+
+    @contextmanager
+    def _update(self):
+        """
+        Read-modify-write of the on-disk index: yields the current index
+        (with this process's pending access times merged in) under an
+        exclusive lock shared with the other processes, then saves it.
+        """
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                # Released when the file is closed
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._index = self._load_index()
+            for key, accessed in self._pending_access.items():
+                entry = self._index.get(key)
+                if entry is not None and accessed > entry["last_access"]:
+                    entry["last_access"] = accessed
+            self._pending_access.clear()
+            yield self._index
+            self._save_index()
+            self._saved_at = time.monotonic()
+
+    def _refresh(self) -> None:
+        # Pick up entries other processes wrote since we last read the index
+        try:
+            mtime = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._index_mtime:
+            self._index = self._load_index()
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _lookup(self, key: str) -> dict | None:
+        with self._lock:
+            self._refresh()
+            entry = self._index.get(key)
+            if entry is not None and not (self.blob_dir / entry["blob"]).exists():
+                # Blob removed behind our back; fetched again and re-indexed
+                return None
+            return entry
+
+    def _hit(self, key: str, entry: dict) -> Path:
+        now = time.time()
+        with self._lock:
+            self.hits += 1
+            entry["last_access"] = now
+            self._pending_access[key] = now
+            due = time.monotonic() - self._saved_at >= self.save_interval
+        if due:
+            self.flush()
+        return self.blob_dir / entry["blob"]
+
+    def _forget(self, key: str) -> None:
+        with self._update() as index:
+            entry = index.pop(key, None)
+            if entry is not None:
+                self._release(entry["blob"])
+
+    def _total_bytes(self) -> int:
+        return sum({e["blob"]: e["size"] for e in self._index.values()}.values())
+
+    def _evict(self, keep: str | None) -> None:
+        total = self._total_bytes()
+        for key, entry in sorted(self._index.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if entry["blob"] == keep:
+                continue
+            del self._index[key]
+            if self._release(entry["blob"]):
+                total -= entry["size"]
+            logger.info(f"Evicted {key} from artifact cache")
+
+    def _release(self, blob: str) -> bool:
+        """Delete a blob once no entry points at it; True if it was deleted."""
+        if any(e["blob"] == blob for e in self._index.values()):
+            return False
+        (self.blob_dir / blob).unlink(missing_ok=True)
+        return True
+
+    def _sweep_orphans(self) -> None:
+        # Only blobs nobody indexed for a while: a fresh one may belong to a
+        # download another process hasn't indexed yet
+        referenced = {e["blob"] for e in self._index.values()}
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        for path in self.blob_dir.iterdir():
+            if path.name.startswith(".") or path.name in referenced:
+                continue
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink(missing_ok=True)
+            except FileNotFoundError:
+                pass
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path) as f:
+                self._index_mtime = os.fstat(f.fileno()).st_mtime_ns
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._index_mtime = None
+            return {}
+
+    def _save_index(self) -> None:
+        tmp_path = self.index_path.with_name(f".index.{os.getpid()}.{threading.get_ident()}.json")
+        with open(tmp_path, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = self.index_path.stat().st_mtime_ns
+
+
+HUB_CACHE = ArtifactCache(
+    root=HF_CACHE_DIR,
+    max_bytes=HF_CACHE_MAX_MB * 1024 * 1024,
+    revalidate_seconds=HF_CACHE_REVALIDATE_SECONDS,
+    source=HubSource(HUB_CLIENT),
+)
@@ -0,0 +1,366 @@
+import hashlib
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+from app.utils.metrics import METRICS
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+HF_HUB_TIMEOUT_SECONDS = float(os.getenv("HF_HUB_TIMEOUT_SECONDS", "30"))
+# Keep-alive connections shared by every Hub call in the process
+HF_HUB_MAX_CONNECTIONS = int(os.getenv("HF_HUB_MAX_CONNECTIONS", "16"))
+# Hub calls allowed in flight at once; the rest wait for a slot
+HF_HUB_MAX_CONCURRENCY = int(os.getenv("HF_HUB_MAX_CONCURRENCY", "8"))
+HF_HUB_MAX_RETRIES = int(os.getenv("HF_HUB_MAX_RETRIES", "3"))
+HF_HUB_BACKOFF_SECONDS = float(os.getenv("HF_HUB_BACKOFF_SECONDS", "0.5"))
+HF_HUB_MAX_BACKOFF_SECONDS = float(os.getenv("HF_HUB_MAX_BACKOFF_SECONDS", "10"))
+# How long a repo known to exist is trusted before checking again
+HF_HUB_REPO_CACHE_SECONDS = float(os.getenv("HF_HUB_REPO_CACHE_SECONDS", "3600"))
+# Directory laid out as <repo_type>/<repo_id>/<path>; when set it replaces the
+# Hugging Face Hub for every read and write (tests, offline development).
+HF_LOCAL_HUB_DIR = os.getenv("HF_LOCAL_HUB_DIR")
+
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+HUB_DURATION = METRICS.histogram(
+    "zeroml_hub_request_duration_seconds", "Hub calls by operation and outcome, retries included.", ("operation", "outcome")
+)
+HUB_RETRIES = METRICS.counter("zeroml_hub_retries_total", "Hub calls retried after a transient failure.", ("operation",))
+HUB_IN_FLIGHT = METRICS.gauge("zeroml_hub_requests_in_flight", "Hub calls in progress.")
+HUB_WAITING = METRICS.gauge("zeroml_hub_requests_waiting", "Hub calls waiting for a concurrency slot.")
+
+
+def _status(error: Exception) -> int | None:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    value = response.headers.get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _request_hook(request) -> None:
+    # What the library's own client does: honour offline mode, and tag each
+    # request so the Hub side can trace it
+    from huggingface_hub import constants
+    from huggingface_hub.errors import OfflineModeIsEnabled
+
+    if constants.HF_HUB_OFFLINE:
+        raise OfflineModeIsEnabled(f"Cannot reach {request.url}: offline mode is enabled (HF_HUB_OFFLINE)")
+    request.headers.setdefault("X-Amzn-Trace-Id", str(uuid.uuid4()))
+
+
+def _transient(error: Exception) -> bool:
+    import httpx
+
+    if isinstance(error, httpx.TransportError):
+        # Timeouts, refused and reset connections
+        return True
+    return _status(error) in RETRY_STATUS
+
+
+class LocalHub:
+    """
+    Stand-in for the Hub backed by a local directory tree. Has the few
+    HfApi methods HubClient calls, plus what the download cache needs.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, repo_id: str, filename: str, repo_type: str) -> Path:
+        return self.root / repo_type / repo_id / filename
+
+    def write(self, repo_id: str, repo_type: str, path_in_repo: str, data) -> Path:
+        """Store `data` (a file path, file object or bytes) atomically."""
+        dest = self.path(repo_id, path_in_repo, repo_type)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.part")
+        if isinstance(data, (str, Path)):
+            shutil.copyfile(data, tmp_path)
+        else:
+            with open(tmp_path, "wb") as f:
+                if hasattr(data, "read"):
+                    shutil.copyfileobj(data, f, DOWNLOAD_CHUNK_BYTES)
+                else:
+                    f.write(data)
+        os.replace(tmp_path, dest)
+        return dest
+
+    def repo_info(self, repo_id: str, repo_type: str = "model", token=None) -> dict:
+        # Repos are directories, created by the first write
+        return {"id": repo_id}
+
+    def create_repo(self, repo_id: str, repo_type: str = "model", token=None, exist_ok: bool = False) -> None:
+        (self.root / repo_type / repo_id).mkdir(parents=True, exist_ok=True)
+
+    def upload_file(self, path_or_fileobj, path_in_repo: str, repo_id: str, repo_type: str = "model", token=None, **kwargs) -> str:
+        self.write(repo_id, repo_type, path_in_repo, path_or_fileobj)
+        return f"local://{repo_type}/{repo_id}/{path_in_repo}"
+
+    def create_commit(self, repo_id: str, repo_type: str, operations: list, commit_message: str, token=None) -> None:
+        # Files appear one by one, not as one atomic commit
+        for op in operations:
+            with op.as_file() as f:
+                self.write(repo_id, repo_type, op.path_in_repo, f)
+
+    def etag(self, repo_id: str, filename: str, repo_type: str, revision: str) -> str:
+        path = self.path(repo_id, filename, repo_type)
+        if not path.is_file():
+            raise FileNotFoundError(f"{path} not found in local hub")
+        stat = path.stat()
+        # Size and mtime alone are shared by unrelated files
+        where = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:16]
+        return f"{where}-{stat.st_mtime_ns}-{stat.st_size}"
+
+    def download(self, repo_id: str, filename: str, repo_type: str, revision: str, dest: Path) -> None:
+        path = self.path(repo_id, filename, repo_type)
+        if not path.is_file():
+            raise FileNotFoundError(f"{path} not found in local hub")
+        shutil.copyfile(path, dest)
+
+
+class HubClient:
+    """
+    The one way this process talks to the Hugging Face Hub. Every call
+    shares a pool of keep-alive connections, waits for one of
+    `max_concurrency` slots, times out, and is retried with full-jitter
+    exponential backoff on timeouts, connection errors, 429s and 5xx;
+    the slot is given back while waiting to retry. Repos known to exist are remembered so uploads skip the check.
+    The Hub libraries are only imported on the first call. With
+    `local_dir` every call goes to a LocalHub in that directory instead.
+    """
+
+    def __init__(
+        self,
+        token: str | None = None,
+        timeout: float = HF_HUB_TIMEOUT_SECONDS,
+        max_connections: int = HF_HUB_MAX_CONNECTIONS,
+        max_concurrency: int = HF_HUB_MAX_CONCURRENCY,
+        max_retries: int = HF_HUB_MAX_RETRIES,
+        backoff_seconds: float = HF_HUB_BACKOFF_SECONDS,
+        max_backoff_seconds: float = HF_HUB_MAX_BACKOFF_SECONDS,
+        repo_cache_seconds: float = HF_HUB_REPO_CACHE_SECONDS,
+        local_dir: str | None = None,
+    ):
+        self.token = token
+        self.local = LocalHub(local_dir) if local_dir else None
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.repo_cache_seconds = repo_cache_seconds
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._repo_lock = threading.Lock()
+        self._repos: dict[tuple[str, str], float] = {}
+        self._api = None
+
+    @property
+    def api(self):
+        if self.local is not None:
+            return self.local
+        with self._lock:
+            if self._api is None:
+                from huggingface_hub import HfApi, set_client_factory
+
+                set_client_factory(self._http_client)
+                self._api = HfApi(token=self.token)
+            return self._api
+
+    def _http_client(self):
+        import httpx
+
+        return httpx.Client(
+            event_hooks={"request": [_request_hook]},
+            follow_redirects=True,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+        )
+
+    def session(self):
+        """The pooled httpx client (shared with huggingface_hub)."""
+        from huggingface_hub import get_session
+
+        self.api  # installs our client factory
+        return get_session()
+
+    def call(self, operation: str, fn, *args, max_retries: int | None = None, **kwargs):
+        """
+        Run a Hub call `fn` with a concurrency slot, retries and metrics.
+        `max_retries` overrides the client's for callers that retry on
+        their own.
+        """
+        if max_retries is None:
+            max_retries = self.max_retries
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                with self._slot():
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= max_retries or not _transient(e):
+                    with self._lock:
+                        self.failures += 1
+                    HUB_DURATION.observe(time.perf_counter() - start, operation=operation, outcome="error")
+                    raise
+                delay = random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2**attempt))
+                delay = max(delay, min(_retry_after(e) or 0, self.max_backoff_seconds))
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                HUB_RETRIES.inc(operation=operation)
+                logger.warning(f"Hub {operation} failed ({e}); retry {attempt}/{max_retries} in {delay:.2f}s")
+                # Without a slot, so other calls aren't held up by the wait
+                time.sleep(delay)
+                continue
+            with self._lock:
+                self.calls += 1
+            HUB_DURATION.observe(time.perf_counter() - start, operation=operation, outcome="ok")
+            return result
+
+    @contextmanager
+    def _slot(self):
+        HUB_WAITING.inc()
+        try:
+            self._slots.acquire()
+        finally:
+            HUB_WAITING.dec()
+        HUB_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            HUB_IN_FLIGHT.dec()
+            self._slots.release()
+
+    def ensure_repo(self, repo_id: str, repo_type: str = "dataset") -> None:
+        """Create the repo unless it exists; checked once per `repo_cache_seconds`."""
+        key = (repo_type, repo_id)
+        # Held across the check so concurrent first uploads check once
+        with self._repo_lock:
+            checked_at = self._repos.get(key)
+            if checked_at is not None and time.monotonic() - checked_at < self.repo_cache_seconds:
+                return
+            from huggingface_hub.errors import RepositoryNotFoundError
+
+            try:
+                self.call("repo_info", self.api.repo_info, repo_id=repo_id, repo_type=repo_type, token=self.token)
+            except RepositoryNotFoundError:
+                logger.info(f"Hub repo {repo_type}/{repo_id} does not exist, creating it")
+                self.call("create_repo", self.api.create_repo, repo_id=repo_id, repo_type=repo_type, token=self.token, exist_ok=True)
+            self._repos[key] = time.monotonic()
+
+    def forget_repo(self, repo_id: str, repo_type: str = "dataset") -> None:
+        """Check the repo again before the next upload (it may have been deleted)."""
+        with self._repo_lock:
+            self._repos.pop((repo_type, repo_id), None)
+
+    def _writing(self, repo_id: str, repo_type: str, operation: str, fn, max_retries: int | None = None, **kwargs):
+        from huggingface_hub.errors import RepositoryNotFoundError
+
+        try:
+            return self.call(
+                operation, fn, repo_id=repo_id, repo_type=repo_type, token=self.token, max_retries=max_retries, **kwargs
+            )
+        except RepositoryNotFoundError:
+            # Deleted since we checked
+            self.forget_repo(repo_id, repo_type)
+            raise
+
+    def upload_file(self, path_or_fileobj, path_in_repo: str, repo_id: str, repo_type: str = "dataset", **kwargs):
+        return self._writing(
+            repo_id,
+            repo_type,
+            "upload_file",
+            self.api.upload_file,
+            path_or_fileobj=path_or_fileobj,
+            path_in_repo=path_in_repo,
+            **kwargs,
+        )
+
+    def create_commit(self, repo_id: str, repo_type: str, operations: list, commit_message: str, max_retries: int | None = None):
+        return self._writing(
+            repo_id,
+            repo_type,
+            "create_commit",
+            self.api.create_commit,
+            max_retries=max_retries,
+            operations=operations,
+            commit_message=commit_message,
+        )
+
+    def file_etag(self, repo_id: str, filename: str, repo_type: str, revision: str) -> str:
+        """
+        ETag of a file on the Hub. Raises FileNotFoundError when the file
+        (or the repo) doesn't exist.
+        """
+        if self.local is not None:
+            return self.call("file_metadata", self.local.etag, repo_id, filename, repo_type, revision)
+        from huggingface_hub import get_hf_file_metadata, hf_hub_url
+        from huggingface_hub.errors import EntryNotFoundError, RepositoryNotFoundError
+
+        self.api  # installs our client factory
+        url = hf_hub_url(repo_id, filename, repo_type=repo_type, revision=revision)
+        try:
+            meta = self.call("file_metadata", get_hf_file_metadata, url, token=self.token, timeout=self.timeout)
+        except (EntryNotFoundError, RepositoryNotFoundError) as e:
+            raise FileNotFoundError(f"{repo_id}/{filename} not found on the Hub") from e
+        except Exception as e:
+            if _status(e) == 404:
+                raise FileNotFoundError(f"{repo_id}/{filename} not found on the Hub") from e
+            raise
+        return meta.etag
+
+    def download(self, repo_id: str, filename: str, repo_type: str, revision: str, dest: Path) -> None:
+        """Stream a Hub file into `dest`, starting over if a retry is needed."""
+        if self.local is not None:
+            self.call("download", self.local.download, repo_id, filename, repo_type, revision, dest)
+            return
+        from huggingface_hub import hf_hub_url
+
+        url = hf_hub_url(repo_id, filename, repo_type=repo_type, revision=revision)
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        client = self.session()
+
+        def fetch():
+            with client.stream("GET", url, headers=headers, timeout=self.timeout) as response:
+                if response.status_code == 404:
+                    raise FileNotFoundError(f"{repo_id}/{filename} not found on the Hub")
+                response.raise_for_status()
+                with open(dest, "wb") as f:
+                    for chunk in response.iter_bytes(DOWNLOAD_CHUNK_BYTES):
+                        f.write(chunk)
+
+        self.call("download", fetch)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"calls": self.calls, "retries": self.retries, "failures": self.failures}
+        # Not under _repo_lock, which is held across a repo check
+        stats["known_repos"] = [f"{t}/{r}" for t, r in list(self._repos)]
+        return stats
+
+
+HUB_CLIENT = HubClient(token=os.getenv("HF_TOKEN") or os.getenv("hf_token"), local_dir=HF_LOCAL_HUB_DIR)
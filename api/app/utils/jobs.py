@@ -0,0 +1,297 @@
+import asyncio
+import json
+import multiprocessing as mp
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+from app.logging.logging_config import REQUEST_ID, setup_logger
+from app.utils.metrics import JOB_STAGE_DURATION
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Finished jobs kept around for status queries before being forgotten
+JOB_HISTORY_LIMIT = int(os.getenv("JOB_HISTORY_LIMIT", "200"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobProgress:
+    """
+    Progress callback handed to job functions inside the worker process.
+
+    Each call publishes an event back to the parent and is also the point
+    where a cancellation request takes effect.
+    """
+
+    def __init__(self, job_id: str, events, cancelled):
+        self.job_id = job_id
+        self._events = events
+        self._cancelled = cancelled
+
+    def __call__(self, stage: str, fraction: float, **info) -> None:
+        if self._cancelled.get(self.job_id):
+            raise JobCancelled(self.job_id)
+        self._events.put((self.job_id, "progress", {"stage": stage, "progress": fraction, **info}))
+
+
+def no_progress(stage: str, fraction: float, **info) -> None:
+    """Default progress callback of job functions called outside a job."""
+
+
+def _run_job(job_id: str, request_id: str, fn, args: tuple, kwargs: dict, events, cancelled):
+    # Runs in the worker process. The pool pre-loads a few calls into its
+    # queue, so a job cancelled while "queued" may still land here.
+    if cancelled.get(job_id):
+        raise JobCancelled(job_id)
+    # Worker log lines carry the id of the request that submitted the job
+    REQUEST_ID.set(request_id)
+    events.put((job_id, "started", {"pid": os.getpid()}))
+    return fn(*args, progress=JobProgress(job_id, events, cancelled), **kwargs)
+
+
+def _import_modules(modules: tuple) -> int:
+    # Runs in a worker process ahead of its first job (JobManager.warm)
+    import importlib
+
+    for module in modules:
+        importlib.import_module(module)
+    return os.getpid()
+
+
+class Job:
+    def __init__(self, kind: str, meta: dict | None = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.request_id = REQUEST_ID.get()
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.stage = None
+        self.progress = 0.0
+        self.metrics = None
+        self.result = None
+        self.error = None
+        self.error_status = None
+        self.cancel_requested = False
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events: list[dict] = []
+        self.future = None
+        self._stage_started = None
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "request_id": self.request_id,
+            **self.meta,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": self.progress,
+            "metrics": self.metrics,
+            "error": self.error,
+            "cancel_requested": self.cancel_requested,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    """
+    Runs CPU-heavy work (model fitting) in a bounded process pool so it
+    never blocks the event loop.
+
+    Workers report progress through a manager queue; a pump thread in the
+    parent folds those events into the Job objects that the status and
+    event-stream endpoints read from. The pool and manager are started on
+    the first submit.
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._events = None
+        self._cancelled = None
+        self._pump = None
+        self._closing = False
+
+    def _ensure_started(self) -> None:
+        if self._executor is not None:
+            return
+        # spawn, not fork: the parent runs threads (uvicorn, pump, uploads)
+        ctx = mp.get_context("spawn")
+        self._manager = ctx.Manager()
+        self._events = self._manager.Queue()
+        self._cancelled = self._manager.dict()
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+        self._pump = threading.Thread(target=self._pump_events, name="job-events", daemon=True)
+        self._pump.start()
+        logger.info(f"Job pool started with {self.max_workers} workers")
+
+    def submit(self, kind: str, fn, *args, meta: dict | None = None, **kwargs) -> Job:
+        """
+        Queue `fn(*args, progress=..., **kwargs)` on the pool and return the
+        Job immediately. `fn` must be importable (it runs in another process).
+        `meta` is reported as-is alongside the job status.
+        """
+        job = Job(kind, meta)
+        with self._lock:
+            self._ensure_started()
+            self._jobs[job.id] = job
+            self._trim()
+        self._record(job, "queued", {})
+        job.future = self._executor.submit(
+            _run_job, job.id, job.request_id, fn, args, kwargs, self._events, self._cancelled
+        )
+        job.future.add_done_callback(lambda f, job=job: self._finish(job, f))
+        return job
+
+    def warm(self, modules: tuple) -> list:
+        """
+        Start the pool's workers now and have each import `modules`, so the
+        first job doesn't wait for a worker to spawn and load its code.
+        """
+        with self._lock:
+            self._ensure_started()
+        return [self._executor.submit(_import_modules, modules) for _ in range(self.max_workers)]
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def list(self) -> list[dict]:
+        return [job.to_dict(include_result=False) for job in list(self._jobs.values())]
+
+    def cancel(self, job_id: str) -> Job | None:
+        """
+        Cancel a job. Queued jobs never start; running jobs stop at their
+        next progress checkpoint.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        job.cancel_requested = True
+        if job.future.cancel():
+            return job
+        self._cancelled[job_id] = True
+        self._record(job, "cancelling", {})
+        return job
+
+    async def wait(self, job: Job):
+        """Await a job's result without blocking the event loop."""
+        return await asyncio.wrap_future(job.future)
+
+    async def stream(self, job_id: str, poll_interval: float = 0.25):
+        """Yield the job's events as they arrive, ending once it finishes."""
+        job = self._jobs[job_id]
+        sent = 0
+        while True:
+            events = job.events[sent:]
+            for event in events:
+                yield event
+            sent += len(events)
+            if job.status in FINISHED and sent >= len(job.events):
+                return
+            await asyncio.sleep(poll_interval)
+
+    def shutdown(self) -> None:
+        if self._executor is None:
+            return
+        self._closing = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._events.put(None)
+        self._manager.shutdown()
+        self._executor = None
+
+    def _record(self, job: Job, event: str, data: dict) -> None:
+        job.events.append({"event": event, "time": time.time(), **data})
+
+    def _pump_events(self) -> None:
+        while True:
+            try:
+                item = self._events.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            job_id, event, data = item
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                continue
+            if event == "started":
+                job.status = RUNNING
+                job.started_at = time.time()
+            elif event == "progress":
+                if data.get("stage") != job.stage:
+                    self._end_stage(job)
+                    job._stage_started = time.monotonic()
+                job.stage = data.get("stage")
+                job.progress = data.get("progress", job.progress)
+                if data.get("metrics") is not None:
+                    job.metrics = data["metrics"]
+            self._record(job, event, data)
+
+    def _end_stage(self, job: Job) -> None:
+        # Stage durations are measured here, from the progress events,
+        # since the stages themselves run in the worker processes
+        if job.stage is not None and job._stage_started is not None:
+            JOB_STAGE_DURATION.observe(time.monotonic() - job._stage_started, kind=job.kind, stage=job.stage)
+        job._stage_started = None
+
+    def _finish(self, job: Job, future) -> None:
+        job.finished_at = time.time()
+        self._end_stage(job)
+        try:
+            job.result = future.result()
+            job.status = SUCCEEDED
+            job.progress = 1.0
+            if isinstance(job.result, dict) and job.result.get("metrics") is not None:
+                job.metrics = job.result["metrics"]
+        except (CancelledError, JobCancelled):
+            job.status = CANCELLED
+        except Exception as e:
+            if self._closing:
+                # Worker torn down with the server; not the job's fault
+                job.status = CANCELLED
+                return
+            job.status = FAILED
+            job.error = getattr(e, "detail", None) or str(e)
+            job.error_status = getattr(e, "status_code", None)
+            logger.error(f"Job {job.id} failed: {job.error}")
+        self._record(job, job.status, {"result": job.result} if job.status == SUCCEEDED else {"error": job.error})
+        try:
+            self._cancelled.pop(job.id, None)
+        except (OSError, EOFError):
+            # Manager already gone (shutdown)
+            pass
+
+    def _trim(self) -> None:
+        finished = [j for j in self._jobs.values() if j.status in FINISHED]
+        for job in sorted(finished, key=lambda j: j.finished_at)[: max(0, len(finished) - JOB_HISTORY_LIMIT)]:
+            del self._jobs[job.id]
+
+
+def sse_format(event: dict) -> str:
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+JOBS = JobManager(max_workers=JOB_MAX_WORKERS)
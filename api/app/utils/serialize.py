@@ -0,0 +1,169 @@
+import datetime
+import decimal
+import io
+import json
+import math
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used without it
+    orjson = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# ?format= values, and the media types an Accept header may name for each
+FORMATS = {"json": JSON, "ndjson": NDJSON, "arrow": ARROW_STREAM}
+_ACCEPT_ALIASES = {
+    JSON: JSON,
+    NDJSON: NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+    "application/json-seq": NDJSON,
+    ARROW_STREAM: ARROW_STREAM,
+    "application/vnd.apache.arrow": ARROW_STREAM,
+}
+
+PREVIEW_ROWS = 5
+
+
+def _default(obj):
+    # Values the encoders don't know natively
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, float) and not math.isfinite(obj):
+        return None
+    return str(obj)
+
+
+def dumps(obj) -> bytes:
+    """Compact JSON bytes; NaN and infinities become null."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(_finite(obj), default=_default, separators=(",", ":"), ensure_ascii=False, allow_nan=False).encode()
+
+
+def _finite(obj):
+    # The stdlib encoder writes NaN (not valid JSON) instead of calling `default`
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with `dumps`. Returned directly from a route it
+    also skips FastAPI's per-value jsonable_encoder pass, which dominates
+    for pages of records.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def _column_values(s: pd.Series) -> list:
+    if not isinstance(s.dtype, np.dtype):
+        # Categoricals, nullable and Arrow-backed types
+        return s.astype(object).where(s.notna(), None).tolist()
+    if s.dtype.kind == "M":
+        return [None if pd.isna(v) else v.isoformat() for v in s]
+    if s.dtype.kind == "m":
+        return [None if pd.isna(v) else str(v) for v in s]
+    if s.dtype.kind in "iub":
+        # No missing values possible; tolist gives Python scalars
+        return s.tolist()
+    if s.dtype.kind == "f":
+        values = s.to_numpy()
+        out = values.tolist()
+        bad = ~np.isfinite(values)
+        if bad.any():
+            for i in np.flatnonzero(bad):
+                out[i] = None
+        return out
+    return s.where(s.notna(), None).tolist()
+
+
+def records(df: pd.DataFrame) -> list[dict]:
+    """
+    Rows of `df` as dicts of JSON-ready Python values (missing values as
+    None, timestamps as ISO strings), built column by column rather than
+    through an intermediate JSON string.
+    """
+    names = [str(name) for name in df.columns]
+    columns = [_column_values(s) for _, s in df.items()]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def preview(df: pd.DataFrame, n: int = PREVIEW_ROWS) -> list[dict]:
+    """The first `n` rows, as returned in upload and cleaning responses."""
+    return records(df.head(n))
+
+
+def negotiate(accept: str | None, fmt: str | None = None) -> str:
+    """
+    The media type to answer with: `fmt` (json, ndjson or arrow) when
+    given, else the supported type the Accept header prefers, else JSON.
+    Raises ValueError for an unknown `fmt`.
+    """
+    if fmt:
+        try:
+            return FORMATS[fmt.lower()]
+        except KeyError:
+            raise ValueError(f"Unknown format {fmt!r}; use one of {sorted(FORMATS)}")
+    best, best_q = JSON, 0.0
+    for part in (accept or "").split(","):
+        media, _, params = part.strip().partition(";")
+        media_type = _ACCEPT_ALIASES.get(media.strip().lower())
+        if media_type is None:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = media_type, q
+    return best
+
+
+def _drain(buf: io.BytesIO) -> bytes:
+    data = buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    return data
+
+
+def arrow_stream(schema: pa.Schema, batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+    """Arrow IPC stream bytes, one chunk per record batch."""
+    buf = io.BytesIO()
+    with pa.ipc.new_stream(buf, schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield _drain(buf)
+    # End-of-stream marker
+    yield _drain(buf)
+
+
+def ndjson_stream(batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+    """One JSON object per line, one chunk per record batch."""
+    for batch in batches:
+        if batch.num_rows:
+            yield b"\n".join(dumps(row) for row in batch.to_pylist()) + b"\n"
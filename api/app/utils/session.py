@@ -1 +1,685 @@
-SESSIONS = {}
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+from app.utils.storage import ARROW_ERRORS, read_dataset, read_ipc, write_ipc
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+SESSION_MEMORY_BUDGET_MB = int(os.getenv("SESSION_MEMORY_BUDGET_MB", "1024"))
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "900"))
+SESSION_SPILL_DIR = os.getenv(
+    "SESSION_SPILL_DIR", os.path.join(tempfile.gettempdir(), "zeroml-sessions")
+)
+# "memory" (default): frames live in this process, so only one server
+# worker can be run. "shared": Arrow IPC files in SESSION_SHARED_DIR that
+# every worker process on the host memory-maps.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_SHARED_DIR = os.getenv(
+    "SESSION_SHARED_DIR",
+    "/dev/shm/zeroml-sessions" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "zeroml-shared-sessions"),
+)
+# Decoded frames each worker keeps around; they mostly point into the shared mapping
+SESSION_SHARED_CACHE_SESSIONS = int(os.getenv("SESSION_SHARED_CACHE_SESSIONS", "8"))
+
+# Session ids become directory names in the shared backend
+_SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+
+# Spill and snapshot files, by suffix
+FILE_FORMATS = {".arrow": "arrow", ".parquet": "parquet", ".pkl": "pickle"}
+
+
+def _write_frame(df: pd.DataFrame, stem: Path, label: str) -> Path:
+    """
+    Write `df` to `<stem>.arrow` for read_ipc to map, or to `<stem>.pkl`
+    when Arrow can't represent it. The file appears complete or not at all.
+    """
+    tmp_path = stem.with_name(f".{stem.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write_ipc(df, tmp_path)
+        path = stem.with_name(f"{stem.name}.arrow")
+    except ARROW_ERRORS as e:
+        # Mixed-type object columns can't go through Arrow; such a frame
+        # can still be read by another process, just not memory-mapped
+        logger.warning(f"Arrow IPC write failed for session {label} ({e}), using pickle")
+        tmp_path.unlink(missing_ok=True)
+        df.to_pickle(tmp_path)
+        path = stem.with_name(f"{stem.name}.pkl")
+    os.replace(tmp_path, path)
+    return path
+
+
+def _link(source: Path, target: Path) -> Path:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        # Hard links don't cross filesystems
+        shutil.copyfile(source, target)
+    return target
+
+
+def _snapshot_ref(path: Path, version: int) -> dict:
+    return {"path": str(path), "format": FILE_FORMATS[path.suffix], "version": version}
+
+
+def _notify(listeners, session_id: str, reason: str) -> None:
+    for listener in listeners:
+        try:
+            listener(session_id, reason)
+        except Exception:
+            logger.exception(f"Session {reason} listener failed for {session_id}")
+
+
+def drop_snapshot(snapshot: dict | None) -> None:
+    """Remove a file handed out by a store's snapshot()."""
+    if snapshot is not None:
+        Path(snapshot["path"]).unlink(missing_ok=True)
+
+
+class _Entry:
+    __slots__ = ("frame", "spill_path", "memory_bytes", "attached_bytes", "disk_bytes", "last_access", "version", "notes")
+
+    def __init__(self, frame: pd.DataFrame, version: int = 1):
+        self.frame = frame
+        self.version = version
+        self.spill_path = None
+        self.memory_bytes = frame_memory_bytes(frame)
+        # Held by others alongside the frame, see attach_bytes
+        self.attached_bytes = 0
+        self.disk_bytes = 0
+        self.last_access = time.monotonic()
+        # Facts about this version, see annotate
+        self.notes = {}
+
+
+def frame_memory_bytes(df: pd.DataFrame) -> int:
+    """Deep memory footprint of a DataFrame, including object payloads."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class SessionStore(MutableMapping):
+    """
+    Dict-like store of session DataFrames with a memory budget.
+
+    Sessions are kept in LRU order. When the in-memory total goes over
+    ``memory_budget_bytes`` (or a session stays idle longer than
+    ``idle_ttl_seconds``) the coldest frames are spilled to Parquet files in
+    ``spill_dir`` and read back transparently on the next access. The total
+    includes memory other modules attach to a session (attach_bytes), such
+    as its undo history, which they free when told the session was spilled
+    (on_evict).
+    """
+
+    # Frames are only visible to this process
+    shared = False
+
+    def __init__(self, memory_budget_bytes: int, idle_ttl_seconds: int, spill_dir: str):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.spill_dir = Path(spill_dir)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._evict_listeners = []
+
+    # --- mapping protocol -------------------------------------------------
+
+    def __getitem__(self, session_id: str) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entries[session_id]
+            if entry.frame is None:
+                self._rehydrate(session_id, entry)
+            self._touch(session_id, entry)
+            self._enforce_budget(keep=session_id)
+            return entry.frame
+
+    def __setitem__(self, session_id: str, df: pd.DataFrame) -> None:
+        with self._lock:
+            old = self._entries.get(session_id)
+            if old is not None:
+                self._drop_spill(old)
+            entry = _Entry(df, version=old.version + 1 if old is not None else 1)
+            self._entries[session_id] = entry
+            self._touch(session_id, entry)
+            self._enforce_budget(keep=session_id)
+
+    def __delitem__(self, session_id: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(session_id)
+            self._drop_spill(entry)
+            _notify(self._evict_listeners, session_id, "delete")
+
+    def __contains__(self, session_id) -> bool:
+        with self._lock:
+            return session_id in self._entries
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def attach_bytes(self, session_id: str, nbytes: int) -> None:
+        """
+        Count `nbytes` held elsewhere for the session (replacing the last
+        figure) against the memory budget, until the session is replaced or
+        spilled. Whoever holds them must let go on spill, see on_evict.
+        """
+        with self._lock:
+            entry = self._entries[session_id]
+            if entry.frame is None:
+                return
+            entry.attached_bytes = nbytes
+            self._enforce_budget(keep=session_id)
+
+    def on_evict(self, listener) -> None:
+        """
+        Call `listener(session_id, reason)` whenever this process spills
+        (reason "spill") or deletes ("delete") a session, so state kept
+        alongside it can be let go too.
+        """
+        self._evict_listeners.append(listener)
+
+    def snapshot(self, session_id: str) -> dict:
+        """
+        The session's current frame as a file another process can read
+        with storage.read_snapshot, so jobs don't get the frame pickled to
+        them: the spill file, hard-linked, while the session is on disk,
+        otherwise a new Arrow IPC file the reader memory-maps. Returns
+        ``{"path", "format", "version"}``; the caller removes the file with
+        drop_snapshot when done.
+        """
+        with self._lock:
+            entry = self._entries[session_id]
+            self._touch(session_id, entry)
+            stem = self.spill_dir / "snapshots" / f"{session_id}.v{entry.version}.{uuid.uuid4().hex[:8]}"
+            if entry.frame is None:
+                path = _link(entry.spill_path, stem.with_name(stem.name + entry.spill_path.suffix))
+                return _snapshot_ref(path, entry.version)
+            frame, version = entry.frame, entry.version
+        # Frames are replaced, not changed, once stored, so this one can be
+        # written without holding up other sessions
+        stem.parent.mkdir(parents=True, exist_ok=True)
+        return _snapshot_ref(_write_frame(frame, stem, session_id), version)
+
+    def annotate(self, session_id: str, version: int, key: str, value) -> None:
+        """
+        Record a small fact about `version` of the session (an export's
+        size...). Dropped when the frame is replaced; ignored if it already
+        has been.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None and entry.version == version:
+                entry.notes[key] = value
+
+    def annotation(self, session_id: str, version: int, key: str):
+        """What annotate recorded under `key` for `version`, or None."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None or entry.version != version:
+                return None
+            return entry.notes.get(key)
+
+    # --- reporting --------------------------------------------------------
+
+    def memory_in_use(self) -> int:
+        with self._lock:
+            return sum(e.memory_bytes + e.attached_bytes for e in self._entries.values() if e.frame is not None)
+
+    def version(self, session_id: str) -> int:
+        """Incremented each time the session's frame is replaced."""
+        with self._lock:
+            return self._entries[session_id].version
+
+    def usage(self, session_id: str) -> dict:
+        with self._lock:
+            return self._describe(session_id, self._entries[session_id])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "memory_in_use_bytes": self.memory_in_use(),
+                "idle_ttl_seconds": self.idle_ttl_seconds,
+                "sessions": [self._describe(sid, e) for sid, e in self._entries.items()],
+            }
+
+    def _describe(self, session_id: str, entry: _Entry) -> dict:
+        return {
+            "session_id": session_id,
+            "state": "memory" if entry.frame is not None else "disk",
+            "version": entry.version,
+            "memory_bytes": entry.memory_bytes if entry.frame is not None else 0,
+            "attached_bytes": entry.attached_bytes,
+            "disk_bytes": entry.disk_bytes,
+            "idle_seconds": round(time.monotonic() - entry.last_access, 3),
+        }
+
+    # --- spill / rehydrate ------------------------------------------------
+
+    def _touch(self, session_id: str, entry: _Entry) -> None:
+        entry.last_access = time.monotonic()
+        self._entries.move_to_end(session_id)
+
+    def _enforce_budget(self, keep: str) -> None:
+        now = time.monotonic()
+        for sid, entry in list(self._entries.items()):
+            if sid != keep and entry.frame is not None and now - entry.last_access > self.idle_ttl_seconds:
+                self._spill(sid, entry)
+
+        in_use = self.memory_in_use()
+        for sid, entry in list(self._entries.items()):
+            if in_use <= self.memory_budget_bytes:
+                break
+            if sid == keep or entry.frame is None:
+                continue
+            in_use -= entry.memory_bytes + entry.attached_bytes
+            self._spill(sid, entry)
+
+    def _spill(self, session_id: str, entry: _Entry) -> None:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spill_dir / f"{session_id}.parquet"
+        try:
+            entry.frame.to_parquet(path, index=True)
+        except Exception as e:
+            # Frames with mixed-type object columns or non-string labels can't
+            # go through Arrow; keep them spillable anyway.
+            logger.warning(f"Parquet spill failed for session {session_id} ({e}), using pickle")
+            path.unlink(missing_ok=True)
+            path = self.spill_dir / f"{session_id}.pkl"
+            entry.frame.to_pickle(path)
+        entry.spill_path = path
+        entry.disk_bytes = path.stat().st_size
+        entry.frame = None
+        logger.info(f"Spilled session {session_id} to {path} ({entry.memory_bytes + entry.attached_bytes} bytes freed)")
+        _notify(self._evict_listeners, session_id, "spill")
+        entry.attached_bytes = 0
+
+    def _rehydrate(self, session_id: str, entry: _Entry) -> None:
+        path = entry.spill_path
+        if path.suffix == ".parquet":
+            entry.frame = read_dataset(path)
+        else:
+            entry.frame = pd.read_pickle(path)
+        entry.memory_bytes = frame_memory_bytes(entry.frame)
+        # The frame may be mutated in place from here on, so the spill file
+        # is stale as soon as it is back in memory.
+        self._drop_spill(entry)
+        logger.info(f"Rehydrated session {session_id} from {path}")
+
+    def _drop_spill(self, entry: _Entry) -> None:
+        if entry.spill_path is not None:
+            Path(entry.spill_path).unlink(missing_ok=True)
+            entry.spill_path = None
+            entry.disk_bytes = 0
+
+
+class SharedSessionStore(MutableMapping):
+    """
+    Dict-like store of session DataFrames shared by all the server's worker
+    processes on a host, so a session created on one worker can be used
+    from any other.
+
+    Each session is one uncompressed Arrow IPC file per version under
+    ``root`` (shared memory by default) plus a small ``meta.json``; writes
+    take a per-session file lock and bump the version. Readers memory-map
+    the file, so numeric and Arrow string columns point straight into the
+    shared pages instead of every worker holding a private copy. Each
+    worker keeps its last few decoded frames and reuses them while the
+    version is unchanged, handing out the same frame each time. Mapped
+    arrays are read-only: code that changes a session frame works on a
+    copy of the columns it writes, as cleaning's run_code does, and stores
+    the result as a new version.
+
+    The memory budget and idle TTL apply to the shared files, plus what
+    this process attached to sessions (attach_bytes): past them the least
+    recently used sessions are moved to ``spill_dir`` and mapped from disk
+    from then on, until they are next written.
+    """
+
+    shared = True
+
+    META = "meta.json"
+
+    def __init__(self, root: str, memory_budget_bytes: int, idle_ttl_seconds: int, spill_dir: str, cache_sessions: int):
+        self.root = Path(root)
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.spill_dir = Path(spill_dir) / "shared"
+        self.cache_sessions = cache_sessions
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Decoded frames of this process: session_id -> (version, frame)
+        self._cache: "OrderedDict[str, tuple[int, pd.DataFrame]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._evict_listeners = []
+        # Bytes this process holds alongside sessions, see attach_bytes
+        self._attached: dict[str, int] = {}
+
+    # --- mapping protocol -------------------------------------------------
+
+    def __getitem__(self, session_id: str) -> pd.DataFrame:
+        # The file of the version we just read the meta of can be replaced
+        # by another worker before we open it; read the meta again then
+        for _ in range(5):
+            meta = self._meta(session_id)
+            if meta is None:
+                with self._lock:
+                    self._cache.pop(session_id, None)
+                raise KeyError(session_id)
+            with self._lock:
+                cached = self._cache.get(session_id)
+                if cached is not None and cached[0] == meta["version"]:
+                    self._cache.move_to_end(session_id)
+                    self._touch(session_id)
+                    return cached[1]
+            try:
+                df = self._read(meta)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self._cache[session_id] = (meta["version"], df)
+                self._cache.move_to_end(session_id)
+                while len(self._cache) > self.cache_sessions:
+                    self._cache.popitem(last=False)
+            self._touch(session_id)
+            return df
+        raise KeyError(session_id)
+
+    def __setitem__(self, session_id: str, df: pd.DataFrame) -> None:
+        with self._locked(session_id) as directory:
+            old = self._meta(session_id) or {}
+            version = old.get("version", 0) + 1
+            path, fmt = self._write(directory, version, df)
+            self._write_meta(directory, {
+                "version": version,
+                "file": str(path),
+                "format": fmt,
+                "bytes": path.stat().st_size,
+                "rows": len(df),
+                "spilled": False,
+                "updated_at": time.time(),
+            })
+            if old.get("file"):
+                # Workers that still map it keep their pages until they let go
+                Path(old["file"]).unlink(missing_ok=True)
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._attached.pop(session_id, None)
+        self._enforce_budget(keep=session_id)
+
+    def __delitem__(self, session_id: str) -> None:
+        with self._locked(session_id) as directory:
+            meta = self._meta(session_id)
+            if meta is None:
+                raise KeyError(session_id)
+            Path(meta["file"]).unlink(missing_ok=True)
+            (directory / self.META).unlink(missing_ok=True)
+        shutil.rmtree(self._dir(session_id), ignore_errors=True)
+        shutil.rmtree(self.spill_dir / session_id, ignore_errors=True)
+        with self._lock:
+            self._cache.pop(session_id, None)
+            self._attached.pop(session_id, None)
+        _notify(self._evict_listeners, session_id, "delete")
+
+    def __contains__(self, session_id) -> bool:
+        return isinstance(session_id, str) and self._meta(session_id) is not None
+
+    def __iter__(self):
+        return iter(self._session_ids())
+
+    def __len__(self) -> int:
+        return len(self._session_ids())
+
+    def attach_bytes(self, session_id: str, nbytes: int) -> None:
+        """
+        Count `nbytes` this process holds for the session (replacing the
+        last figure) against the memory budget, until the session is
+        written again or this process spills it. Whoever holds them must
+        let go on spill, see on_evict.
+        """
+        with self._lock:
+            self._attached[session_id] = nbytes
+        self._enforce_budget(keep=session_id)
+
+    def on_evict(self, listener) -> None:
+        """
+        Call `listener(session_id, reason)` whenever this process spills
+        (reason "spill") or deletes ("delete") a session, so state kept
+        alongside it can be let go too.
+        """
+        self._evict_listeners.append(listener)
+
+    def snapshot(self, session_id: str) -> dict:
+        """
+        The session's current file, hard-linked so it outlives the next
+        write or spill, for another process to map with
+        storage.read_snapshot. Returns ``{"path", "format", "version"}``;
+        remove it with drop_snapshot when done.
+        """
+        if session_id not in self:
+            raise KeyError(session_id)
+        with self._locked(session_id):
+            meta = self._meta(session_id)
+            if meta is None:
+                raise KeyError(session_id)
+            source = Path(meta["file"])
+            target = source.parent.parent / ".snapshots" / f"{session_id}.v{meta['version']}.{uuid.uuid4().hex[:8]}{source.suffix}"
+            path = _link(source, target)
+        self._touch(session_id)
+        return _snapshot_ref(path, meta["version"])
+
+    def annotate(self, session_id: str, version: int, key: str, value) -> None:
+        """
+        Record a small JSON-serializable fact about `version` of the
+        session in its meta file, for every worker to see. Dropped when the
+        frame is replaced; ignored if it already has been.
+        """
+        if session_id not in self:
+            return
+        with self._locked(session_id) as directory:
+            meta = self._meta(session_id)
+            if meta is None or meta["version"] != version:
+                return
+            self._write_meta(directory, {**meta, "notes": {**meta.get("notes", {}), key: value}})
+
+    def annotation(self, session_id: str, version: int, key: str):
+        """What annotate recorded under `key` for `version`, or None."""
+        meta = self._meta(session_id)
+        if meta is None or meta["version"] != version:
+            return None
+        return meta.get("notes", {}).get(key)
+
+    # --- reporting --------------------------------------------------------
+
+    def memory_in_use(self) -> int:
+        """Bytes of session files in the shared directory."""
+        return sum(meta["bytes"] for _, meta, _ in self._all_metas() if not meta["spilled"])
+
+    def version(self, session_id: str) -> int:
+        """Incremented each time the session's frame is replaced, by any worker."""
+        meta = self._meta(session_id)
+        if meta is None:
+            raise KeyError(session_id)
+        return meta["version"]
+
+    def usage(self, session_id: str) -> dict:
+        meta = self._meta(session_id)
+        if meta is None:
+            raise KeyError(session_id)
+        return self._describe(session_id, meta, self._last_access(session_id))
+
+    def stats(self) -> dict:
+        return {
+            "backend": "shared",
+            "shared_dir": str(self.root),
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "memory_in_use_bytes": self.memory_in_use(),
+            "idle_ttl_seconds": self.idle_ttl_seconds,
+            "pid": os.getpid(),
+            "sessions": [self._describe(sid, meta, accessed) for sid, meta, accessed in self._all_metas()],
+        }
+
+    def _describe(self, session_id: str, meta: dict, last_access: float) -> dict:
+        with self._lock:
+            cached = self._cache.get(session_id)
+            attached = self._attached.get(session_id, 0)
+        return {
+            "session_id": session_id,
+            "state": "disk" if meta["spilled"] else "shared",
+            "version": meta["version"],
+            "rows": meta["rows"],
+            "memory_bytes": 0 if meta["spilled"] else meta["bytes"],
+            "attached_bytes_in_this_worker": attached,
+            "disk_bytes": meta["bytes"] if meta["spilled"] else 0,
+            "idle_seconds": round(max(time.time() - last_access, 0), 3),
+            "decoded_in_this_worker": cached is not None and cached[0] == meta["version"],
+        }
+
+    # --- files ------------------------------------------------------------
+
+    def _dir(self, session_id: str) -> Path:
+        if not isinstance(session_id, str) or not _SESSION_ID_RE.match(session_id):
+            raise KeyError(session_id)
+        return self.root / session_id
+
+    def _meta(self, session_id: str) -> dict | None:
+        try:
+            with open(self._dir(session_id) / self.META) as f:
+                return json.load(f)
+        except (KeyError, FileNotFoundError, NotADirectoryError):
+            return None
+
+    def _write_meta(self, directory: Path, meta: dict) -> None:
+        tmp_path = directory / f".{self.META}.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, directory / self.META)
+
+    def _last_access(self, session_id: str) -> float:
+        try:
+            return (self._dir(session_id) / self.META).stat().st_mtime
+        except OSError:
+            return 0.0
+
+    def _touch(self, session_id: str) -> None:
+        # The meta file's mtime is the session's last access, across workers
+        try:
+            os.utime(self._dir(session_id) / self.META)
+        except OSError:
+            pass
+
+    def _session_ids(self) -> list[str]:
+        try:
+            return sorted(p.name for p in self.root.iterdir() if (p / self.META).is_file())
+        except FileNotFoundError:
+            return []
+
+    def _all_metas(self):
+        for session_id in self._session_ids():
+            meta = self._meta(session_id)
+            if meta is not None:
+                yield session_id, meta, self._last_access(session_id)
+
+    @contextmanager
+    def _locked(self, session_id: str):
+        # flock works across processes and, with one open file per caller,
+        # across threads of this process too. POSIX only, so imported here:
+        # the in-memory backend doesn't need it
+        import fcntl
+
+        directory = self._dir(session_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(directory / ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield directory
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write(self, directory: Path, version: int, df: pd.DataFrame) -> tuple[Path, str]:
+        path = _write_frame(df, directory / f"v{version}", directory.name)
+        return path, FILE_FORMATS[path.suffix]
+
+    def _read(self, meta: dict) -> pd.DataFrame:
+        if meta["format"] == "arrow":
+            return read_ipc(meta["file"])
+        return pd.read_pickle(meta["file"])
+
+    # --- budget -----------------------------------------------------------
+
+    def _enforce_budget(self, keep: str) -> None:
+        now = time.time()
+        live = [(accessed, sid, meta) for sid, meta, accessed in self._all_metas() if not meta["spilled"]]
+        with self._lock:
+            attached = dict(self._attached)
+        in_use = sum(meta["bytes"] + attached.get(sid, 0) for _, sid, meta in live)
+        for accessed, sid, meta in sorted(live, key=lambda item: item[0]):
+            if sid == keep:
+                continue
+            if now - accessed > self.idle_ttl_seconds or in_use > self.memory_budget_bytes:
+                if self._spill(sid):
+                    in_use -= meta["bytes"] + attached.get(sid, 0)
+
+    def _spill(self, session_id: str) -> bool:
+        with self._locked(session_id) as directory:
+            meta = self._meta(session_id)
+            if meta is None or meta["spilled"]:
+                return False
+            accessed = self._last_access(session_id)
+            target_dir = self.spill_dir / session_id
+            target_dir.mkdir(parents=True, exist_ok=True)
+            source = Path(meta["file"])
+            target = target_dir / source.name
+            tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, target)
+            self._write_meta(directory, {**meta, "file": str(target), "spilled": True})
+            # Spilling isn't an access
+            os.utime(directory / self.META, (accessed, accessed))
+            source.unlink(missing_ok=True)
+        logger.info(f"Spilled shared session {session_id} to {target} ({meta['bytes']} bytes freed)")
+        _notify(self._evict_listeners, session_id, "spill")
+        with self._lock:
+            self._attached.pop(session_id, None)
+        return True
+
+
+def _default_store():
+    if SESSION_BACKEND == "shared":
+        return SharedSessionStore(
+            root=SESSION_SHARED_DIR,
+            memory_budget_bytes=SESSION_MEMORY_BUDGET_MB * 1024 * 1024,
+            idle_ttl_seconds=SESSION_IDLE_TTL_SECONDS,
+            spill_dir=SESSION_SPILL_DIR,
+            cache_sessions=SESSION_SHARED_CACHE_SESSIONS,
+        )
+    if SESSION_BACKEND != "memory":
+        logger.warning(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r}, keeping sessions in memory")
+    return SessionStore(
+        memory_budget_bytes=SESSION_MEMORY_BUDGET_MB * 1024 * 1024,
+        idle_ttl_seconds=SESSION_IDLE_TTL_SECONDS,
+        spill_dir=SESSION_SPILL_DIR,
+    )
+
+
+SESSIONS = _default_store()
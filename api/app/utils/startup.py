@@ -0,0 +1,183 @@
+import asyncio
+import importlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from app.logging.logging_config import setup_logger
+from app.utils.metrics import METRICS
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+# Import the heavy subsystems in the background once the server is up, so
+# the first request that needs them doesn't pay for it
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "false").lower() in ("1", "true", "yes")
+# Comma-separated names from SUBSYSTEMS
+STARTUP_WARMUP_SUBSYSTEMS = os.getenv("STARTUP_WARMUP_SUBSYSTEMS", "training,inference,hub")
+
+# Modules loaded on first use rather than at startup, by subsystem
+SUBSYSTEMS = {
+    "training": (
+        "app.components.training.train",
+        "app.components.training.streaming",
+        "app.components.training.search",
+    ),
+    "inference": ("app.components.inference.predict",),
+    "hub": ("huggingface_hub.hf_api", "huggingface_hub.file_download"),
+    "llm": ("openai",),
+}
+
+STARTUP_SECONDS = METRICS.gauge("zeroml_startup_seconds", "Time spent in each startup phase.", ("phase",))
+LAZY_IMPORT_SECONDS = METRICS.gauge(
+    "zeroml_lazy_import_seconds", "Time the first import of a lazily loaded module took.", ("module",)
+)
+
+
+def _process_age() -> float | None:
+    """Seconds since this process was started, from /proc where available."""
+    try:
+        with open("/proc/self/stat") as f:
+            # The command name may contain spaces; fields resume after ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _top_level_packages() -> set[str]:
+    # Third-party packages only; the standard library isn't what we tune
+    names = {name.partition(".")[0] for name in list(sys.modules)}
+    return {n for n in names if not n.startswith("_") and n not in sys.stdlib_module_names}
+
+
+class StartupProfile:
+    """
+    Where cold start time goes: the startup phases main.py goes through
+    (with the packages each one pulled in), when the app was ready to
+    serve, and the first-use cost of every lazily imported module. For a
+    per-module tree run the server with `python -X importtime`.
+    """
+
+    def __init__(self):
+        self.phases: list[dict] = []
+        self.lazy_imports: dict[str, float] = {}
+        self.ready_seconds = None
+        self.warmup = {"status": "off"}
+        self._lock = threading.Lock()
+        # Interpreter start up to here, when /proc tells us
+        before = _process_age()
+        if before is not None:
+            self._record_phase("interpreter", before, [])
+
+    def _record_phase(self, name: str, seconds: float, packages: list[str]) -> None:
+        self.phases.append({"phase": name, "seconds": round(seconds, 4), "packages": packages})
+        STARTUP_SECONDS.set(seconds, phase=name)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a startup phase and note the top-level packages it imported."""
+        loaded = _top_level_packages()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._record_phase(name, elapsed, sorted(_top_level_packages() - loaded))
+
+    def ready(self) -> None:
+        """Mark the app as ready to serve and log the breakdown."""
+        age = _process_age()
+        self.ready_seconds = round(age if age is not None else sum(p["seconds"] for p in self.phases), 4)
+        STARTUP_SECONDS.set(self.ready_seconds, phase="ready")
+        breakdown = ", ".join(f"{p['phase']} {p['seconds']:.2f}s" for p in self.phases)
+        logger.info(f"Ready to serve after {self.ready_seconds:.2f}s ({breakdown})")
+
+    def record_import(self, module: str, seconds: float) -> None:
+        with self._lock:
+            self.lazy_imports[module] = round(seconds, 4)
+        LAZY_IMPORT_SECONDS.set(seconds, module=module)
+
+    def report(self) -> dict:
+        return {
+            "ready_seconds": self.ready_seconds,
+            "phases": self.phases,
+            "lazy_imports": dict(self.lazy_imports),
+            "loaded_subsystems": [
+                name for name, modules in SUBSYSTEMS.items() if all(m in sys.modules for m in modules)
+            ],
+            "warmup": dict(self.warmup),
+        }
+
+
+STARTUP = StartupProfile()
+
+
+def lazy_import(module: str):
+    """
+    `importlib.import_module`, recording how long the first import took.
+    Heavy dependencies (scikit-learn, the Hub client...) are loaded this
+    way when first needed instead of when the app starts.
+    """
+    loaded = sys.modules.get(module)
+    if loaded is not None:
+        return loaded
+    start = time.perf_counter()
+    loaded = importlib.import_module(module)
+    elapsed = time.perf_counter() - start
+    # Another thread may have finished the same import meanwhile
+    if module not in STARTUP.lazy_imports:
+        STARTUP.record_import(module, elapsed)
+        logger.info(f"Loaded {module} on first use in {elapsed:.2f}s")
+    return loaded
+
+
+async def import_async(module: str):
+    """lazy_import off the event loop, so a first import doesn't stall other requests."""
+    loaded = sys.modules.get(module)
+    if loaded is not None:
+        return loaded
+    return await asyncio.to_thread(lazy_import, module)
+
+
+def _warm(subsystems: list[str]) -> None:
+    from app.utils.jobs import JOBS
+
+    start = time.perf_counter()
+    STARTUP.warmup = {"status": "running", "subsystems": subsystems}
+    try:
+        if "training" in subsystems:
+            # Spawned job workers import the training code on their first
+            # job; start them now and have them do it ahead of time
+            JOBS.warm(SUBSYSTEMS["training"])
+        for name in subsystems:
+            for module in SUBSYSTEMS[name]:
+                lazy_import(module)
+    except Exception as e:
+        logger.exception("Warmup failed")
+        STARTUP.warmup = {"status": "failed", "subsystems": subsystems, "error": str(e)}
+        return
+    elapsed = time.perf_counter() - start
+    STARTUP.warmup = {"status": "done", "subsystems": subsystems, "seconds": round(elapsed, 4)}
+    logger.info(f"Warmed up {', '.join(subsystems)} in {elapsed:.2f}s")
+
+
+def start_warmup(subsystems: str = STARTUP_WARMUP_SUBSYSTEMS) -> threading.Thread | None:
+    """Import the given subsystems on a background thread (see STARTUP_WARMUP)."""
+    names = [s.strip() for s in subsystems.split(",") if s.strip()]
+    unknown = [s for s in names if s not in SUBSYSTEMS]
+    if unknown:
+        logger.warning(f"Ignoring unknown warmup subsystems {unknown}; known: {list(SUBSYSTEMS)}")
+        names = [s for s in names if s in SUBSYSTEMS]
+    if not names:
+        return None
+    thread = threading.Thread(target=_warm, args=(names,), name="warmup", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,267 @@
+import io
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.utils.dtypes import arrow_types_mapper
+
+# Canonical on-disk / on-Hub dataset format. CSV is only produced for
+# explicit exports.
+DATASET_SUFFIX = ".parquet"
+# Small enough row groups that previews and projections can skip most of a file
+ROW_GROUP_SIZE = 64_000
+COMPRESSION = "zstd"
+
+
+ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+
+
+def _stringify_mixed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Arrow needs one type per column; object columns mixing e.g. ints and
+    strings are stored as strings (nulls kept).
+    """
+    df = df.copy(deep=False)
+    for col in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[col], from_pandas=True)
+        except ARROW_ERRORS:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def to_arrow(df: pd.DataFrame, index: bool = False) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=index)
+    except ARROW_ERRORS:
+        return pa.Table.from_pandas(_stringify_mixed(df), preserve_index=index)
+
+
+def write_dataset(df: pd.DataFrame, path, index: bool = False) -> None:
+    """
+    Write a DataFrame as Parquet, keeping dtypes (including categoricals)
+    in the pandas metadata so they survive the round trip.
+    """
+    pq.write_table(
+        to_arrow(df, index=index),
+        path,
+        compression=COMPRESSION,
+        row_group_size=ROW_GROUP_SIZE,
+    )
+
+
+def dataset_bytes(df: pd.DataFrame) -> io.BytesIO:
+    """Serialize a DataFrame to an in-memory Parquet buffer ready for upload."""
+    buf = io.BytesIO()
+    write_dataset(df, buf)
+    buf.seek(0)
+    return buf
+
+
+def read_dataset(path, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    Read a Parquet dataset memory-mapped, optionally projecting to `columns`
+    so untouched column chunks are never decoded.
+    """
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    # Strings come back Arrow-backed, as compaction left them
+    return table.to_pandas(types_mapper=arrow_types_mapper)
+
+
+def write_ipc(df: pd.DataFrame, path) -> None:
+    """
+    Write a DataFrame, index included, as an uncompressed Arrow IPC file
+    that read_ipc can map without decoding. Raises one of ARROW_ERRORS for
+    frames Arrow can't represent as they are (mixed-type object columns).
+    """
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_ipc(path) -> pd.DataFrame:
+    """
+    A DataFrame backed by the memory-mapped Arrow IPC file at `path`:
+    numeric columns without nulls and Arrow strings reference the mapped
+    pages (read-only) instead of copies. The mapping stays valid after the
+    file is replaced or deleted.
+    """
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    return table.to_pandas(types_mapper=arrow_types_mapper, split_blocks=True)
+
+
+def read_snapshot(snapshot: dict) -> pd.DataFrame:
+    """
+    The frame in a session snapshot file (see SessionStore.snapshot):
+    memory-mapped for Arrow IPC, decoded for spilled Parquet or pickle.
+    """
+    if snapshot["format"] == "arrow":
+        return read_ipc(snapshot["path"])
+    if snapshot["format"] == "parquet":
+        return read_dataset(snapshot["path"])
+    return pd.read_pickle(snapshot["path"])
+
+
+class DatasetWriter:
+    """
+    Incremental Parquet writer for DataFrames that arrive in chunks.
+
+    The file schema is taken from the first chunk. If a later chunk doesn't
+    fit (an int column that turns out to hold floats, an all-null column
+    that later gets strings) the schemas are promoted and the rows written
+    so far are rewritten batch by batch, so memory stays bounded by the
+    chunk size either way.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.rows = 0
+        self._schema = None
+        self._writer = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        table = to_arrow(df)
+        if self._writer is None:
+            self._open(table.schema)
+        else:
+            try:
+                table = table.cast(self._schema)
+            except ARROW_ERRORS:
+                self._promote(table.schema)
+                table = table.cast(self._schema)
+        self._writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+        self.rows += table.num_rows
+
+    def close(self) -> None:
+        if self._schema is None:
+            # Nothing was written; still leave a valid (empty) dataset behind
+            write_dataset(pd.DataFrame(), self.path)
+            self._schema = pa.schema([])
+        elif self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _open(self, schema: pa.Schema) -> None:
+        self._schema = schema
+        self._writer = pq.ParquetWriter(self.path, schema, compression=COMPRESSION)
+
+    def _promote(self, schema: pa.Schema) -> None:
+        self._writer.close()
+        promoted = pa.unify_schemas(
+            [self._schema.remove_metadata(), schema.remove_metadata()],
+            promote_options="permissive",
+        )
+        old_path = self.path.with_name(self.path.name + ".old")
+        os.replace(self.path, old_path)
+        try:
+            self._open(promoted)
+            for batch in pq.ParquetFile(old_path).iter_batches(batch_size=ROW_GROUP_SIZE):
+                self._writer.write_table(pa.Table.from_batches([batch]).cast(promoted))
+        finally:
+            old_path.unlink(missing_ok=True)
+
+
+def read_page(path, offset: int, limit: int, columns: list[str] | None = None) -> tuple[pd.DataFrame, int, list[str]]:
+    """
+    Read rows [offset, offset + limit) of a Parquet dataset.
+
+    Only the row groups overlapping the requested window and the requested
+    columns are decoded, so the cost follows the page size rather than the
+    file size. Returns the page, the total row count and all column names.
+    Raises KeyError for columns that aren't in the dataset.
+    """
+    pf = pq.ParquetFile(path, memory_map=True)
+    meta = pf.metadata
+    all_columns = pf.schema_arrow.names
+    if columns is not None:
+        missing = [c for c in columns if c not in all_columns]
+        if missing:
+            raise KeyError(f"Unknown columns: {missing}")
+
+    row_groups = []
+    group_start = 0
+    first_group_start = None
+    for i in range(meta.num_row_groups):
+        group_rows = meta.row_group(i).num_rows
+        group_end = group_start + group_rows
+        if group_end > offset and group_start < offset + limit:
+            if first_group_start is None:
+                first_group_start = group_start
+            row_groups.append(i)
+        group_start = group_end
+
+    if not row_groups:
+        table = pf.schema_arrow.empty_table()
+        if columns is not None:
+            table = table.select(columns)
+        return table.to_pandas(), meta.num_rows, all_columns
+
+    table = pf.read_row_groups(row_groups, columns=columns, use_pandas_metadata=True)
+    table = table.slice(offset - first_group_start, limit)
+    return table.to_pandas(), meta.num_rows, all_columns
+
+
+def iter_batches(path, offset: int = 0, limit: int | None = None, columns: list[str] | None = None):
+    """
+    Stream rows [offset, offset + limit) of a Parquet dataset (to the end
+    when `limit` is None) as Arrow record batches, one row group at a time,
+    so memory follows the row group size rather than the file size.
+
+    Returns the batches' schema, the batch iterator, the total row count
+    and all column names. Raises KeyError for unknown columns.
+    """
+    pf = pq.ParquetFile(path, memory_map=True)
+    meta = pf.metadata
+    all_columns = pf.schema_arrow.names
+    if columns is not None:
+        missing = [c for c in columns if c not in all_columns]
+        if missing:
+            raise KeyError(f"Unknown columns: {missing}")
+    schema = pf.schema_arrow if columns is None else pa.schema([pf.schema_arrow.field(c) for c in columns])
+    end = meta.num_rows if limit is None else min(offset + limit, meta.num_rows)
+
+    def batches():
+        group_start = 0
+        for i in range(meta.num_row_groups):
+            group_end = group_start + meta.row_group(i).num_rows
+            if group_end > offset and group_start < end:
+                table = pf.read_row_group(i, columns=columns)
+                start = max(offset - group_start, 0)
+                table = table.slice(start, min(group_end, end) - group_start - start)
+                yield from table.to_batches()
+            group_start = group_end
+
+    return schema, batches(), meta.num_rows, all_columns
+
+
+def arrow_chunks(df: pd.DataFrame, rows: int = ROW_GROUP_SIZE):
+    """
+    A DataFrame as Arrow tables of at most `rows` rows, all with the same
+    schema (inferred from the whole frame), converted one at a time so only
+    a chunk is ever copied. Returns the schema and the table iterator.
+    """
+    frame = df
+    try:
+        schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    except ARROW_ERRORS:
+        frame = _stringify_mixed(df)
+        schema = pa.Schema.from_pandas(frame, preserve_index=False)
+
+    def tables():
+        for start in range(0, len(frame), rows):
+            yield pa.Table.from_pandas(frame.iloc[start:start + rows], schema=schema, preserve_index=False)
+
+    return schema, tables()
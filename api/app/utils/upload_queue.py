@@ -0,0 +1,279 @@
+import os
+import random
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from app.logging.logging_config import REQUEST_ID, setup_logger
+from app.utils.hub_cache import HUB_CACHE
+from app.utils.hub_client import HUB_CLIENT
+from app.utils.metrics import count_bytes, stage
+from app.utils.storage import dataset_bytes
+
+logger = setup_logger(__name__)
+
+load_dotenv()
+
+# A write waits this long for newer versions of the same path (and other
+# files) before it is committed; counted from the path's first pending write
+UPLOAD_DEBOUNCE_SECONDS = float(os.getenv("UPLOAD_DEBOUNCE_SECONDS", "2"))
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "5"))
+UPLOAD_BACKOFF_SECONDS = float(os.getenv("UPLOAD_BACKOFF_SECONDS", "1"))
+UPLOAD_MAX_BACKOFF_SECONDS = float(os.getenv("UPLOAD_MAX_BACKOFF_SECONDS", "60"))
+UPLOAD_MAX_BATCH_FILES = int(os.getenv("UPLOAD_MAX_BATCH_FILES", "50"))
+UPLOAD_HISTORY_LIMIT = 500
+
+PENDING, UPLOADING, UPLOADED, FAILED = "pending", "uploading", "uploaded", "failed"
+
+
+class _Write:
+    def __init__(self, key, repo_id, repo_type, path_in_repo, source, commit_message, version, first_enqueued_at):
+        self.key = key
+        self.repo_id = repo_id
+        self.repo_type = repo_type
+        self.path_in_repo = path_in_repo
+        self.source = source
+        self.commit_message = commit_message
+        self.version = version
+        self.first_enqueued_at = first_enqueued_at
+        self.not_before = first_enqueued_at + UPLOAD_DEBOUNCE_SECONDS
+        self.attempts = 0
+        # Request that enqueued this version, for tracing the commit's logs
+        self.request_id = REQUEST_ID.get()
+
+    def payload(self):
+        # Serialized here, on the upload thread, so only the version that
+        # actually gets committed is ever encoded
+        if isinstance(self.source, pd.DataFrame):
+            return dataset_bytes(self.source)
+        if isinstance(self.source, Path):
+            return str(self.source)
+        if callable(self.source):
+            return self.source()
+        return self.source
+
+
+def _payload_size(data) -> int:
+    if isinstance(data, str):
+        return os.path.getsize(data)
+    if hasattr(data, "getbuffer"):
+        return data.getbuffer().nbytes
+    return len(data)
+
+
+class HubCommitter:
+    """Commits a batch of files to one Hub repo as a single commit."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def commit(self, repo_id: str, repo_type: str, files: dict, message: str) -> None:
+        from huggingface_hub import CommitOperationAdd
+
+        operations = [CommitOperationAdd(path_in_repo=path, path_or_fileobj=data) for path, data in files.items()]
+        # UploadQueue retries failed commits with its own backoff, so the
+        # client doesn't retry them as well
+        self.client.create_commit(
+            repo_id=repo_id, repo_type=repo_type, operations=operations, commit_message=message, max_retries=0
+        )
+
+
+class UploadQueue:
+    """
+    Background Hub writer. Requests enqueue a write and return at once; a
+    worker thread commits them later.
+
+    Writes to the same (repo, path) coalesce: only the latest version still
+    pending is uploaded. Ready writes for one repo go out together as one
+    multi-file commit, and a failed commit is retried with exponential
+    backoff unless a newer version of the file has arrived meanwhile.
+    """
+
+    def __init__(self, committer):
+        self.committer = committer
+        self._pending: dict[str, _Write] = {}
+        self._status: dict[str, dict] = {}
+        self._versions: dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._flush_now = False
+        self.commits = 0
+        self.files_committed = 0
+        self.coalesced = 0
+        self.retries = 0
+
+    def enqueue(
+        self,
+        repo_id: str,
+        path_in_repo: str,
+        source,
+        repo_type: str = "dataset",
+        commit_message: str | None = None,
+    ) -> dict:
+        """
+        Schedule `source` to be written to `path_in_repo`. `source` may be a
+        DataFrame (stored as a Parquet dataset), a local Path, bytes, or a
+        callable returning any of those. Returns the write's status.
+        """
+        key = f"{repo_type}/{repo_id}:{path_in_repo}"
+        with self._cond:
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+            previous = self._pending.get(key)
+            if previous is not None:
+                self.coalesced += 1
+            self._pending[key] = _Write(
+                key, repo_id, repo_type, path_in_repo, source,
+                commit_message or f"Update {path_in_repo}", version,
+                previous.first_enqueued_at if previous is not None else time.time(),
+            )
+            status = self._set_status(key, PENDING, version=version, repo_id=repo_id, path_in_repo=path_in_repo)
+            self._ensure_started()
+            self._cond.notify_all()
+            return dict(status)
+
+    def status(self, repo_id: str, path_in_repo: str, repo_type: str = "dataset") -> dict | None:
+        with self._cond:
+            status = self._status.get(f"{repo_type}/{repo_id}:{path_in_repo}")
+            return dict(status) if status else None
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "commits": self.commits,
+                "files_committed": self.files_committed,
+                "coalesced": self.coalesced,
+                "retries": self.retries,
+                "files": [dict(s) for s in self._status.values()],
+            }
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Commit everything pending now; True once the queue is empty."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            self._flush_now = True
+            self._cond.notify_all()
+            try:
+                while self._pending or any(s["status"] == UPLOADING for s in self._status.values()):
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flush_now = False
+
+    def shutdown(self, timeout: float = 30) -> None:
+        if self._thread is None:
+            return
+        if not self.flush(timeout):
+            logger.warning(f"Upload queue shut down with {len(self._pending)} writes still pending")
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="hub-uploads", daemon=True)
+            self._thread.start()
+
+    def _set_status(self, key: str, status: str, **fields) -> dict:
+        entry = self._status.setdefault(key, {"key": key})
+        entry.update(status=status, updated_at=time.time(), **fields)
+        if len(self._status) > UPLOAD_HISTORY_LIMIT:
+            done = [k for k, s in self._status.items() if s["status"] in (UPLOADED, FAILED) and k != key]
+            for k in done[: len(self._status) - UPLOAD_HISTORY_LIMIT]:
+                del self._status[k]
+        return entry
+
+    def _take_ready(self) -> list[_Write] | None:
+        """Wait for writes that are due and take one repo's worth of them."""
+        while not self._stopping:
+            now = time.time()
+            ready = [w for w in self._pending.values() if self._flush_now or w.not_before <= now]
+            if ready:
+                repo = (ready[0].repo_type, ready[0].repo_id)
+                batch = [w for w in ready if (w.repo_type, w.repo_id) == repo][:UPLOAD_MAX_BATCH_FILES]
+                for write in batch:
+                    del self._pending[write.key]
+                    self._set_status(write.key, UPLOADING, version=write.version, attempts=write.attempts + 1)
+                return batch
+            wake_at = min((w.not_before for w in self._pending.values()), default=None)
+            self._cond.wait(None if wake_at is None else max(0.0, wake_at - now))
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                batch = self._take_ready()
+            if batch is None:
+                return
+            self._commit(batch)
+            with self._cond:
+                self._cond.notify_all()
+
+    def _commit(self, batch: list[_Write]) -> None:
+        # Log lines of the commit carry the ids of the requests it serves
+        token = REQUEST_ID.set(",".join(dict.fromkeys(w.request_id for w in batch)))
+        try:
+            self._commit_batch(batch)
+        finally:
+            REQUEST_ID.reset(token)
+
+    def _commit_batch(self, batch: list[_Write]) -> None:
+        repo_id, repo_type = batch[0].repo_id, batch[0].repo_type
+        message = batch[0].commit_message if len(batch) == 1 else f"Update {len(batch)} files"
+        start = time.time()
+        try:
+            with stage("serialize_upload"):
+                files = {w.path_in_repo: w.payload() for w in batch}
+            with stage("hub_upload"):
+                self.committer.commit(repo_id, repo_type, files, message)
+        except Exception as e:
+            self._failed(batch, e)
+            return
+        count_bytes("hub_upload", "out", sum(_payload_size(data) for data in files.values()))
+
+        with self._cond:
+            self.commits += 1
+            self.files_committed += len(batch)
+            for write in batch:
+                # A newer version may already be pending; it keeps "pending"
+                status = PENDING if write.key in self._pending else UPLOADED
+                self._set_status(
+                    write.key, status,
+                    committed_version=write.version, committed_at=time.time(), error=None,
+                )
+        for write in batch:
+            HUB_CACHE.invalidate(repo_id, write.path_in_repo, repo_type=repo_type)
+        logger.info(f"Committed {len(batch)} file(s) to {repo_type}/{repo_id} in {time.time() - start:.2f}s")
+
+    def _failed(self, batch: list[_Write], error: Exception) -> None:
+        with self._cond:
+            for write in batch:
+                write.attempts += 1
+                if write.key in self._pending:
+                    # Superseded while we were trying; the new version goes next
+                    continue
+                if write.attempts > UPLOAD_MAX_RETRIES:
+                    self._set_status(write.key, FAILED, error=str(error), attempts=write.attempts)
+                    logger.error(f"Giving up on {write.key} after {write.attempts} attempts: {error}")
+                    continue
+                self.retries += 1
+                backoff = min(UPLOAD_MAX_BACKOFF_SECONDS, UPLOAD_BACKOFF_SECONDS * 2 ** (write.attempts - 1))
+                write.not_before = time.time() + backoff * (0.5 + random.random() / 2)
+                self._pending[write.key] = write
+                self._set_status(write.key, PENDING, error=str(error), attempts=write.attempts)
+                logger.warning(f"Upload of {write.key} failed ({error}); retry {write.attempts} in {backoff:.1f}s")
+            self._cond.notify_all()
+
+
+UPLOADS = UploadQueue(committer=HubCommitter(HUB_CLIENT))
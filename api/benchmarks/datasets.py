@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Rows generated and written per chunk, so 10M-row files never sit in memory
+CHUNK_ROWS = 500_000
+
+CITIES = [f"city_{i:02d}" for i in range(25)]
+PLANS = ["basic", "standard", "premium", "enterprise"]
+CHANNELS = ["web", "mobile", "partner", "referral", "ads", "store"]
+DOMAINS = ["example.com", "mail.test", "corp.invalid", "inbox.test"]
+
+TARGET_COLUMN = "churned"
+
+
+def _with_missing(values, rng, fraction):
+    mask = rng.random(len(values)) < fraction
+    values = values.astype(object) if values.dtype.kind in "iuUO" else values.copy()
+    values[mask] = None if values.dtype == object else np.nan
+    return values
+
+
+def generate_frame(rows: int, seed: int = 0, start: int = 0) -> pd.DataFrame:
+    """
+    Synthetic customer table: integer, float, low- and high-cardinality
+    string columns with missing values, and a churn label that depends on
+    them. The same (rows, seed, start) always gives the same frame.
+    """
+    rng = np.random.default_rng([seed, start])
+    ids = np.arange(start, start + rows)
+    age = rng.integers(18, 90, rows)
+    tenure = rng.integers(0, 121, rows)
+    income = rng.lognormal(10.5, 0.6, rows).round(2)
+    plan = rng.choice(PLANS, rows, p=[0.4, 0.3, 0.2, 0.1])
+    spend = (rng.gamma(2.0, 30.0, rows) + (plan == "enterprise") * 200).round(2)
+    logit = -1.0 - 0.02 * tenure + 0.004 * spend - 0.5 * (plan == "premium") + rng.normal(0, 1, rows)
+    return pd.DataFrame({
+        "customer_id": ids,
+        "age": _with_missing(age.astype(float), rng, 0.03),
+        "income": _with_missing(income, rng, 0.05),
+        "tenure_months": tenure,
+        "monthly_spend": spend,
+        "city": _with_missing(rng.choice(CITIES, rows), rng, 0.02),
+        "plan": plan,
+        "signup_channel": _with_missing(rng.choice(CHANNELS, rows), rng, 0.01),
+        "email": [f"user{i}@{DOMAINS[i % len(DOMAINS)]}" for i in ids],
+        TARGET_COLUMN: np.where(logit > 0, "yes", "no"),
+    })
+
+
+def write_csv(directory: Path, rows: int, seed: int = 0) -> Path:
+    """
+    The dataset as a CSV file in `directory`, generated chunk by chunk.
+    Reused when it already exists, since generation dominates at 10M rows.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"bench_{rows}_{seed}.csv"
+    if path.exists():
+        return path
+    tmp_path = path.with_suffix(".part")
+    with open(tmp_path, "w", newline="") as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = generate_frame(min(CHUNK_ROWS, rows - start), seed, start)
+            chunk.to_csv(f, index=False, header=start == 0)
+    tmp_path.replace(path)
+    return path
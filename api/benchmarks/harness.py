@@ -0,0 +1,172 @@
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Metrics compared against the baseline, and whether lower is better
+COMPARED_METRICS = ("p50_s", "p95_s", "peak_rss_bytes")
+
+
+def _children(pid: int) -> list[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def tree_rss(pid: int | None = None) -> int:
+    """Resident memory of a process and all its descendants (job workers)."""
+    pid = pid or os.getpid()
+    total, stack = 0, [pid]
+    while stack:
+        p = stack.pop()
+        total += _rss(p)
+        stack.extend(_children(p))
+    return total
+
+
+class PeakRSS:
+    """
+    Samples the resident memory of this process tree in a background
+    thread while the block runs. Without /proc (macOS) it falls back to
+    getrusage, which only knows the lifetime peak of this process.
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._proc = os.path.exists(f"/proc/{os.getpid()}/statm")
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, tree_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self._proc:
+            self.peak = tree_rss()
+            self._thread = threading.Thread(target=self._sample, name="bench-rss", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, tree_rss())
+        else:
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak = maxrss if sys.platform == "darwin" else maxrss * 1024
+        return False
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    # Linear interpolation between closest ranks (numpy's default)
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(latencies: list[float], rows: int, peak_rss: int) -> dict:
+    """Latency percentiles (seconds), row throughput and peak memory of one scenario."""
+    values = sorted(latencies)
+    p50 = _percentile(values, 0.50)
+    return {
+        "iterations": len(values),
+        "rows": rows,
+        "min_s": round(values[0], 6),
+        "mean_s": round(statistics.fmean(values), 6),
+        "p50_s": round(p50, 6),
+        "p95_s": round(_percentile(values, 0.95), 6),
+        "p99_s": round(_percentile(values, 0.99), 6),
+        "max_s": round(values[-1], 6),
+        "rows_per_s": round(rows / p50, 1) if p50 > 0 else None,
+        "peak_rss_bytes": peak_rss,
+    }
+
+
+def measure(fn, iterations: int, rows: int) -> dict:
+    """Run `fn` `iterations` times and summarize its latency and memory."""
+    latencies = []
+    with PeakRSS() as rss:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies, rows, rss.peak)
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_results(path: Path, results: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    Scenarios in `results` slower or bigger than in `baseline` by more
+    than `tolerance` (0.25 = 25%). Scenarios missing on either side are
+    skipped, so a baseline recorded at other sizes compares what it can.
+    """
+    regressions = []
+    base_scenarios = baseline.get("scenarios", {})
+    for name, current in results.get("scenarios", {}).items():
+        base = base_scenarios.get(name)
+        if base is None:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = base.get(metric), current.get(metric)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            if change > tolerance:
+                regressions.append({
+                    "scenario": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": round(change, 4),
+                })
+    return regressions
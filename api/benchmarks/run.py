@@ -0,0 +1,205 @@
+"""
+Benchmarks of the API hot paths, run in-process against the FastAPI app.
+
+    cd api
+    python -m benchmarks.run                         # 10k, 100k and 1m rows
+    python -m benchmarks.run --sizes 10k,10m --repeat 5
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+
+For each dataset size a synthetic table (numeric, categorical and
+high-cardinality string columns with missing values) is generated once
+and cached, then driven through /upload, /upload-file, /get-file,
+/clean-data, /train-model and /download-model. The Hugging Face Hub is
+replaced by a local directory and the LLM by the stub code generator,
+so runs need no network or credentials and only measure this code.
+
+Results (latency percentiles, rows/s, peak RSS of the server process and
+its job workers) are written as JSON to --out. With --baseline the run
+exits with status 1 when a scenario's p50/p95 latency or peak RSS is
+worse than the baseline by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+DEFAULT_SIZES = "10k,100k,1m"
+
+# Each dataset goes through these, in order; one session per repeat
+CLEANING_INSTRUCTIONS = ["drop column email", "fill missing with 0", "drop duplicates"]
+MODEL = "LogisticRegression"
+# Preview pages fetched per repeat, at random offsets
+GET_FILE_PAGES = 10
+
+
+def _configure_environment(workdir: Path) -> None:
+    # Before the app is imported: its modules read their settings on import.
+    # The Hub and the LLM are always the local stand-ins
+    os.environ["HF_LOCAL_HUB_DIR"] = str(workdir / "hub")
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["HF_DATA_REPO"] = "bench/data"
+    defaults = {
+        "HF_CACHE_DIR": workdir / "hub-cache",
+        "FEATURE_CACHE_DIR": workdir / "feature-cache",
+        "MODEL_CACHE_DIR": workdir / "model-cache",
+        "CODE_CACHE_PATH": workdir / "code-cache.json",
+        "SESSION_SPILL_DIR": workdir / "sessions",
+        "LOG_FILE": workdir / "app.log",
+        "LOG_LEVEL": "WARNING",
+        "UPLOAD_DEBOUNCE_SECONDS": "0",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, str(value))
+    sys.path.insert(0, str(API_DIR))
+
+
+def _check(response, what: str) -> dict:
+    if response.status_code >= 400:
+        raise RuntimeError(f"{what} failed with {response.status_code}: {response.text[:500]}")
+    return response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+
+
+def run_size(client, label: str, rows: int, csv_path: Path, repeat: int, rng: random.Random) -> dict:
+    from benchmarks.datasets import TARGET_COLUMN
+    from benchmarks.harness import measure
+    from app.utils.session import SESSIONS
+    from app.utils.upload_queue import UPLOADS
+
+    results = {}
+    sessions = []
+    stem = csv_path.stem
+
+    def upload():
+        with open(csv_path, "rb") as f:
+            res = _check(client.post("/upload", files={"file": (csv_path.name, f, "text/csv")}), "/upload")
+        sessions.append(res["session_id"])
+
+    def upload_file():
+        with open(csv_path, "rb") as f:
+            _check(client.post("/upload-file", files={"file": (csv_path.name, f, "text/csv")}), "/upload-file")
+
+    def get_file():
+        offset = rng.randrange(max(rows - 50, 1))
+        _check(client.get("/get-file", params={"filename": stem, "offset": offset, "limit": 50}), "/get-file")
+
+    cleaning = []
+
+    def clean_data():
+        session_id, instruction = cleaning.pop(0)
+        _check(client.post("/clean-data", json={"session_id": session_id, "instruction": instruction}), "/clean-data")
+
+    training = []
+    trained = []
+
+    def train_model():
+        data = {"session_id": training.pop(0), "target": TARGET_COLUMN, "model_choice": MODEL}
+        trained.append(_check(client.post("/train-model", data=data), "/train-model")["hf_filename"])
+
+    def download_model():
+        response = client.get("/download-model", params={"filename": trained[0]})
+        _check(response, "/download-model")
+        if not response.content:
+            raise RuntimeError("/download-model returned an empty body")
+
+    results[f"upload/{label}"] = measure(upload, repeat, rows)
+    results[f"upload_file/{label}"] = measure(upload_file, repeat, rows)
+    # Fill the download cache so every page measures the read, not the fetch
+    get_file()
+    results[f"get_file/{label}"] = measure(get_file, repeat * GET_FILE_PAGES, 50)
+    # Each uploaded session is cleaned, then trained on
+    cleaning.extend((sid, instruction) for sid in sessions for instruction in CLEANING_INSTRUCTIONS)
+    results[f"clean_data/{label}"] = measure(clean_data, len(cleaning), rows)
+    training.extend(sessions)
+    results[f"train_model/{label}"] = measure(train_model, len(training), rows)
+    # Models reach the (local) Hub through the background upload queue
+    if not UPLOADS.flush(timeout=600):
+        raise RuntimeError("Queued uploads did not finish")
+    results[f"download_model/{label}"] = measure(download_model, repeat, 1)
+
+    for session_id in sessions:
+        if session_id in SESSIONS:
+            del SESSIONS[session_id]
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="iterations per scenario (get-file does 10x)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", type=Path, default=Path(tempfile.gettempdir()) / "zeroml-bench-data",
+                        help="where generated datasets are cached between runs")
+    parser.add_argument("--workdir", type=Path, default=None, help="scratch directory (default: a new temp dir)")
+    parser.add_argument("--out", type=Path, default=Path("benchmark-results.json"))
+    parser.add_argument("--baseline", type=Path, default=None, help="results file to compare against")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="also write the results here")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/growth, 0.25 = 25%%")
+    args = parser.parse_args(argv)
+
+    labels = [s.strip().lower() for s in args.sizes.split(",") if s.strip()]
+    unknown = [s for s in labels if s not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes {unknown}; choose from {list(SIZES)}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    out = args.out.resolve()
+    baseline_path = args.baseline.resolve() if args.baseline else None
+    save_baseline = args.save_baseline.resolve() if args.save_baseline else None
+    data_dir = args.data_dir.resolve()
+    workdir = (args.workdir or Path(tempfile.mkdtemp(prefix="zeroml-bench-"))).resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+    _configure_environment(workdir)
+    # Trained models and other relative paths land in the scratch directory
+    os.chdir(workdir)
+
+    from fastapi.testclient import TestClient
+
+    from benchmarks.datasets import write_csv
+    from benchmarks.harness import compare, environment, write_results
+    from main import app
+
+    rng = random.Random(args.seed)
+    results = {
+        "meta": {**environment(), "repeat": args.repeat, "seed": args.seed, "sizes": labels},
+        "scenarios": {},
+    }
+    with TestClient(app) as client:
+        for label in labels:
+            rows = SIZES[label]
+            print(f"[{label}] generating {rows} rows", file=sys.stderr)
+            csv_path = write_csv(data_dir, rows, args.seed)
+            print(f"[{label}] running", file=sys.stderr)
+            scenarios = run_size(client, label, rows, csv_path, args.repeat, rng)
+            for name, stats in scenarios.items():
+                print(f"  {name:<24} p50 {stats['p50_s']:>9.4f}s  p95 {stats['p95_s']:>9.4f}s  "
+                      f"rss {stats['peak_rss_bytes'] / 2**20:>8.1f} MiB", file=sys.stderr)
+            results["scenarios"].update(scenarios)
+
+    status = 0
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        results["baseline"] = {"path": str(baseline_path), "tolerance": args.tolerance, "regressions": regressions}
+        for r in regressions:
+            print(f"REGRESSION {r['scenario']} {r['metric']}: {r['baseline']} -> {r['current']} "
+                  f"(+{r['change']:.0%})", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    write_results(out, results)
+    if save_baseline:
+        write_results(save_baseline, {k: v for k, v in results.items() if k != "baseline"})
+    print(f"Results written to {out}", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
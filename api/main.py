@@ -1,18 +1,41 @@
 
-from fastapi import FastAPI
-from app.routes.routes import router as article_router
-from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from app.utils.startup import STARTUP, STARTUP_WARMUP, start_warmup
+
+with STARTUP.phase("framework"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+with STARTUP.phase("routes"):
+    from app.routes.routes import router as article_router
 from app.logging.logging_config import setup_logger
+from app.utils.hub_cache import HUB_CACHE
+from app.utils.jobs import JOBS
+from app.utils.metrics import RequestContextMiddleware
+from app.utils.upload_queue import UPLOADS
 
 
     
 # Setup logger for this module
 logger = setup_logger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    STARTUP.ready()
+    if STARTUP_WARMUP:
+        start_warmup()
+    yield
+    JOBS.shutdown()
+    # Push whatever cleaned data and models are still queued
+    UPLOADS.shutdown()
+    # Access times of recent cache hits, for LRU eviction
+    HUB_CACHE.flush()
+
+
 app = FastAPI(
     title="ZeroMl",
     version="1.0.0",
     description=("Flow builder for machin learning"),
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -21,17 +44,23 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Server-Timing"],
 )
+# Added last so it wraps everything else, CORS included
+app.add_middleware(RequestContextMiddleware)
 
 app.include_router(article_router,tags=["Articles"])
 
 if __name__ == "__main__":
     import uvicorn
     import os
+    from app.utils.session import SESSIONS
 
     port = int(os.environ.get("PORT", 7860))
-    logger.info(f" Server is running on http://localhost:{port}")
-    uvicorn.run(app, host="0.0.0.0", port=port)
-    
-
-    
\ No newline at end of file
+    # Server worker processes; more than one needs SESSION_BACKEND=shared
+    workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+    if workers > 1 and not SESSIONS.shared:
+        logger.warning("WEB_CONCURRENCY > 1 needs SESSION_BACKEND=shared (sessions would only exist in one worker); running a single worker")
+        workers = 1
+    logger.info(f" Server is running on http://localhost:{port} with {workers} worker(s)")
+    uvicorn.run("main:app" if workers > 1 else app, host="0.0.0.0", port=port, workers=workers)
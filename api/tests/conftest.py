@@ -0,0 +1,78 @@
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# The app reads its settings when its modules are imported, so everything
+# it writes goes to a scratch directory, the Hub is a local directory and
+# the LLM is the stub code generator
+WORKDIR = Path(tempfile.mkdtemp(prefix="zeroml-tests-"))
+_ENV = {
+    "OPENAI_API_KEY": "test",
+    "LLM_BACKEND": "stub",
+    "HF_LOCAL_HUB_DIR": WORKDIR / "hub",
+    "HF_DATA_REPO": "test/data",
+    "HF_CACHE_DIR": WORKDIR / "hub-cache",
+    "FEATURE_CACHE_DIR": WORKDIR / "feature-cache",
+    "MODEL_CACHE_DIR": WORKDIR / "model-cache",
+    "CODE_CACHE_PATH": WORKDIR / "code-cache.sqlite",
+    "SESSION_SPILL_DIR": WORKDIR / "sessions",
+    "SESSION_SHARED_DIR": WORKDIR / "shared-sessions",
+    "LOG_FILE": WORKDIR / "app.log",
+    "LOG_LEVEL": "WARNING",
+    "UPLOAD_DEBOUNCE_SECONDS": "0",
+    "JOB_MAX_WORKERS": "2",
+}
+for key, value in _ENV.items():
+    os.environ[key] = str(value)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def workdir():
+    # Models are saved relative to the working directory
+    cwd = os.getcwd()
+    os.chdir(WORKDIR)
+    yield WORKDIR
+    os.chdir(cwd)
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def csv_file(df: pd.DataFrame, name: str = "data.csv"):
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False)
+    buf.seek(0)
+    return {"file": (name, buf, "text/csv")}
+
+
+def upload_session(client, df: pd.DataFrame) -> str:
+    """Upload `df` through /upload and return the new session id."""
+    response = client.post("/upload", files=csv_file(df))
+    assert response.status_code == 200, response.text
+    return response.json()["session_id"]
+
+
+@pytest.fixture
+def frame():
+    # Numeric, categorical and boolean columns with missing values
+    n = 200
+    return pd.DataFrame({
+        "age": [20 + i % 50 if i % 11 else None for i in range(n)],
+        "income": [1000.0 + 37 * i for i in range(n)],
+        "city": [["paris", "rome", "oslo", None][i % 4] for i in range(n)],
+        "member": [i % 3 == 0 for i in range(n)],
+        "churned": ["yes" if (i * 7) % 10 < 4 else "no" for i in range(n)],
+    })
@@ -0,0 +1,61 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from app.utils.artifact import ModelCache, is_artifact, load_model, read_metadata, save_artifact
+
+
+@pytest.fixture
+def model():
+    X = np.arange(40, dtype=float).reshape(20, 2)
+    return LogisticRegression().fit(X, [0] * 10 + [1] * 10), X
+
+
+def test_round_trip_with_metadata(tmp_path, model):
+    estimator, X = model
+    path = tmp_path / "m.zmodel"
+
+    written = save_artifact(estimator, path, {"target_column": "y"})
+
+    assert is_artifact(path)
+    meta = read_metadata(path)
+    assert meta == written
+    assert meta["estimator"] == "LogisticRegression"
+    assert meta["target_column"] == "y"
+    assert meta["model_bytes"] > 0
+    np.testing.assert_array_equal(load_model(path).predict(X), estimator.predict(X))
+
+
+def test_legacy_pickles_still_load(tmp_path, model):
+    estimator, X = model
+    path = tmp_path / "m.pkl"
+    joblib.dump(estimator, path)
+
+    assert not is_artifact(path)
+    with pytest.raises(ValueError):
+        read_metadata(path)
+    np.testing.assert_array_equal(load_model(path).predict(X), estimator.predict(X))
+
+
+def test_same_model_under_two_names_is_unpacked_once(tmp_path, model):
+    estimator, _ = model
+    cache = ModelCache(tmp_path / "cache", max_bytes=1 << 30)
+    save_artifact(estimator, tmp_path / "a.zmodel", {})
+    (tmp_path / "b.zmodel").write_bytes((tmp_path / "a.zmodel").read_bytes())
+
+    assert cache.unpack(tmp_path / "a.zmodel") == cache.unpack(tmp_path / "b.zmodel")
+    assert len(list((tmp_path / "cache").glob("*.joblib"))) == 1
+
+
+def test_unpacked_models_are_evicted(tmp_path, model):
+    estimator, X = model
+    cache = ModelCache(tmp_path / "cache", max_bytes=1)
+    save_artifact(estimator, tmp_path / "a.zmodel", {})
+    save_artifact(LogisticRegression(C=0.5).fit(X, [0] * 10 + [1] * 10), tmp_path / "b.zmodel", {})
+
+    cache.unpack(tmp_path / "a.zmodel")
+    kept = cache.unpack(tmp_path / "b.zmodel")
+
+    # The one just unpacked stays even over budget
+    assert list((tmp_path / "cache").glob("*.joblib")) == [kept]
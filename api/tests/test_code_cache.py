@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pandas as pd
+import pytest
+
+from app.components.Cleaning import codegen
+from app.components.Cleaning.codegen import StubCodeGenerator, generate_cleaning_code
+from app.utils.code_cache import CodeCache
+from conftest import upload_session
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"a": [1, None, 1], "Name": ["X", "Y", "X"]})
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CodeCache(tmp_path / "code.sqlite3", ttl_seconds=3600, max_entries=3)
+
+
+def test_key_ignores_case_and_punctuation_but_not_schema(cache, df):
+    assert cache.key("Drop duplicates.", df) == cache.key("  drop   DUPLICATES ", df)
+    assert cache.key("drop duplicates", df) != cache.key("drop duplicates", df.rename(columns={"a": "b"}))
+    assert cache.key("drop duplicates", df) != cache.key("drop duplicates", df.astype({"a": "float32"}))
+
+
+def test_miss_then_hit(cache, df):
+    key = cache.key("drop duplicates", df)
+    assert cache.get(key) is None
+
+    cache.put(key, "drop duplicates", df, "df = df.drop_duplicates()")
+
+    assert cache.get(key) == "df = df.drop_duplicates()"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+
+def test_entries_expire(cache, df, monkeypatch):
+    key = cache.key("drop duplicates", df)
+    cache.put(key, "drop duplicates", df, "df = df.drop_duplicates()")
+
+    real_time = time.time
+    monkeypatch.setattr(time, "time", lambda: real_time() + 7200)
+
+    assert cache.get(key) is None
+    assert cache.stats()["expired"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_dropped(cache, df):
+    keys = [cache.key(f"step {i}", df) for i in range(4)]
+    for i, key in enumerate(keys[:3]):
+        cache.put(key, f"step {i}", df, f"# {i}")
+        time.sleep(0.01)
+    cache.get(keys[0])
+
+    cache.put(keys[3], "step 3", df, "# 3")
+
+    assert cache.get(keys[1]) is None
+    assert [cache.get(k) for k in (keys[0], keys[2], keys[3])] == ["# 0", "# 2", "# 3"]
+
+
+def test_discard(cache, df):
+    key = cache.key("drop duplicates", df)
+    cache.put(key, "drop duplicates", df, "df = df.drop_duplicates()")
+    cache.discard(key)
+    assert cache.get(key) is None
+
+
+@pytest.mark.parametrize("instruction, code", [
+    ("Drop rows with missing values.", "df = df.dropna()"),
+    ("remove duplicates", "df = df.drop_duplicates()"),
+    ("drop column Name", "df = df.drop(columns=['Name'])"),
+    ("fill missing with 0", "df = df.fillna(0)"),
+    ("lowercase the column Name", "df['Name'] = df['Name'].str.lower()"),
+    ("make it nicer", "df = df"),
+])
+def test_stub_patterns(instruction, code):
+    assert StubCodeGenerator().generate(instruction) == code
+
+
+def test_stub_responses_take_precedence():
+    stub = StubCodeGenerator({"Drop duplicates": "df = df.iloc[:1]"})
+    assert stub.generate("drop duplicates.") == "df = df.iloc[:1]"
+    assert stub.calls == 1
+
+
+def test_generation_goes_through_the_cache(df, monkeypatch, tmp_path):
+    stub = StubCodeGenerator()
+    cache = CodeCache(tmp_path / "code.sqlite3", ttl_seconds=3600, max_entries=10)
+    monkeypatch.setattr(codegen, "GENERATOR", stub)
+    monkeypatch.setattr(codegen, "CODE_CACHE", cache)
+
+    code, key, hit = asyncio.run(generate_cleaning_code("drop duplicates", df))
+    assert (code, hit) == ("df = df.drop_duplicates()", False)
+    cache.put(key, "drop duplicates", df, code)
+
+    assert asyncio.run(generate_cleaning_code("Drop duplicates!", df))[2] is True
+    assert stub.calls == 1
+
+
+def test_clean_data_reports_cache_hits(client, frame):
+    first = upload_session(client, frame)
+    second = upload_session(client, frame)
+    body = {"instruction": "remove duplicates", "lazy": False}
+
+    assert client.post("/clean-data", json={"session_id": first, **body}).json()["code_cache"] == "miss"
+    assert client.post("/clean-data", json={"session_id": second, **body}).json()["code_cache"] == "hit"
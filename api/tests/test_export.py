@@ -0,0 +1,89 @@
+import gzip
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from app.components.Export import export
+from conftest import upload_session
+
+
+@pytest.fixture
+def session(client, frame, monkeypatch):
+    # Several chunks per export
+    monkeypatch.setattr(export, "EXPORT_CHUNK_ROWS", 64)
+    return upload_session(client, frame)
+
+
+def _get(client, session_id, headers=None, **params):
+    return client.get("/export", params={"session_id": session_id, **params}, headers=headers or {})
+
+
+@pytest.mark.parametrize("fmt, compression, read", [
+    ("csv", "none", lambda b: pd.read_csv(io.BytesIO(b))),
+    ("csv", "gzip", lambda b: pd.read_csv(io.BytesIO(gzip.decompress(b)))),
+    ("parquet", "zstd", lambda b: pd.read_parquet(io.BytesIO(b))),
+    ("ndjson", "none", lambda b: pd.DataFrame([json.loads(line) for line in b.splitlines()])),
+])
+def test_formats(client, session, frame, fmt, compression, read):
+    response = _get(client, session, format=fmt, compression=compression)
+
+    assert response.status_code == 200
+    df = read(response.content)
+    assert df.columns.tolist() == frame.columns.tolist()
+    assert df["income"].tolist() == frame["income"].tolist()
+
+
+def test_first_download_can_resume(client, session, monkeypatch):
+    encodes = []
+    real_encode = export.encode
+    monkeypatch.setattr(export, "encode", lambda *args: encodes.append(1) or real_encode(*args))
+
+    # No complete download yet: sizing the export costs one extra pass
+    first = _get(client, session, headers={"Range": "bytes=10-19"})
+    assert first.status_code == 206
+    assert first.headers["accept-ranges"] == "bytes"
+    assert encodes == [1, 1]
+
+    full = _get(client, session).content
+    assert first.headers["content-range"] == f"bytes 10-19/{len(full)}"
+    assert first.content == full[10:20]
+
+    # From then on the size is known: a single pass per request
+    encodes.clear()
+    assert _get(client, session, headers={"Range": "bytes=-5"}).content == full[-5:]
+    assert _get(client, session).headers["content-length"] == str(len(full))
+    assert encodes == [1, 1]
+
+
+def test_sizes_are_kept_with_the_session_version(client, session, frame):
+    full = _get(client, session).content
+    version = export.SESSIONS.version(session)
+
+    # Known to any worker through the store, not this process's memory
+    assert export.known_size(session, version, "csv", "none") == len(full)
+    assert export.known_size(session, version, "csv", "gzip") is None
+
+    export.SESSIONS[session] = frame.head(10)
+    assert export.known_size(session, version + 1, "csv", "none") is None
+    assert _get(client, session, headers={"Range": "bytes=0-"}).content == _get(client, session).content
+
+
+def test_unsatisfiable_and_stale_ranges(client, session):
+    full = _get(client, session).content
+    tag = _get(client, session).headers["etag"]
+
+    too_far = _get(client, session, headers={"Range": f"bytes={len(full)}-"})
+    assert too_far.status_code == 416
+    assert too_far.headers["content-range"] == f"bytes */{len(full)}"
+
+    stale = _get(client, session, headers={"Range": "bytes=0-9", "If-Range": '"older"'})
+    assert stale.status_code == 200 and stale.content == full
+    assert _get(client, session, headers={"Range": "bytes=0-9", "If-Range": tag}).status_code == 206
+
+
+def test_unknown_format_and_session(client, session):
+    assert _get(client, session, format="xlsx").status_code == 400
+    assert _get(client, session, compression="brotli").status_code == 400
+    assert _get(client, "missing").status_code == 404
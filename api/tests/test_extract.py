@@ -0,0 +1,92 @@
+import io
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from app.components.ExtractFile.extract import PREVIEW_DEFAULT_LIMIT, PREVIEW_MAX_LIMIT
+from app.utils.storage import write_dataset
+
+
+def _upload_path(name: str) -> Path:
+    path = Path(os.environ["HF_LOCAL_HUB_DIR"]) / "dataset" / os.environ["HF_DATA_REPO"] / "uploads" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _publish(df: pd.DataFrame, name: str) -> None:
+    # What the upload queue would have pushed to the Hub
+    write_dataset(df, _upload_path(f"{name}.parquet"))
+
+
+@pytest.fixture(scope="module")
+def published():
+    df = pd.DataFrame({"n": range(1200), "label": [f"row{i}" for i in range(1200)]})
+    _publish(df, "paged")
+    return df
+
+
+def test_default_page(client, published):
+    body = client.get("/get-file", params={"filename": "paged"}).json()
+
+    assert body["limit"] == PREVIEW_DEFAULT_LIMIT
+    assert len(body["records"]) == PREVIEW_DEFAULT_LIMIT
+    assert body["total_rows"] == 1200
+    assert body["columns"] == ["n", "label"]
+    assert body["next_offset"] == PREVIEW_DEFAULT_LIMIT
+
+
+def test_pages_and_projection(client, published):
+    body = client.get("/get-file", params={"filename": "paged", "offset": 1190, "limit": 20, "columns": "label"}).json()
+
+    assert body["records"] == [{"label": f"row{i}"} for i in range(1190, 1200)]
+    assert body["next_offset"] is None
+
+
+def test_limits_are_enforced(client, published):
+    response = client.get("/get-file", params={"filename": "paged", "limit": PREVIEW_MAX_LIMIT + 1})
+    assert response.status_code == 400
+
+    response = client.get("/get-file", params={"filename": "paged", "columns": "nope"})
+    assert response.status_code == 400
+
+    response = client.get("/get-file", params={"filename": "missing"})
+    assert response.status_code == 404
+
+
+def test_ndjson_stream(client, published):
+    response = client.get("/get-file", params={"filename": "paged", "offset": 100}, headers={"Accept": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["x-total-rows"] == "1200"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    # Streams aren't capped at the JSON page limit
+    assert len(rows) == 1100
+    assert rows[0] == {"n": 100, "label": "row100"}
+
+
+def test_arrow_stream(client, published):
+    response = client.get("/get-file", params={"filename": "paged", "limit": 5, "columns": "n", "format": "arrow"})
+
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(io.BytesIO(response.content)).read_all()
+    assert table.to_pydict() == {"n": [0, 1, 2, 3, 4]}
+
+
+def test_legacy_csv_uploads_stream(client):
+    pd.DataFrame({"a": range(10), "b": list("abcdefghij")}).to_csv(_upload_path("legacy.csv"), index=False)
+
+    page = client.get("/get-file", params={"filename": "legacy", "offset": 8}).json()
+    stream = client.get("/get-file", params={"filename": "legacy", "offset": 2, "limit": 3, "format": "ndjson"})
+
+    assert page["records"] == [{"a": 8, "b": "i"}, {"a": 9, "b": "j"}]
+    assert "x-total-rows" not in stream.headers
+    assert [json.loads(line)["a"] for line in stream.text.splitlines()] == [2, 3, 4]
+
+
+def test_unknown_format(client, published):
+    assert client.get("/get-file", params={"filename": "paged", "format": "xml"}).status_code == 400
@@ -0,0 +1,64 @@
+import pandas as pd
+
+from app.components.training.preprocessing import dataset_fingerprint
+from app.utils.feature_cache import FeatureCache, _entry_bytes
+from conftest import upload_session
+
+
+def _entry(n: int = 100) -> dict:
+    return {"X": pd.DataFrame({"a": range(n)}), "y": pd.Series(range(n))}
+
+
+def test_memory_then_disk_then_miss(tmp_path):
+    cache = FeatureCache(tmp_path, memory_max_bytes=1 << 20, disk_max_bytes=1 << 20)
+    assert cache.get("k") == (None, "miss")
+
+    cache.put("k", _entry())
+    entry, level = cache.get("k")
+    assert level == "memory"
+    pd.testing.assert_frame_equal(entry["X"], _entry()["X"])
+
+    # Another worker only sees the disk level
+    other = FeatureCache(tmp_path, memory_max_bytes=1 << 20, disk_max_bytes=1 << 20)
+    assert other.get("k")[1] == "disk"
+    assert other.get("k")[1] == "memory"
+
+
+def test_memory_and_disk_are_bounded(tmp_path):
+    size = _entry_bytes(_entry())
+    cache = FeatureCache(tmp_path, memory_max_bytes=size * 2, disk_max_bytes=1 << 20)
+    cache.put("a", _entry())
+    # Room for one file on disk
+    cache.disk_max_bytes = (tmp_path / "a.joblib").stat().st_size * 3 // 2
+    for key in ("b", "c"):
+        cache.put(key, _entry())
+
+    assert list(cache._memory) == ["b", "c"]
+    assert [p.stem for p in tmp_path.glob("*.joblib")] == ["c"]
+
+
+def test_unreadable_file_is_a_miss(tmp_path):
+    (tmp_path / "bad.joblib").write_bytes(b"not joblib")
+    cache = FeatureCache(tmp_path, memory_max_bytes=1 << 20, disk_max_bytes=1 << 20)
+
+    assert cache.get("bad") == (None, "miss")
+    assert not (tmp_path / "bad.joblib").exists()
+
+
+def test_fingerprint_tracks_content_and_target():
+    df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", "z"]})
+
+    assert dataset_fingerprint(df, "a") == dataset_fingerprint(df.copy(), "a")
+    assert dataset_fingerprint(df, "a") != dataset_fingerprint(df, "b")
+    assert dataset_fingerprint(df, "a") != dataset_fingerprint(df.assign(a=[1, 2, 4]), "a")
+
+
+def test_training_the_same_data_again_reuses_features(client, frame):
+    session_id = upload_session(client, frame)
+    form = {"session_id": session_id, "target": "churned", "model_choice": "LogisticRegression"}
+
+    first = client.post("/train-model", data=form).json()
+    second = client.post("/train-model", data=form).json()
+
+    assert first["dataset_fingerprint"] == second["dataset_fingerprint"]
+    assert second["preprocessing_cache"] in ("memory", "disk")
@@ -0,0 +1,117 @@
+import pandas as pd
+import pytest
+
+from app.components.Cleaning import clean
+from app.components.Cleaning.history import HISTORIES, SessionHistory
+from app.components.Export import export
+from app.components.Upload import upload
+from app.routes import routes
+from app.utils.session import SessionStore
+from conftest import upload_session
+
+
+@pytest.fixture
+def base():
+    return pd.DataFrame({"a": [1.0, None, 3.0], "b": ["x", "y", "z"], "c": [1, 2, 3]})
+
+
+def test_unchanged_columns_are_shared_between_versions(base):
+    history = SessionHistory(base)
+    v1 = history.commit(base.fillna({"a": 0.0}), "fill a", "...")
+
+    first, second = history.versions
+    assert dict(first.columns)["b"] is dict(second.columns)["b"]
+    assert dict(first.columns)["a"] is not dict(second.columns)["a"]
+    assert v1["a"].tolist() == [1.0, 0.0, 3.0]
+
+    sizes = {v["version"]: v for v in history.describe()["versions"]}
+    # Version 1 only owns its new column
+    assert sizes[1]["owned_bytes"] < sizes[1]["logical_bytes"]
+
+
+def test_undo_redo_and_new_branch(base):
+    history = SessionHistory(base)
+    history.commit(base.drop(columns=["c"]), "drop c", "...")
+    history.commit(base.drop(columns=["c"]).head(2), "head", "...")
+
+    assert history.undo().shape == (3, 2)
+    assert history.undo().shape == (3, 3)
+    assert history.undo() is None
+    assert history.redo().shape == (3, 2)
+
+    # Committing after an undo drops the redo branch
+    history.commit(base.drop(columns=["b", "c"]), "drop b", "...")
+    assert history.redo() is None
+    assert [v.number for v in history.versions] == [0, 1, 2]
+    assert history.current.instruction == "drop b"
+
+
+def test_oldest_versions_are_dropped(base):
+    history = SessionHistory(base, max_versions=3)
+    df = base
+    for i in range(5):
+        df = df.assign(c=df["c"] + 1)
+        history.commit(df, f"step {i}", "...")
+
+    assert [v.number for v in history.versions] == [3, 4, 5]
+    assert history.describe()["can_undo"]
+
+
+def test_diff(base):
+    history = SessionHistory(base)
+    history.commit(base.fillna({"a": 0.0}).drop(columns=["c"]).assign(d=1), "step", "...")
+
+    diff = history.diff(history.get(0), history.get(1))
+
+    assert diff["added"] == ["d"]
+    assert diff["removed"] == ["c"]
+    assert diff["changed"] == [{"column": "a", "dtype": ["float64", "float64"], "changed_cells": 1}]
+    assert diff["unchanged_columns"] == 1
+
+
+def test_undo_redo_endpoints(client, frame):
+    session_id = upload_session(client, frame)
+    clean = {"session_id": session_id, "lazy": False}
+    assert client.post("/clean-data", json={**clean, "instruction": "drop column city"}).status_code == 200
+    assert client.post("/clean-data", json={**clean, "instruction": "drop rows with missing values"}).status_code == 200
+
+    history = client.get("/clean-data/history", params={"session_id": session_id}).json()
+    assert history["current_version"] == 2
+    diff = client.get("/clean-data/diff", params={"session_id": session_id, "from_version": 0, "to_version": 1}).json()
+    assert diff["removed"] == ["city"]
+
+    undo = client.post("/clean-data/undo", json={"session_id": session_id}).json()
+    assert undo["version"] == 1 and undo["can_redo"]
+    assert client.post("/clean-data/undo", json={"session_id": session_id}).json()["version"] == 0
+    assert client.post("/clean-data/undo", json={"session_id": session_id}).status_code == 409
+
+    redo = client.post("/clean-data/redo", json={"session_id": session_id}).json()
+    assert redo["version"] == 1
+    assert "city" not in redo["preview"][0]
+
+
+def test_spilling_a_cleaned_session_frees_its_history(client, frame, tmp_path, monkeypatch):
+    store = SessionStore(memory_budget_bytes=10**9, idle_ttl_seconds=3600, spill_dir=tmp_path)
+    store.on_evict(clean._forget_session)
+    for module in (upload, clean, export, routes):
+        monkeypatch.setattr(module, "SESSIONS", store)
+    first, second = upload_session(client, frame), upload_session(client, frame)
+    for session_id in (first, second):
+        for instruction in ("drop column city", "drop rows with missing values"):
+            response = client.post("/clean-data", json={"session_id": session_id, "instruction": instruction, "lazy": False})
+            assert response.status_code == 200, response.text
+
+    # Older versions count against the budget
+    held = store.usage(first)["attached_bytes"]
+    assert held == HISTORIES[first].retained_bytes() > 0
+    assert store.memory_in_use() == sum(s["memory_bytes"] + s["attached_bytes"] for s in store.stats()["sessions"])
+
+    # Room for the most recent session only
+    usage = store.usage(second)
+    store.memory_budget_bytes = usage["memory_bytes"] + usage["attached_bytes"]
+    store[second]
+
+    assert store.usage(first)["state"] == "disk"
+    assert store.usage(first)["attached_bytes"] == 0
+    assert first not in HISTORIES
+    assert store.memory_in_use() <= store.memory_budget_bytes
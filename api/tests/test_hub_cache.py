@@ -0,0 +1,128 @@
+import json
+import os
+import time
+
+import pytest
+
+from app.utils.hub_cache import ArtifactCache
+from app.utils.hub_client import LocalHub
+
+
+def _put(hub, filename: str, data: bytes, repo: str = "test/repo"):
+    path = hub / "dataset" / repo / filename
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+
+def _cache(tmp_path, **kwargs) -> ArtifactCache:
+    settings = {"max_bytes": 1 << 20, "revalidate_seconds": 0, "save_interval": 3600}
+    settings.update(kwargs)
+    return ArtifactCache(root=tmp_path / "cache", source=LocalHub(tmp_path / "hub"), **settings)
+
+
+def test_files_with_same_size_and_mtime_do_not_collide(tmp_path):
+    a = _put(tmp_path / "hub", "a.csv", b"aaaa")
+    b = _put(tmp_path / "hub", "b.csv", b"bbbb")
+    stamp = time.time_ns()
+    os.utime(a, ns=(stamp, stamp))
+    os.utime(b, ns=(stamp, stamp))
+    cache = _cache(tmp_path)
+
+    assert cache.fetch("test/repo", "a.csv").read_bytes() == b"aaaa"
+    assert cache.fetch("test/repo", "b.csv").read_bytes() == b"bbbb"
+
+
+def test_changed_file_is_downloaded_again(tmp_path):
+    path = _put(tmp_path / "hub", "a.csv", b"old")
+    cache = _cache(tmp_path)
+    assert cache.fetch("test/repo", "a.csv").read_bytes() == b"old"
+
+    path.write_bytes(b"new!")
+    assert cache.fetch("test/repo", "a.csv").read_bytes() == b"new!"
+    assert cache.stats()["entries"] == 1
+    assert len(list((tmp_path / "cache" / "blobs").iterdir())) == 1
+
+
+def test_fresh_entries_are_served_without_revalidation(tmp_path):
+    path = _put(tmp_path / "hub", "a.csv", b"old")
+    cache = _cache(tmp_path, revalidate_seconds=3600)
+    cache.fetch("test/repo", "a.csv")
+
+    path.write_bytes(b"new!")
+    assert cache.fetch("test/repo", "a.csv").read_bytes() == b"old"
+
+    cache.invalidate("test/repo", "a.csv")
+    assert cache.fetch("test/repo", "a.csv").read_bytes() == b"new!"
+
+
+def test_missing_file_raises_and_is_forgotten(tmp_path):
+    path = _put(tmp_path / "hub", "a.csv", b"data")
+    cache = _cache(tmp_path)
+    cache.fetch("test/repo", "a.csv")
+
+    path.unlink()
+    with pytest.raises(FileNotFoundError):
+        cache.fetch("test/repo", "a.csv")
+    assert cache.stats()["entries"] == 0
+
+
+def test_hits_do_not_rewrite_the_index(tmp_path):
+    _put(tmp_path / "hub", "a.csv", b"data")
+    cache = _cache(tmp_path, revalidate_seconds=3600)
+    cache.fetch("test/repo", "a.csv")
+    index = tmp_path / "cache" / "index.json"
+    written = index.stat().st_mtime_ns
+
+    for _ in range(20):
+        cache.fetch("test/repo", "a.csv")
+    assert index.stat().st_mtime_ns == written
+    assert cache.stats()["hits"] == 20
+
+    before = json.loads(index.read_text())["dataset/test/repo@main:a.csv"]["last_access"]
+    cache.flush()
+    after = json.loads(index.read_text())["dataset/test/repo@main:a.csv"]["last_access"]
+    assert after > before
+
+
+def test_least_recently_used_blob_is_evicted(tmp_path):
+    for name in ("a.csv", "b.csv", "c.csv"):
+        _put(tmp_path / "hub", name, name.encode() * 100)
+    cache = _cache(tmp_path, max_bytes=1000, revalidate_seconds=3600)
+    cache.fetch("test/repo", "a.csv")
+    cache.fetch("test/repo", "b.csv")
+    cache.fetch("test/repo", "a.csv")
+    cache.flush()
+
+    cache.fetch("test/repo", "c.csv")
+
+    index = json.loads((tmp_path / "cache" / "index.json").read_text())
+    assert sorted(index) == ["dataset/test/repo@main:a.csv", "dataset/test/repo@main:c.csv"]
+    assert len(list((tmp_path / "cache" / "blobs").iterdir())) == 2
+
+
+def test_processes_share_the_index(tmp_path):
+    _put(tmp_path / "hub", "a.csv", b"data")
+    first = _cache(tmp_path)
+    blob = first.fetch("test/repo", "a.csv")
+
+    # Another worker starting up neither sweeps the blob nor downloads it again
+    second = _cache(tmp_path, revalidate_seconds=3600)
+    assert blob.exists()
+    assert second.fetch("test/repo", "a.csv") == blob
+    assert second.stats()["misses"] == 0
+
+
+def test_startup_sweep_spares_fresh_unindexed_blobs(tmp_path):
+    blobs = tmp_path / "cache" / "blobs"
+    blobs.mkdir(parents=True)
+    fresh, stale = blobs / "fresh", blobs / "stale"
+    fresh.write_bytes(b"x")
+    stale.write_bytes(b"x")
+    old = time.time() - 2 * 3600
+    os.utime(stale, (old, old))
+
+    _cache(tmp_path)
+
+    assert fresh.exists()
+    assert not stale.exists()
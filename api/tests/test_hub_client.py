@@ -0,0 +1,115 @@
+import io
+import os
+from pathlib import Path
+
+import httpx
+import pytest
+
+from app.utils.hub_client import HUB_CLIENT, HubClient, LocalHub
+from conftest import csv_file
+
+
+@pytest.fixture
+def local(tmp_path):
+    return HubClient(local_dir=tmp_path / "hub", backoff_seconds=0)
+
+
+def test_local_uploads_and_downloads(local, tmp_path):
+    source = tmp_path / "model.bin"
+    source.write_bytes(b"model")
+
+    local.ensure_repo("me/repo", repo_type="model")
+    local.upload_file(str(source), "a/model.bin", repo_id="me/repo", repo_type="model")
+    local.upload_file(io.BytesIO(b"stream"), "b.txt", repo_id="me/repo", repo_type="model")
+    tag = local.file_etag("me/repo", "a/model.bin", "model", "main")
+    dest = tmp_path / "copy.bin"
+    local.download("me/repo", "a/model.bin", "model", "main", dest)
+
+    assert dest.read_bytes() == b"model"
+    assert local.local.path("me/repo", "b.txt", "model").read_bytes() == b"stream"
+    assert tag.endswith("-5")
+    assert local.stats()["calls"] == 5
+    with pytest.raises(FileNotFoundError):
+        local.file_etag("me/repo", "missing.bin", "model", "main")
+
+
+def test_local_commit_writes_every_file(local):
+    from huggingface_hub import CommitOperationAdd
+
+    operations = [
+        CommitOperationAdd(path_in_repo="x.txt", path_or_fileobj=b"x"),
+        CommitOperationAdd(path_in_repo="d/y.txt", path_or_fileobj=io.BytesIO(b"y")),
+    ]
+    local.create_commit("me/data", "dataset", operations, "add files")
+
+    hub = local.local
+    assert hub.path("me/data", "x.txt", "dataset").read_bytes() == b"x"
+    assert hub.path("me/data", "d/y.txt", "dataset").read_bytes() == b"y"
+    # No partial files left behind
+    assert sorted(p.name for p in hub.path("me/data", "", "dataset").rglob("*") if p.is_file()) == ["x.txt", "y.txt"]
+
+
+def test_transient_failures_are_retried(local):
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("refused")
+        return "ok"
+
+    assert local.call("op", flaky) == "ok"
+    assert local.stats()["retries"] == 2
+
+    with pytest.raises(ValueError):
+        local.call("op", lambda: (_ for _ in ()).throw(ValueError("bad")))
+    assert local.stats()["failures"] == 1
+
+
+def test_backoff_gives_the_slot_back(tmp_path, monkeypatch):
+    client = HubClient(local_dir=tmp_path / "hub", max_concurrency=1, backoff_seconds=0)
+    free_while_waiting = []
+
+    def sleep(_):
+        # The only slot must be free for others during the backoff
+        free_while_waiting.append(client._slots.acquire(blocking=False))
+        client._slots.release()
+
+    monkeypatch.setattr("app.utils.hub_client.time.sleep", sleep)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise httpx.ConnectError("refused")
+        return "ok"
+
+    assert client.call("op", flaky) == "ok"
+    assert free_while_waiting == [True]
+
+
+def test_callers_can_turn_retries_off(local):
+    attempts = []
+
+    def failing():
+        attempts.append(1)
+        raise httpx.ConnectError("refused")
+
+    with pytest.raises(httpx.ConnectError):
+        local.call("op", failing, max_retries=0)
+    assert attempts == [1]
+
+
+def test_app_client_uses_the_local_hub():
+    assert isinstance(HUB_CLIENT.local, LocalHub)
+    assert HUB_CLIENT.local.root == Path(os.environ["HF_LOCAL_HUB_DIR"])
+
+
+def test_upload_file_endpoint_writes_to_the_local_hub(client, frame):
+    response = client.post("/upload-file", files=csv_file(frame, "hub_upload.csv"))
+
+    assert response.status_code == 200, response.text
+    assert response.json()["hf_response"].startswith("local://dataset/")
+    page = client.get("/get-file", params={"filename": "hub_upload", "limit": 3}).json()
+    assert page["total_rows"] == len(frame)
+    assert [row["income"] for row in page["records"]] == frame["income"].head(3).tolist()
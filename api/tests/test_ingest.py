@@ -0,0 +1,63 @@
+import json
+
+import pandas as pd
+import pytest
+
+from app.components.Upload.ingest import iter_frames, read_frame
+from conftest import csv_file
+
+RECORDS = [{"a": 1, "b": "x"}, {"a": 2, "b": "y"}, {"a": 3, "b": None}]
+
+
+def test_json_lines_are_read_in_chunks(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("\n".join(json.dumps(r) for r in RECORDS) + "\n")
+
+    chunks = list(iter_frames(path, ".json", chunk_rows=2))
+
+    assert [len(c) for c in chunks] == [2, 1]
+    assert read_frame(path, ".json")["a"].tolist() == [1, 2, 3]
+
+
+def test_json_lines_with_blank_lines(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text("\n" + "\n\n".join(json.dumps(r) for r in RECORDS) + "\n\n")
+
+    assert read_frame(path, ".json")["a"].tolist() == [1, 2, 3]
+
+
+@pytest.mark.parametrize("text", [
+    # Pretty-printed records and columns: the first line is just "[" or "{"
+    json.dumps(RECORDS, indent=2),
+    json.dumps(pd.DataFrame(RECORDS).to_dict(), indent=2),
+    # A whole document on one line
+    json.dumps(pd.DataFrame(RECORDS).to_dict()) + "\n",
+])
+def test_json_documents_use_the_regular_reader(tmp_path, text):
+    path = tmp_path / "data.json"
+    path.write_text(text)
+
+    df = read_frame(path, ".json")
+
+    assert sorted(df.columns) == ["a", "b"]
+    assert sorted(df["a"].tolist()) == [1, 2, 3]
+
+
+def test_csv_is_read_in_chunks(tmp_path):
+    path = tmp_path / "data.csv"
+    pd.DataFrame({"a": range(10)}).to_csv(path, index=False)
+
+    assert [len(c) for c in iter_frames(path, ".csv", chunk_rows=4)] == [4, 4, 2]
+    assert read_frame(path, ".csv")["a"].tolist() == list(range(10))
+
+
+def test_upload_endpoint_creates_a_session(client):
+    df = pd.DataFrame({"a": range(5), "b": list("abcde")})
+
+    response = client.post("/upload", files=csv_file(df))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["session_id"]
+    assert [row["a"] for row in body["preview"]] == [0, 1, 2, 3, 4]
+
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from app.utils.artifact import model_filename
+from app.utils.jobs import CANCELLED, FAILED, SUCCEEDED, JobManager
+from conftest import upload_session
+
+
+# Job functions run in spawned workers, so they live at module level
+def add(a, b, progress):
+    progress("adding", 0.5)
+    return {"sum": a + b, "metrics": {"ops": 1}}
+
+
+def fail(progress):
+    raise ValueError("boom")
+
+
+def spin(progress):
+    while True:
+        progress("spinning", 0.1)
+        time.sleep(0.05)
+
+
+def _wait_until(predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+@pytest.fixture(scope="module")
+def jobs():
+    manager = JobManager(max_workers=2)
+    yield manager
+    manager.shutdown()
+
+
+def test_job_result_and_progress(jobs):
+    job = jobs.submit("test", add, 2, 3, meta={"kind_of": "sum"})
+    assert job.future.result(timeout=60) == {"sum": 5, "metrics": {"ops": 1}}
+
+    _wait_until(lambda: job.status == SUCCEEDED)
+    data = job.to_dict()
+    assert data["kind_of"] == "sum"
+    assert data["progress"] == 1.0
+    assert data["metrics"] == {"ops": 1}
+    events = [e["event"] for e in job.events]
+    assert events[0] == "queued"
+    assert events[-1] == SUCCEEDED
+
+
+def test_failed_job_reports_error(jobs):
+    job = jobs.submit("test", fail)
+    with pytest.raises(ValueError):
+        job.future.result(timeout=60)
+
+    _wait_until(lambda: job.status == FAILED)
+    assert job.error == "boom"
+
+
+def test_running_job_is_cancelled_at_next_checkpoint(jobs):
+    job = jobs.submit("test", spin)
+    _wait_until(lambda: job.stage == "spinning")
+
+    jobs.cancel(job.id)
+
+    _wait_until(lambda: job.status == CANCELLED)
+    assert job.cancel_requested
+
+
+def test_model_filenames_are_unique_per_run():
+    first = model_filename("s", "LogisticRegression", "job-1")
+    second = model_filename("s", "LogisticRegression", "job-2")
+    assert first != second
+    assert first.startswith("s_LogisticRegression_") and first.endswith(".zmodel")
+    assert model_filename("s", "m") != model_filename("s", "m")
+
+
+def test_concurrent_training_jobs_keep_their_models(client, workdir, frame):
+    session_id = upload_session(client, frame)
+    job_ids = [
+        client.post("/jobs/train", data={"session_id": session_id, "target": "churned", "model_choice": "LogisticRegression"}).json()["job_id"]
+        for _ in range(2)
+    ]
+
+    results = []
+    for job_id in job_ids:
+        _wait_until(lambda: client.get(f"/jobs/{job_id}").json()["status"] in ("succeeded", "failed"), timeout=120)
+        job = client.get(f"/jobs/{job_id}").json()
+        assert job["status"] == "succeeded", job["error"]
+        results.append(job["result"])
+
+    paths = [r["model_path"] for r in results]
+    assert paths[0] != paths[1]
+    for result in results:
+        assert result["model_path"] == f"models/{result['hf_filename']}"
+        assert (workdir / result["model_path"]).exists()
@@ -0,0 +1,173 @@
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.components.Cleaning import clean, codegen
+from app.components.Cleaning.codegen import StubCodeGenerator
+from app.components.Cleaning.lazy import PLANS, CleaningPlan, ReplayError, replay, representative_sample, run_code
+from app.components.Export import export
+from app.components.Upload import upload
+from app.routes import routes
+from app.utils.dtypes import widen_frame
+from app.utils.session import SessionStore
+from conftest import upload_session
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "n": pd.Series([1, 2, 3, 4], dtype="int8"),
+        "f": pd.Series([0.5, 1.5, None, 2.5], dtype="float32"),
+        "x": [10.0, 20.0, 30.0, 40.0],
+        "city": pd.Categorical(["a", None, "b", "a"]),
+    })
+
+
+def test_widened_copy_shares_nothing_with_the_input(df):
+    wide = widen_frame(df, copy=True)
+
+    assert wide["n"].dtype == "int64" and wide["f"].dtype == "float64"
+    for name in ("n", "f", "x"):
+        assert not np.shares_memory(wide[name].to_numpy(), df[name].to_numpy())
+    # Without strings, categoricals are only copied
+    assert isinstance(wide["city"].dtype, pd.CategoricalDtype)
+    assert not np.shares_memory(wide["city"].cat.codes.to_numpy(), df["city"].cat.codes.to_numpy())
+
+
+def test_in_place_code_leaves_the_input_alone(df):
+    before = df.copy()
+
+    result = run_code("df['x'] += 1\ndf.loc[0, 'n'] = 100\ndf.drop(columns=['f'], inplace=True)", df)
+
+    pd.testing.assert_frame_equal(df, before)
+    assert result["x"].tolist() == [11.0, 21.0, 31.0, 41.0]
+    assert "f" not in result
+
+
+def test_code_sees_64_bit_numbers_and_result_is_compacted(df):
+    result = run_code("df['n'] = df['n'] * 1000", df)
+
+    assert result["n"].tolist() == [1000, 2000, 3000, 4000]
+    assert result["n"].dtype.itemsize == 2
+
+
+def test_retry_on_object_columns_starts_from_the_input(df):
+    # Adding a category fails on the categorical column; the retry must not
+    # see the increment the failed attempt already applied
+    code = "df['x'] = df['x'] + 1\ndf.loc[df['city'].isna(), 'city'] = 'unknown'"
+
+    result = run_code(code, df)
+
+    assert result["x"].tolist() == [11.0, 21.0, 31.0, 41.0]
+    assert result["city"].tolist() == ["a", "unknown", "b", "a"]
+    assert df["city"].isna().sum() == 1
+
+
+def test_failures_without_typed_strings_are_not_retried():
+    with pytest.raises(TypeError):
+        run_code("df['a'] = df['a'] + 'x'", pd.DataFrame({"a": [1, 2]}))
+
+
+def test_representative_sample_keeps_head_and_order():
+    df = pd.DataFrame({"i": range(1000)})
+
+    sample = representative_sample(df, n_rows=200)
+
+    assert len(sample) == 200
+    assert sample["i"].iloc[:100].tolist() == list(range(100))
+    assert sample["i"].is_monotonic_increasing
+
+
+def test_plan_replay_undo_and_redo():
+    sample = pd.DataFrame({"a": [1, 2, 2, None]})
+    plan = CleaningPlan(sample, total_rows=10)
+    for code in ("df = df.dropna()", "df = df.drop_duplicates()"):
+        plan.record({"code": code}, replay(sample, plan.ops + [{"code": code}]))
+    assert len(plan.result) == 2
+
+    plan.undo()
+    assert len(plan.result) == 3
+    plan.redo()
+    assert len(plan.result) == 2
+
+
+def test_replay_reports_the_failing_step():
+    with pytest.raises(ReplayError) as e:
+        replay(pd.DataFrame({"a": [1]}), [{"code": "df = df"}, {"code": "df = df['missing']"}])
+    assert e.value.index == 1
+
+
+@pytest.fixture
+def lazy_session(client, frame, tmp_path, monkeypatch):
+    store = SessionStore(memory_budget_bytes=10**9, idle_ttl_seconds=3600, spill_dir=tmp_path)
+    store.on_evict(clean._forget_session)
+    for module in (upload, clean, export, routes):
+        monkeypatch.setattr(module, "SESSIONS", store)
+    monkeypatch.setattr(clean, "CLEAN_SAMPLE_ROWS", 50)
+    monkeypatch.setattr(codegen, "GENERATOR", StubCodeGenerator({
+        "lazy drop missing age": "df = df.dropna(subset=['age'])",
+        "lazy double income": "df['income'] = df['income'] * 2",
+    }))
+    session_id = upload_session(client, frame)
+    yield store, session_id
+    PLANS.pop(session_id, None)
+
+
+def _record(client, session_id, instruction):
+    response = client.post("/clean-data", json={"session_id": session_id, "instruction": instruction, "lazy": True})
+    assert response.json()["message"] == "Cleaning recorded", response.text
+    return response.json()
+
+
+def test_operation_recorded_during_a_replay_is_kept(client, frame, lazy_session, monkeypatch):
+    store, session_id = lazy_session
+    _record(client, session_id, "lazy drop missing age")
+    started, release = threading.Event(), threading.Event()
+
+    def slow_replay(*args):
+        started.set()
+        release.wait(5)
+        return replay(*args)
+
+    monkeypatch.setattr(clean, "replay", slow_replay)
+
+    async def scenario():
+        replaying = asyncio.create_task(clean.materialize(session_id))
+        await asyncio.to_thread(started.wait, 5)
+        recording = asyncio.create_task(clean.clean_data(session_id, "lazy double income", True))
+        await asyncio.sleep(0.1)
+        # Waits for the replay instead of joining the plan being replayed
+        assert not recording.done()
+        release.set()
+        return await replaying, await recording
+
+    materialized, recorded = asyncio.run(scenario())
+
+    assert materialized["age"].notna().all()
+    assert recorded["pending_ops"] == 1
+    assert [op["instruction"] for op in PLANS[session_id].ops] == ["lazy double income"]
+    # The new plan samples the materialized frame
+    assert PLANS[session_id].total_rows == len(materialized)
+    assert not clean._session_locks
+
+
+def test_spilling_releases_the_sample_and_deleting_drops_the_plan(client, lazy_session):
+    store, session_id = lazy_session
+    _record(client, session_id, "lazy drop missing age")
+    plan = PLANS[session_id]
+
+    store.memory_budget_bytes = 0
+    store["other"] = pd.DataFrame({"x": [1]})
+
+    assert store.usage(session_id)["state"] == "disk"
+    assert plan.sample is None and plan.result is None
+    # Rebuilt on next use, operations intact
+    undone = client.post("/clean-data/undo", json={"session_id": session_id}).json()
+    assert undone["pending_ops"] == 0 and len(undone["preview"]) > 0
+    assert len(plan.sample) == 50
+
+    del store[session_id]
+    assert session_id not in PLANS
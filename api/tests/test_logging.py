@@ -0,0 +1,152 @@
+import json
+import logging
+import queue
+import time
+
+import pytest
+
+from app.logging import logging_config
+from app.logging.logging_config import (
+    REQUEST_ID,
+    JsonFormatter,
+    _DeferredQueueHandler,
+    _PayloadSampler,
+    _SharedRotatingFileHandler,
+    log_payload,
+    setup_logger,
+)
+from conftest import WORKDIR
+
+
+def _record(msg="hello %s", args=("world",), **extra):
+    record = logging.LogRecord("zeroml.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_extra_fields():
+    entry = json.loads(JsonFormatter().format(_record(request_id="r1", rows=3)))
+
+    assert entry["message"] == "hello world"
+    assert entry["request_id"] == "r1"
+    assert entry["rows"] == 3
+    assert entry["level"] == "INFO"
+
+
+class _Payload:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __str__(self):
+        self.calls.append(1)
+        return "payload"
+
+
+def test_queue_handler_defers_formatting_and_drops_when_full():
+    calls = []
+    handler = _DeferredQueueHandler(queue.Queue(1))
+
+    handler.handle(_record("%s", (_Payload(calls),)))
+    handler.handle(_record())
+
+    assert calls == []
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().getMessage() == "payload"
+
+
+def test_setup_logger_adds_one_handler():
+    logger = setup_logger("zeroml.test.handlers")
+    assert setup_logger("zeroml.test.handlers") is logger
+    assert len(logger.handlers) == 1
+    assert not logger.propagate
+
+
+def test_payload_sampler_counts_suppressed():
+    sampler = _PayloadSampler(interval=3600)
+
+    assert sampler.allow("k") == 0
+    assert sampler.allow("k") is None
+    assert sampler.allow("k") is None
+    assert sampler.allow("other") == 0
+
+    sampler.interval = 0
+    assert sampler.allow("k") == 2
+
+
+def test_log_payload_skips_disabled_levels(monkeypatch):
+    logger = setup_logger("zeroml.test.payload")
+    calls = []
+    monkeypatch.setattr(logging_config, "_SAMPLER", _PayloadSampler(interval=3600))
+
+    log_payload(logger, "head", "frame head", lambda: calls.append(1))
+
+    # LOG_LEVEL is WARNING in the tests, so DEBUG payloads are never built
+    assert calls == []
+    assert logging_config._SAMPLER._last == {}
+
+
+def test_log_payload_builds_the_payload_at_call_time(monkeypatch):
+    logger = setup_logger("zeroml.test.payload_now")
+    monkeypatch.setattr(logger, "level", logging.DEBUG)
+    monkeypatch.setattr(logging_config, "_SAMPLER", _PayloadSampler(interval=3600))
+    records = []
+    monkeypatch.setattr(logger, "handle", records.append)
+    values = [1, 2]
+
+    log_payload(logger, "values", "head %s of %s", lambda: (values, len(values)))
+    values.append(3)
+    log_payload(logger, "broken", "never %s", lambda: 1 / 0)
+
+    # Copied when logged; only formatting is left for later
+    assert records[0].getMessage() == "head [1, 2] of 2"
+    assert "unavailable" in records[1].getMessage()
+
+
+def test_every_process_rotates_the_shared_log_file(tmp_path):
+    path = tmp_path / "shared.log"
+    # One handler per process writing the file
+    first, second = (_SharedRotatingFileHandler(str(path), maxBytes=200, backupCount=10) for _ in range(2))
+    try:
+        for i in range(10):
+            (first if i % 2 else second).handle(_record("line %s", (f"{i:02d}" + "x" * 40,)))
+    finally:
+        first.close()
+        second.close()
+
+    # Oldest first
+    files = sorted(tmp_path.glob("shared.log.[0-9]*"), key=lambda p: -int(p.suffix[1:])) + [path]
+    assert len(files) > 2
+    assert all(f.stat().st_size <= 200 for f in files)
+    # Nothing lost or written to a rotated-away file, in order
+    lines = [line for f in files for line in f.read_text().splitlines()]
+    assert [line[5:7] for line in lines] == [f"{i:02d}" for i in range(10)]
+
+
+def test_records_reach_the_log_file_with_the_request_id():
+    logger = setup_logger("zeroml.test.file")
+    token = REQUEST_ID.set("req-42")
+    try:
+        logger.warning("written %s", "later", extra={"rows": 7})
+    finally:
+        REQUEST_ID.reset(token)
+
+    log_file = WORKDIR / "app.log"
+    deadline = time.monotonic() + 5
+    entries = []
+    while time.monotonic() < deadline:
+        if log_file.exists():
+            lines = log_file.read_text().splitlines()
+            entries = [json.loads(line) for line in lines if '"zeroml.test.file"' in line]
+            if entries:
+                break
+        time.sleep(0.05)
+
+    assert entries, "record never reached the log file"
+    assert entries[-1]["message"] == "written later"
+    assert entries[-1]["request_id"] == "req-42"
+    assert entries[-1]["rows"] == 7
+
+
+@pytest.mark.parametrize("kind, formatter", [("json", JsonFormatter), ("text", logging.Formatter)])
+def test_formatter_kinds(kind, formatter):
+    assert type(logging_config._formatter(kind)) is formatter
@@ -0,0 +1,91 @@
+import re
+
+import pytest
+
+from app.utils.metrics import METRICS, STAGE_TIMINGS, MetricsRegistry, _server_timing, stage
+from conftest import upload_session
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def test_counter_and_gauge_render(registry):
+    requests = registry.counter("requests_total", "Requests.", ("route",))
+    in_flight = registry.gauge("in_flight", "In flight.")
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    requests.inc(route='/b"')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/a"} 3' in text
+    assert 'requests_total{route="/b\\""} 1' in text
+    assert "in_flight 1" in text
+
+
+def test_labels_must_match(registry):
+    requests = registry.counter("requests_total", "Requests.", ("route",))
+    with pytest.raises(ValueError):
+        requests.inc(status=200)
+
+
+def test_registering_twice_returns_the_same_metric(registry):
+    first = registry.counter("requests_total", "Requests.")
+    assert registry.counter("requests_total", "Requests.") is first
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 5):
+        latency.observe(value)
+
+    text = registry.render()
+
+    assert 'latency_seconds_bucket{le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{le="1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_sum 5.65" in text
+    assert "latency_seconds_count 4" in text
+
+
+def test_stage_records_timings_and_errors():
+    timings = []
+    token = STAGE_TIMINGS.set(timings)
+    try:
+        with stage("test_ok"):
+            pass
+        with pytest.raises(RuntimeError):
+            with stage("test_fail"):
+                raise RuntimeError("boom")
+    finally:
+        STAGE_TIMINGS.reset(token)
+
+    assert [name for name, _ in timings] == ["test_ok", "test_fail"]
+    text = METRICS.render()
+    assert 'zeroml_stage_errors_total{stage="test_fail"} 1' in text
+    assert 'zeroml_stage_in_flight{stage="test_ok"} 0' in text
+    assert _server_timing([("a", 0.001), ("b", 0.002), ("a", 0.002)]) == "a;dur=3.0, b;dur=2.0"
+
+
+def test_metrics_endpoint_and_request_headers(client, frame):
+    session_id = upload_session(client, frame)
+    response = client.post(
+        "/clean-data", json={"session_id": session_id, "instruction": "remove duplicates", "lazy": False},
+        headers={"X-Request-ID": "abc-123"},
+    )
+    assert response.headers["x-request-id"] == "abc-123"
+    assert "code_cache;dur=" in response.headers["server-timing"]
+    # Invalid ids are replaced
+    assert client.get("/hub", headers={"X-Request-ID": "bad id!"}).headers["x-request-id"] != "bad id!"
+
+    text = client.get("/metrics").text
+
+    assert re.search(r'zeroml_http_requests_total\{method="POST",route="/clean-data",status="200"\} [1-9]', text)
+    assert re.search(r'zeroml_stage_duration_seconds_count\{stage="code_cache"\} [1-9]', text)
+    assert 'zeroml_bytes_total{stage="http_response",direction="out"}' in text
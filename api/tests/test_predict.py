@@ -0,0 +1,67 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from conftest import upload_session
+
+
+@pytest.fixture(scope="module")
+def trained(client):
+    n = 120
+    df = pd.DataFrame({
+        "x": [float(i) for i in range(n)],
+        "color": [["red", "blue", "green"][i % 3] for i in range(n)],
+        "label": ["high" if i >= n // 2 else "low" for i in range(n)],
+    })
+    session_id = upload_session(client, df)
+    response = client.post("/train-model", data={"session_id": session_id, "target": "label", "model_choice": "LogisticRegression"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_predict_right_after_training(client, trained):
+    # The model hasn't reached the Hub yet; it is served from models/
+    response = client.post("/predict", json={
+        "model": trained["hf_filename"],
+        "records": [{"x": 5.0, "color": "red"}, {"x": 110.0, "color": "blue"}],
+    })
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["rows"] == 2
+    assert body["predictions"] == ["low", "high"]
+
+
+def test_predict_columns_payload(client, trained):
+    response = client.post("/predict", json={"model": trained["hf_filename"], "columns": {"x": [1.0, 119.0], "color": ["red", "red"]}})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["predictions"] == ["low", "high"]
+
+
+def test_concurrent_requests_share_the_model(trained):
+    from app.components.inference import predict
+
+    async def score_many():
+        payloads = [{"record": {"x": float(i), "color": "green"}} for i in range(0, 120, 10)]
+        return await asyncio.gather(*(predict.predict(trained["hf_filename"], p) for p in payloads))
+
+    results = asyncio.run(score_many())
+
+    assert [r["predictions"][0] for r in results] == ["low"] * 6 + ["high"] * 6
+    assert predict.REGISTRY.summary()["loads"] >= 1
+
+
+@pytest.mark.parametrize("payload, status", [
+    ({"model": "missing.zmodel", "record": {"x": 1}}, 404),
+    ({"model": "../etc/passwd", "record": {"x": 1}}, 400),
+    ({"record": {"x": 1}}, 400),
+])
+def test_bad_requests(client, trained, payload, status):
+    assert client.post("/predict", json=payload).status_code == status
+
+
+def test_bad_rows(client, trained):
+    response = client.post("/predict", json={"model": trained["hf_filename"], "columns": {"x": [1.0], "color": []}})
+    assert response.status_code == 400
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+from app.components.training import search
+from app.components.training.errors import TrainingError
+from conftest import upload_session
+
+
+@pytest.fixture(autouse=True)
+def one_core(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_N_JOBS", 1)
+
+
+def test_grid_search_ranks_every_candidate(frame):
+    space = json.dumps({"C": [0.01, 1.0, 10.0]})
+    res = search.run_search("s", "churned", "LogisticRegression", "grid", space, cv=2, df=frame)
+
+    board = res["leaderboard"]
+    assert [row["rank"] for row in board] == [1, 2, 3]
+    assert sorted(row["params"]["C"] for row in board) == [0.01, 1.0, 10.0]
+    assert all(row["status"] == "completed" for row in board)
+    scores = [row["mean_score"] for row in board]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_random_search_samples_n_iter(frame):
+    space = json.dumps({"C": {"distribution": "loguniform", "low": 0.01, "high": 10}})
+    res = search.run_search("s", "churned", "LogisticRegression", "random", space, n_iter=4, cv=2, df=frame)
+
+    board = res["leaderboard"]
+    assert len(board) == 4
+
+
+def test_halving_eliminates_candidates(frame):
+    space = json.dumps({"C": [0.001, 0.01, 0.1, 1.0, 10.0, 100.0]})
+    res = search.run_search("s", "churned", "LogisticRegression", "halving", space, cv=2, factor=2, df=frame)
+
+    board = res["leaderboard"]
+    statuses = [row["status"] for row in board]
+    assert "eliminated" in statuses
+    # The winner saw every row
+    assert board[0]["n_samples"] == len(frame)
+
+
+def test_progress_is_reported_after_every_batch(frame):
+    class Cancelled(Exception):
+        pass
+
+    scored = []
+
+    def progress(stage, fraction, **info):
+        if stage == "searching":
+            scored.append(info["scored"])
+            if info["scored"] == 2:
+                raise Cancelled
+
+    space = json.dumps({"C": [0.01, 0.1, 1.0, 10.0]})
+    with pytest.raises(Cancelled):
+        search.run_search("s", "churned", "LogisticRegression", "grid", space, cv=2, df=frame, progress=progress)
+
+    # One candidate per batch on one core; the search stops mid-round
+    assert scored == [0, 1, 2]
+
+
+def test_default_n_jobs_is_a_share_of_the_cores(monkeypatch):
+    monkeypatch.setattr(search, "SEARCH_N_JOBS", -1)
+    monkeypatch.setattr(search, "JOB_MAX_WORKERS", 2)
+    monkeypatch.setattr(search.os, "cpu_count", lambda: 8)
+
+    assert search.search_n_jobs() == 4
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"strategy": "nope"},
+    {"model_choice": "Nope"},
+    {"cv": 1},
+    {"space": "{not json"},
+    {"strategy": "grid", "space": json.dumps({"C": {"distribution": "uniform", "low": 0, "high": 1}})},
+])
+def test_invalid_requests_are_400(frame, kwargs):
+    args = {"model_choice": "LogisticRegression", "strategy": "random", **kwargs}
+    with pytest.raises(TrainingError) as e:
+        search.run_search("s", "churned", df=frame, **args)
+    assert e.value.status_code == 400
+
+
+def test_search_endpoint(client, frame):
+    session_id = upload_session(client, frame)
+
+    response = client.post("/search-hyperparameters", data={
+        "session_id": session_id,
+        "target": "churned",
+        "model_choice": "LogisticRegression",
+        "strategy": "grid",
+        "space": json.dumps({"C": [0.1, 1.0]}),
+        "cv": 2,
+    })
+
+    assert response.status_code == 200, response.text
+    assert response.json()["data_source"] == "session"
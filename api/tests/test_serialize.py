@@ -0,0 +1,102 @@
+import datetime
+import io
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.utils import serialize
+from app.utils.serialize import ARROW_STREAM, JSON, NDJSON, arrow_stream, dumps, ndjson_stream, negotiate, preview, records
+from app.utils.storage import iter_batches
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "i": np.arange(3, dtype="int16"),
+        "f": [0.5, np.nan, np.inf],
+        "b": [True, False, True],
+        "t": pd.to_datetime(["2024-01-01", None, "2024-01-03"]),
+        "d": pd.to_timedelta(["1h", None, "2h"]),
+        "c": pd.Categorical(["x", None, "y"]),
+        "n": pd.array([1, None, 3], dtype="Int64"),
+        "s": pd.array(["a", None, "c"], dtype="string[pyarrow]"),
+        "o": ["a", None, 3],
+    })
+
+
+def test_records_match_pandas_json(df):
+    expected = json.loads(df.drop(columns=["t", "d"]).to_json(orient="records"))
+
+    rows = records(df)
+
+    assert [{k: v for k, v in row.items() if k not in ("t", "d")} for row in rows] == expected
+    assert [row["t"] for row in rows] == ["2024-01-01T00:00:00", None, "2024-01-03T00:00:00"]
+    assert [row["d"] for row in rows] == ["0 days 01:00:00", None, "0 days 02:00:00"]
+    assert type(rows[0]["i"]) is int and type(rows[0]["n"]) is int
+    assert preview(df, 2) == rows[:2]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_writes_null_for_non_finite(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(serialize, "orjson", None)
+    elif serialize.orjson is None:
+        pytest.skip("orjson not installed")
+
+    out = json.loads(dumps({"a": [1.0, math.nan, -math.inf], "t": datetime.date(2024, 1, 2), "n": np.int64(4)}))
+
+    assert out == {"a": [1.0, None, None], "t": "2024-01-02", "n": 4}
+
+
+@pytest.mark.parametrize("accept, fmt, expected", [
+    (None, None, JSON),
+    ("text/html", None, JSON),
+    ("application/x-ndjson", None, NDJSON),
+    ("application/jsonl", None, NDJSON),
+    ("application/json;q=0.5, application/vnd.apache.arrow.stream", None, ARROW_STREAM),
+    ("application/x-ndjson;q=0.2, application/json;q=0.9", None, JSON),
+    ("application/x-ndjson", "arrow", ARROW_STREAM),
+    (None, "JSON", JSON),
+])
+def test_negotiate(accept, fmt, expected):
+    assert negotiate(accept, fmt) == expected
+
+
+def test_negotiate_rejects_unknown_formats():
+    with pytest.raises(ValueError):
+        negotiate(None, "xml")
+
+
+def test_streams_round_trip():
+    table = pa.table({"x": [1, 2, 3], "s": ["a", None, "c"]})
+    batches = table.to_batches(max_chunksize=2)
+
+    arrow = b"".join(arrow_stream(table.schema, iter(batches)))
+    ndjson = b"".join(ndjson_stream(iter(batches)))
+
+    assert pa.ipc.open_stream(io.BytesIO(arrow)).read_all().equals(table)
+    assert [json.loads(line) for line in ndjson.splitlines()] == table.to_pylist()
+
+
+def test_iter_batches_reads_only_the_requested_rows(tmp_path):
+    path = tmp_path / "data.parquet"
+    pq.write_table(pa.table({"n": range(100), "s": [str(i) for i in range(100)]}), path, row_group_size=10)
+
+    schema, batches, total, names = iter_batches(path, offset=25, limit=20, columns=["n"])
+    batches = list(batches)
+    rows = pa.Table.from_batches(batches, schema)
+
+    assert (total, names, schema.names) == (100, ["n", "s"], ["n"])
+    assert rows["n"].to_pylist() == list(range(25, 45))
+    # Every batch comes from a single row group
+    assert [b.num_rows for b in batches] == [5, 10, 5]
+
+    _, rest, _, _ = iter_batches(path, offset=95)
+    assert sum(b.num_rows for b in rest) == 5
+    with pytest.raises(KeyError):
+        iter_batches(path, columns=["nope"])
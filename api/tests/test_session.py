@@ -0,0 +1,207 @@
+import sys
+
+import pandas as pd
+import pytest
+
+from app.components.Cleaning import clean, codegen
+from app.components.Cleaning.codegen import StubCodeGenerator
+from app.components.Export import export
+from app.components.Upload import upload
+from app.routes import routes
+from app.utils.session import SessionStore, SharedSessionStore, drop_snapshot, frame_memory_bytes
+from app.utils.storage import read_snapshot
+from conftest import upload_session
+
+
+def _frame(n=1000, offset=0):
+    return pd.DataFrame({"x": range(offset, offset + n), "y": [f"v{i}" for i in range(n)]})
+
+
+def test_spills_least_recently_used_over_budget(tmp_path):
+    a, b = pd.DataFrame({"x": range(1000)}), pd.DataFrame({"x": range(5, 1005)})
+    store = SessionStore(memory_budget_bytes=int(frame_memory_bytes(a) * 1.5), idle_ttl_seconds=3600, spill_dir=tmp_path)
+    store["a"] = a
+    store["b"] = b
+
+    assert store.usage("a")["state"] == "disk"
+    assert store.usage("b")["state"] == "memory"
+    assert list(tmp_path.iterdir())
+
+    # Reading it back brings it into memory and spills the other one
+    pd.testing.assert_frame_equal(store["a"], a)
+    assert store.usage("a")["state"] == "memory"
+    assert store.usage("b")["state"] == "disk"
+
+
+def test_idle_sessions_are_spilled(tmp_path):
+    store = SessionStore(memory_budget_bytes=10**9, idle_ttl_seconds=0, spill_dir=tmp_path)
+    store["idle"] = _frame()
+    store["active"] = _frame()
+
+    assert store.usage("idle")["state"] == "disk"
+    # Strings come back Arrow-backed
+    pd.testing.assert_frame_equal(store["idle"], _frame(), check_dtype=False)
+
+
+def test_mixed_type_frames_spill_as_pickle(tmp_path):
+    mixed = pd.DataFrame({"m": [1, "two", 3.0]})
+    store = SessionStore(memory_budget_bytes=0, idle_ttl_seconds=3600, spill_dir=tmp_path)
+    store["mixed"] = mixed
+    store["other"] = _frame()
+
+    assert [p.suffix for p in tmp_path.iterdir()] == [".pkl"]
+    assert store["mixed"]["m"].tolist() == [1, "two", 3.0]
+
+
+def test_versions_and_delete(tmp_path):
+    store = SessionStore(memory_budget_bytes=0, idle_ttl_seconds=3600, spill_dir=tmp_path)
+    store["s"] = _frame()
+    store["s"] = _frame(offset=1)
+    assert store.version("s") == 2
+    store["t"] = _frame()
+
+    del store["s"]
+    assert "s" not in store
+    assert not list(tmp_path.glob("s.*"))
+    with pytest.raises(KeyError):
+        store["s"]
+
+
+def test_snapshots_outlive_the_session_version(tmp_path):
+    store = SessionStore(memory_budget_bytes=10**9, idle_ttl_seconds=3600, spill_dir=tmp_path)
+    store["s"] = _frame()
+
+    live = store.snapshot("s")
+    store["s"] = _frame(offset=1)
+
+    assert (live["format"], live["version"]) == ("arrow", 1)
+    assert read_snapshot(live)["x"].iloc[0] == 0
+    drop_snapshot(live)
+    assert not list((tmp_path / "snapshots").iterdir())
+
+
+def test_snapshot_of_a_spilled_session_links_the_spill_file(tmp_path):
+    store = SessionStore(memory_budget_bytes=0, idle_ttl_seconds=3600, spill_dir=tmp_path)
+    store["s"] = _frame()
+    store["t"] = _frame()
+
+    snapshot = store.snapshot("s")
+
+    assert snapshot["format"] == "parquet"
+    assert store.usage("s")["state"] == "disk"
+    # Still readable once the session is back in memory and its spill file gone
+    store["s"]
+    pd.testing.assert_frame_equal(read_snapshot(snapshot), _frame(), check_dtype=False)
+
+
+def test_attached_bytes_count_toward_the_budget(tmp_path):
+    size = frame_memory_bytes(_frame())
+    store = SessionStore(memory_budget_bytes=size * 3, idle_ttl_seconds=3600, spill_dir=tmp_path)
+    evicted = []
+    store.on_evict(lambda session_id, reason: evicted.append((session_id, reason)))
+    store["a"] = _frame()
+    store["b"] = _frame()
+
+    store.attach_bytes("b", size * 2)
+
+    assert evicted == [("a", "spill")]
+    assert store.memory_in_use() == size * 3
+    # A new frame starts without attachments
+    store["b"] = _frame(offset=1)
+    assert store.usage("b")["attached_bytes"] == 0
+    del store["b"]
+    assert evicted[-1] == ("b", "delete")
+
+
+@pytest.fixture
+def shared(tmp_path):
+    def make():
+        return SharedSessionStore(
+            root=tmp_path / "shm", memory_budget_bytes=10**9, idle_ttl_seconds=3600,
+            spill_dir=tmp_path / "spill", cache_sessions=2,
+        )
+    return make
+
+
+def test_shared_sessions_are_seen_by_every_worker(shared):
+    first, second = shared(), shared()
+    first["s"] = _frame()
+    pd.testing.assert_frame_equal(second["s"], _frame(), check_dtype=False)
+
+    second["s"] = _frame(offset=1)
+
+    assert first.version("s") == 2
+    assert first["s"]["x"].iloc[0] == 1
+    del first["s"]
+    assert "s" not in second
+
+
+def test_shared_annotations_follow_the_version(shared):
+    first, second = shared(), shared()
+    first["s"] = _frame()
+
+    first.annotate("s", 1, "size", 123)
+    # Stale versions are ignored
+    first.annotate("s", 0, "size", 1)
+
+    assert second.annotation("s", 1, "size") == 123
+    second["s"] = _frame(10)
+    assert first.annotation("s", 2, "size") is None
+    assert first.annotation("missing", 1, "size") is None
+
+
+def test_shared_frames_are_not_copied_per_read(shared):
+    store = shared()
+    store["s"] = _frame().assign(when=pd.date_range("2024-01-01", periods=1000))
+
+    df = store["s"]
+
+    # Every read in a worker returns the mapped frame, no private copy
+    assert store["s"] is df
+    assert not df["x"].to_numpy().flags.writeable
+    with pytest.raises(ValueError):
+        df["x"].to_numpy()[0] = 1
+    # Changes go through a copy and a new version
+    store["s"] = df.assign(x=df["x"] + 1)
+    assert store["s"]["x"].iloc[0] == 1
+
+
+def test_shared_snapshots_survive_the_next_write(shared):
+    store = shared()
+    store["s"] = _frame()
+
+    snapshot = store.snapshot("s")
+    store["s"] = _frame(offset=1)
+
+    assert snapshot["version"] == 1
+    assert read_snapshot(snapshot)["x"].iloc[0] == 0
+    assert store.version("s") == 2 and list(store) == ["s"]
+
+
+def test_shared_backend_imports_fcntl_lazily(monkeypatch, shared):
+    monkeypatch.delitem(sys.modules, "fcntl")
+    SessionStore(memory_budget_bytes=10**9, idle_ttl_seconds=3600, spill_dir="unused")["s"] = _frame()
+    assert "fcntl" not in sys.modules
+
+    shared()["s"] = _frame()
+    assert "fcntl" in sys.modules
+
+
+def test_in_place_cleaning_with_the_shared_backend(client, frame, shared, monkeypatch):
+    store = shared()
+    for module in (upload, clean, export, routes):
+        monkeypatch.setattr(module, "SESSIONS", store)
+    monkeypatch.setattr(codegen, "GENERATOR", StubCodeGenerator({
+        "raise every income": "df['income'] += 1\ndf.loc[0, 'age'] = 99\ndf['member'] = ~df['member']",
+    }))
+    session_id = upload_session(client, frame)
+
+    response = client.post("/clean-data", json={"session_id": session_id, "instruction": "raise every income"})
+
+    assert response.status_code == 200, response.text
+    assert "error" not in response.json(), response.json()
+    df = store[session_id]
+    assert store.version(session_id) == 2
+    assert df["income"].tolist() == (frame["income"] + 1).tolist()
+    assert df["age"].iloc[0] == 99
+    assert df["member"].tolist() == (~frame["member"]).tolist()
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.utils import startup
+from app.utils.startup import StartupProfile, import_async, lazy_import, start_warmup
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def profile(monkeypatch):
+    profile = StartupProfile()
+    monkeypatch.setattr(startup, "STARTUP", profile)
+    return profile
+
+
+def test_importing_the_app_leaves_heavy_modules_unloaded(tmp_path):
+    heavy = [m for modules in startup.SUBSYSTEMS.values() for m in modules] + ["sklearn"]
+    code = "import json, sys, main; print(json.dumps([m for m in sys.argv[1:] if m in sys.modules]))"
+
+    out = subprocess.run(
+        [sys.executable, "-c", code, *heavy], cwd=API_DIR, capture_output=True, text=True, check=True,
+        env={**os.environ, "LOG_FILE": str(tmp_path / "app.log")},
+    ).stdout
+
+    assert json.loads(out.splitlines()[-1]) == []
+
+
+def test_lazy_import_records_the_first_import_only(profile, monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+
+    module = lazy_import("colorsys")
+
+    assert module is sys.modules["colorsys"]
+    assert "colorsys" in profile.lazy_imports
+    profile.lazy_imports.clear()
+    assert asyncio.run(import_async("colorsys")) is module
+    assert profile.lazy_imports == {}
+
+
+def test_phases_note_the_packages_they_import(profile, monkeypatch):
+    monkeypatch.setattr(startup, "_top_level_packages", iter([{"a"}, {"a", "b"}]).__next__)
+
+    with profile.phase("routes"):
+        pass
+    profile.ready()
+
+    assert profile.phases[-1]["phase"] == "routes"
+    assert profile.phases[-1]["packages"] == ["b"]
+    assert profile.report()["ready_seconds"] is not None
+
+
+def test_warmup_loads_the_requested_subsystems(profile, monkeypatch):
+    monkeypatch.setitem(startup.SUBSYSTEMS, "test", ("json",))
+
+    assert start_warmup("unknown") is None
+    start_warmup("test, unknown").join(5)
+
+    assert profile.warmup["status"] == "done"
+    assert profile.warmup["subsystems"] == ["test"]
+
+
+def test_warmup_failure_is_reported(profile, monkeypatch):
+    monkeypatch.setitem(startup.SUBSYSTEMS, "test", ("no_such_module_zeroml",))
+
+    start_warmup("test").join(5)
+
+    assert profile.warmup["status"] == "failed"
+
+
+def test_startup_endpoint(client):
+    report = client.get("/startup").json()
+
+    assert {"ready_seconds", "phases", "lazy_imports", "loaded_subsystems", "warmup"} <= set(report)
+    assert [p["phase"] for p in report["phases"]][-2:] == ["framework", "routes"]
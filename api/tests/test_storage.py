@@ -0,0 +1,67 @@
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from app.utils.storage import DatasetWriter, dataset_bytes, read_dataset, read_page, write_dataset
+
+
+def test_dataset_round_trip_keeps_dtypes(tmp_path):
+    df = pd.DataFrame({
+        "i": pd.Series([1, 2, 3], dtype="int16"),
+        "f": [0.5, None, 2.0],
+        "c": pd.Categorical(["a", "b", "a"]),
+        "mixed": [1, "two", None],
+    })
+    path = tmp_path / "d.parquet"
+    write_dataset(df, path)
+
+    back = read_dataset(path)
+
+    assert back["i"].dtype == "int16"
+    assert isinstance(back["c"].dtype, pd.CategoricalDtype)
+    # Mixed-type columns are stored as strings
+    assert back["mixed"].tolist()[:2] == ["1", "two"]
+    assert pd.isna(back["mixed"].iloc[2])
+    assert read_dataset(path, columns=["f"]).columns.tolist() == ["f"]
+
+
+def test_dataset_bytes_is_parquet():
+    buf = dataset_bytes(pd.DataFrame({"a": [1, 2]}))
+    assert pq.read_table(buf).num_rows == 2
+
+
+def test_read_page_reads_a_window_across_row_groups(tmp_path, monkeypatch):
+    import app.utils.storage as storage
+
+    monkeypatch.setattr(storage, "ROW_GROUP_SIZE", 10)
+    path = tmp_path / "d.parquet"
+    write_dataset(pd.DataFrame({"a": range(95), "b": [str(i) for i in range(95)]}), path)
+    assert pq.ParquetFile(path).metadata.num_row_groups == 10
+
+    page, total, columns = read_page(path, offset=18, limit=5, columns=["a"])
+
+    assert page["a"].tolist() == [18, 19, 20, 21, 22]
+    assert (total, columns) == (95, ["a", "b"])
+    assert read_page(path, offset=90, limit=50)[0]["a"].tolist() == list(range(90, 95))
+    assert read_page(path, offset=500, limit=5)[0].empty
+    with pytest.raises(KeyError):
+        read_page(path, 0, 5, columns=["nope"])
+
+
+def test_dataset_writer_promotes_the_schema(tmp_path):
+    path = tmp_path / "d.parquet"
+    with DatasetWriter(path) as writer:
+        writer.write(pd.DataFrame({"a": [1, 2], "b": [None, None]}))
+        writer.write(pd.DataFrame({"a": [2.5], "b": ["x"]}))
+
+    back = read_dataset(path)
+    assert back["a"].tolist() == [1.0, 2.0, 2.5]
+    assert back["b"].tolist()[2] == "x"
+    assert writer.rows == 3
+
+
+def test_dataset_writer_without_chunks_leaves_an_empty_dataset(tmp_path):
+    path = tmp_path / "d.parquet"
+    with DatasetWriter(path):
+        pass
+    assert read_dataset(path).empty
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.pipeline import Pipeline
+
+from app.components.training import streaming
+from app.components.training.streaming import (
+    StreamingEncoder,
+    StreamStats,
+    dataset_columns,
+    holdout_mask,
+    iter_chunks,
+    run_streaming_training,
+)
+from app.utils.session import SessionStore
+from conftest import upload_session
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(streaming, "STREAM_CHUNK_ROWS", 37)
+
+
+def test_encoder_fit_matches_streamed_statistics(frame, small_chunks):
+    X, y = frame.drop(columns=["churned"]), frame["churned"]
+    stats = StreamStats("churned")
+    for start in range(0, len(frame), 37):
+        stats.update(frame.iloc[start:start + 37])
+    streamed = StreamingEncoder(target_column="churned").fit_stats(stats, stats.problem_type())
+
+    fitted = StreamingEncoder(target_column="churned").fit(X, y)
+
+    assert fitted.feature_names_ == streamed.feature_names_
+    np.testing.assert_allclose(fitted.transform(X), streamed.transform(X))
+
+
+def test_encoder_works_in_a_pipeline(frame):
+    X, y = frame[["age", "income", "city"]], frame["income"] * 2
+    encoder = StreamingEncoder(target_column="target")
+
+    out = Pipeline([("encode", encoder)]).fit_transform(X, y)
+
+    assert out.shape == (len(X), 2 + 3)
+    assert encoder.target_scale_ is not None
+    # Unseen categories and missing values encode as zeros
+    row = encoder.transform(pd.DataFrame({"age": [None], "income": [1000.0], "city": ["lima"]}))
+    assert row[0, 2:].sum() == 0
+
+    unsupervised = StreamingEncoder().fit(X)
+    assert unsupervised.target_scale_ is None
+
+
+def test_holdout_is_stable_across_passes():
+    whole = holdout_mask(0, 1000)
+    parts = np.concatenate([holdout_mask(0, 400), holdout_mask(400, 600)])
+
+    np.testing.assert_array_equal(whole, parts)
+    assert 0.15 < whole.mean() < 0.25
+
+
+@pytest.mark.parametrize("budget, fmt", [(10**9, "arrow"), (0, "parquet")])
+def test_chunks_are_read_from_the_session_snapshot(frame, small_chunks, tmp_path, budget, fmt):
+    store = SessionStore(memory_budget_bytes=budget, idle_ttl_seconds=3600, spill_dir=tmp_path)
+    store["s"] = frame
+    # Spills "s" when there is no budget
+    store["other"] = frame.head(1)
+    snapshot = store.snapshot("s")
+
+    chunks = list(iter_chunks("s", snapshot=snapshot))
+
+    assert snapshot["format"] == fmt
+    assert [len(c) for c in chunks] == [37] * 5 + [15]
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), frame, check_dtype=False)
+    assert dataset_columns("s", snapshot=snapshot) == list(frame.columns)
+
+
+def test_streaming_training_reports_model_substitution(frame, small_chunks):
+    res = run_streaming_training("s", "churned", "RandomForestClassifier", df=frame)
+
+    assert res["model_name"] == "SGDClassifier"
+    assert res["model_substituted"] is True
+    assert "RandomForestClassifier" in res["model_substitution"]
+    assert res["rows"] == len(frame)
+    assert 0 < res["metrics"]["holdout_rows"] < len(frame)
+
+
+def test_streaming_regression(frame, small_chunks):
+    res = run_streaming_training("s", "income", "SGDRegressor", df=frame)
+
+    assert res["problem_type"] == "regression"
+    assert res["model_substituted"] is False
+    assert {"r2_score", "mse"} <= set(res["metrics"])
+
+
+def test_streaming_mode_endpoint(client, frame):
+    session_id = upload_session(client, frame)
+
+    response = client.post("/train-model", data={
+        "session_id": session_id, "target": "churned", "model_choice": "LogisticRegression", "mode": "streaming",
+    })
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["training_mode"] == "streaming"
+    assert body["model_substitution"] == "LogisticRegression can't be trained incrementally; trained SGDClassifier instead"
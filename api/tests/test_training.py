@@ -0,0 +1,94 @@
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app.utils.storage import write_dataset
+from conftest import upload_session
+
+
+def _train(client, session_id, **form):
+    return client.post("/train-model", data={"session_id": session_id, "target": "churned", **form})
+
+
+def test_trains_from_the_live_session(client, frame):
+    session_id = upload_session(client, frame)
+
+    response = _train(client, session_id, model_choice="LogisticRegression")
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["data_source"] == "session"
+    assert body["session_version"] is not None
+    assert body["problem_type"] == "classification"
+    assert 0 <= body["metrics"]["accuracy"] <= 1
+    # The worker got a snapshot file, removed once the job is done
+    snapshots = Path(os.environ["SESSION_SPILL_DIR"]) / "snapshots"
+    deadline = time.monotonic() + 5
+    while list(snapshots.glob(f"{session_id}.*")) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not list(snapshots.glob(f"{session_id}.*"))
+
+
+def test_trains_from_the_persisted_dataset_without_a_session(client, frame):
+    path = Path(os.environ["HF_LOCAL_HUB_DIR"]) / "dataset" / "prthm20/ZeoMl" / "offline_cleaned.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_dataset(frame, path)
+
+    response = _train(client, "offline", model_choice="RandomForestClassifier")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["data_source"] == "persisted"
+    assert response.json()["session_version"] is None
+
+
+def test_unknown_session_without_a_dataset_is_404(client):
+    assert _train(client, "nope").status_code == 404
+
+
+def test_regression_target(client, frame):
+    session_id = upload_session(client, frame)
+
+    response = _train(client, session_id, target="income", model_choice="LinearRegression")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["problem_type"] == "regression"
+    assert "r2_score" in response.json()["metrics"]
+
+
+@pytest.fixture
+def flags():
+    # Object booleans with gaps: uploads store them as the nullable boolean dtype
+    n = 120
+    return pd.DataFrame({
+        "x": [float(i) for i in range(n)],
+        "flag": [[True, False, None][i % 3] for i in range(n)],
+        "label": [i % 2 == 0 if i % 7 else None for i in range(n)],
+    })
+
+
+@pytest.mark.parametrize("mode", ["memory", "streaming"])
+def test_nullable_boolean_feature(client, flags, mode):
+    session_id = upload_session(client, flags.assign(label=[i % 3 for i in range(len(flags))]))
+
+    response = _train(client, session_id, target="label", model_choice="LogisticRegression", mode=mode)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["problem_type"] == "classification"
+    scored = client.post("/predict", json={
+        "model": response.json()["hf_filename"],
+        "records": [{"x": 1.0, "flag": True}, {"x": 2.0, "flag": None}],
+    })
+    assert scored.status_code == 200, scored.text
+
+
+@pytest.mark.parametrize("mode", ["memory", "streaming"])
+def test_nullable_boolean_target(client, flags, mode):
+    session_id = upload_session(client, flags)
+
+    response = _train(client, session_id, target="label", model_choice="LogisticRegression", mode=mode)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["problem_type"] == "classification"
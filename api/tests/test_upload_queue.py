@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from app.utils import upload_queue
+from app.utils.hub_client import HubClient
+from app.utils.storage import read_dataset
+from app.utils.upload_queue import FAILED, UPLOADED, HubCommitter, UploadQueue
+
+
+class RecordingCommitter:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.commits = []
+        self.lock = threading.Lock()
+
+    def commit(self, repo_id, repo_type, files, message):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("hub down")
+            self.commits.append((repo_id, {path: bytes(data) for path, data in files.items()}, message))
+
+
+@pytest.fixture
+def queue():
+    queues = []
+
+    def make(committer):
+        queue = UploadQueue(committer)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.shutdown(timeout=5)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(upload_queue, "UPLOAD_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(upload_queue, "UPLOAD_MAX_RETRIES", 2)
+
+
+def test_writes_to_one_path_coalesce_into_one_commit(queue, monkeypatch):
+    monkeypatch.setattr(upload_queue, "UPLOAD_DEBOUNCE_SECONDS", 0.5)
+    committer = RecordingCommitter()
+    uploads = queue(committer)
+
+    for version in range(3):
+        uploads.enqueue("r", "a.txt", f"v{version}".encode())
+    uploads.enqueue("r", "b.txt", b"b")
+    assert uploads.flush(timeout=5)
+
+    assert committer.commits == [("r", {"a.txt": b"v2", "b.txt": b"b"}, "Update 2 files")]
+    assert uploads.stats()["coalesced"] == 2
+    status = uploads.status("r", "a.txt")
+    assert status["status"] == UPLOADED
+    assert status["committed_version"] == 3
+
+
+def test_failed_commit_is_retried(queue):
+    committer = RecordingCommitter(failures=1)
+    uploads = queue(committer)
+
+    uploads.enqueue("r", "a.txt", b"data")
+    deadline = time.monotonic() + 5
+    while uploads.status("r", "a.txt")["status"] != UPLOADED:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    assert uploads.stats()["retries"] == 1
+    assert committer.commits[0][1] == {"a.txt": b"data"}
+
+
+def test_gives_up_after_max_retries(queue):
+    uploads = queue(RecordingCommitter(failures=10))
+
+    uploads.enqueue("r", "a.txt", b"data")
+    deadline = time.monotonic() + 5
+    while uploads.status("r", "a.txt")["status"] != FAILED:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    assert "hub down" in uploads.status("r", "a.txt")["error"]
+
+
+def test_local_hub_stores_frames_as_datasets(queue, tmp_path):
+    uploads = queue(HubCommitter(HubClient(local_dir=tmp_path)))
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    model = tmp_path / "model.zmodel"
+    model.write_bytes(b"model")
+
+    uploads.enqueue("r", "data.parquet", df)
+    uploads.enqueue("r", "model.zmodel", model)
+    assert uploads.flush(timeout=5)
+
+    pd.testing.assert_frame_equal(read_dataset(tmp_path / "dataset" / "r" / "data.parquet"), df, check_dtype=False)
+    assert (tmp_path / "dataset" / "r" / "model.zmodel").read_bytes() == b"model"
@@ -38,7 +38,8 @@ export default function CleaningPage({ onResult }: CleaningPageProps) {
       setMessages(prev => [...prev, { role: "assistant", content: data.message || data.error }]);
 
       if (data.preview) {
-        const parsedPreview = JSON.parse(data.preview);
+        // Older API versions sent the preview as a JSON string
+        const parsedPreview = typeof data.preview === "string" ? JSON.parse(data.preview) : data.preview;
         setPreview(parsedPreview);
         if (onResult) onResult(parsedPreview);
       }
@@ -26,6 +26,13 @@ const SaveCleanedDataButton: React.FC<SaveCleanedDataButtonProps> = ({ sessionId
       if (!res.ok) throw new Error("Failed to save cleaned file");
       const data = await res.json();
 
+      if (data.url) {
+        // The API streams the file; let the browser download it
+        const link = document.createElement("a");
+        link.href = `http://localhost:7860${data.url}`;
+        link.download = data.filename || "";
+        link.click();
+      }
       setMessage(data.message || "✅ Cleaned file saved successfully!");
     } catch (err: unknown) {
       setMessage(`❌ Error: ${err instanceof Error ? err.message : "Unknown error"}`);
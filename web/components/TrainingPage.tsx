@@ -18,6 +18,7 @@ type Hyperparams = Record<string, string | number | boolean>;
 interface TrainingResult {
   problem_type: string;
   model_name: string;
+  model_substitution?: string | null;
   metrics: Record<string, number>;
   model_path: string;
 }
@@ -165,6 +166,9 @@ export default function TrainModelNodeCompact() {
                 <strong className="text-gray-200">Path:</strong>{" "}
                 <span className="text-gray-300">{results.model_path}</span>
               </div>
+              {results.model_substitution && (
+                <div className="text-amber-300">{results.model_substitution}</div>
+              )}
             </div>
 
             <div className="text-[11px] text-gray-200 font-medium mb-1">Metrics</div>